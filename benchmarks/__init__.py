@@ -0,0 +1 @@
+"""Benchmarks for the calculator application and the pytest MCP server."""
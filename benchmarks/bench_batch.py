@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch evaluation against keystroke-driven calculation.
+
+Evaluates the same random binary operations (and square roots) by feeding
+keystrokes to a CalculatorEngine, with calculate_many on expression text,
+and with apply_operator / square_root_many on operand columns given as
+lists and, with NumPy installed, as arrays (the vectorized fast path).
+Every variant's results are checked against the keystroke-driven ones.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import batch
+from src.calculator_engine import ERROR, CalculatorEngine
+
+
+def keystrokes(expressions):
+    engine = CalculatorEngine()
+    results = []
+    for keys in expressions:
+        engine.clear()
+        for key in keys:
+            engine.press(key)
+        results.append(
+            engine.result if engine.current_input != ERROR else engine.display_text
+        )
+    return results
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def report(name, seconds, baseline, results, expected):
+    status = "ok" if results == expected else "MISMATCH"
+    print(
+        f"   {name:<26} {seconds * 1000:9.1f}ms  {baseline / seconds:7.1f}x  {status}"
+    )
+    return results == expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100000, help="Operations per batch")
+    parser.add_argument(
+        "--operator", default="/", choices=["+", "-", "*", "/", "//", "%"]
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    left = [rng.randint(0, 10 ** 6) for _ in range(args.size)]
+    right = [rng.randint(0, 1000) for _ in range(args.size)]
+    expressions = [f"{a}{args.operator}{b}=" for a, b in zip(left, right)]
+
+    print("=" * 60)
+    print("Batch evaluation benchmark")
+    print("=" * 60)
+    numpy = "yes" if batch.numpy else "no"
+    print(f"   {args.size} operations of '{args.operator}', NumPy: {numpy}\n")
+
+    ok = True
+    baseline, expected = timed(keystrokes, expressions)
+    ok &= report("keystrokes", baseline, baseline, expected, expected)
+    seconds, results = timed(batch.calculate_many, [e[:-1] for e in expressions])
+    ok &= report("calculate_many", seconds, baseline, results, expected)
+    seconds, results = timed(batch.apply_operator, left, args.operator, right)
+    ok &= report("apply_operator (lists)", seconds, baseline, results, expected)
+    if batch.numpy is not None:
+        arrays = batch.numpy.array(left), batch.numpy.array(right)
+        seconds, results = timed(
+            batch.apply_operator, arrays[0], args.operator, arrays[1]
+        )
+        ok &= report("apply_operator (arrays)", seconds, baseline, results, expected)
+
+    print()
+    values = [rng.uniform(-10, 10 ** 6) for _ in range(args.size)]
+    baseline, expected = timed(keystrokes, [f"{v}√" for v in values])
+    ok &= report("√ keystrokes", baseline, baseline, expected, expected)
+    seconds, results = timed(batch.square_root_many, values)
+    ok &= report("square_root_many (lists)", seconds, baseline, results, expected)
+    if batch.numpy is not None:
+        seconds, results = timed(batch.square_root_many, batch.numpy.array(values))
+        ok &= report("square_root_many (arrays)", seconds, baseline, results, expected)
+
+    if not ok:
+        sys.exit("Batch results differ from keystroke-driven results")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark request latency while a test run is in flight.
+
+Starts the MCP server over stdio, launches a slow ``run_tests`` call and
+measures how long ``list_tools`` and ``get_test_results`` take to answer
+while that run is still executing.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+SLOW_TEST = """
+import time
+
+
+def test_slow():
+    time.sleep({seconds})
+"""
+
+
+def summarize(name: str, samples: list[float]) -> None:
+    """Print latency statistics for a list of samples in seconds."""
+    if not samples:
+        print(f"   {name}: no samples")
+        return
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = (
+        samples_ms[int(len(samples_ms) * 0.95) - 1]
+        if len(samples_ms) > 1
+        else samples_ms[0]
+    )
+    print(
+        f"   {name}: n={len(samples_ms)} "
+        f"p50={statistics.median(samples_ms):.1f}ms "
+        f"p95={p95:.1f}ms "
+        f"max={samples_ms[-1]:.1f}ms"
+    )
+
+
+async def probe(
+    session: ClientSession, samples: dict, until: asyncio.Event, interval: float
+):
+    """Issue list_tools/get_test_results calls until ``until`` is set."""
+    while not until.is_set():
+        start = time.perf_counter()
+        await session.list_tools()
+        samples["list_tools"].append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        await session.call_tool("get_test_results", {})
+        samples["get_test_results"].append(time.perf_counter() - start)
+        
+        await asyncio.sleep(interval)
+
+
+async def run_benchmark(seconds: float, interval: float) -> None:
+    """Measure probe latency idle and during a slow run."""
+    project_root = Path(__file__).resolve().parent.parent
+    server_params = StdioServerParameters(
+        command=sys.executable,
+        args=[str(project_root / "server.py")],
+        cwd=str(project_root)
+    )
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        test_file = Path(tmp) / "test_slow.py"
+        test_file.write_text(SLOW_TEST.format(seconds=seconds))
+        
+        async with stdio_client(server_params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                
+                # Idle baseline
+                idle = {"list_tools": [], "get_test_results": []}
+                stop = asyncio.Event()
+                probe_task = asyncio.create_task(probe(session, idle, stop, interval))
+                await asyncio.sleep(1.0)
+                stop.set()
+                await probe_task
+                
+                # Latency while a run is in flight
+                busy = {"list_tools": [], "get_test_results": []}
+                stop = asyncio.Event()
+                probe_task = asyncio.create_task(probe(session, busy, stop, interval))
+                start = time.perf_counter()
+                await session.call_tool("run_tests", {"test_path": str(test_file)})
+                run_duration = time.perf_counter() - start
+                stop.set()
+                await probe_task
+    
+    print("Idle server:")
+    for name, samples in idle.items():
+        summarize(name, samples)
+    print(f"During a {run_duration:.1f}s run_tests call:")
+    for name, samples in busy.items():
+        summarize(name, samples)
+
+
+def main():
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5.0,
+                        help="How long the slow test sleeps")
+    parser.add_argument("--interval", type=float, default=0.1,
+                        help="Delay between probe calls")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("Concurrent call latency benchmark")
+    print("=" * 60)
+    asyncio.run(run_benchmark(args.seconds, args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark the calculator's expression evaluator against eval.
+
+Generates a randomized corpus of keypad-style expressions and times three
+ways of evaluating it: ``eval``, the compiled evaluator with a cold cache
+(every expression parsed once) and with a warm cache (repeated
+expressions, as when pressing = again). Results of every expression are
+checked against eval before timing.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.expression import compile_expression, evaluate
+
+OPERATORS = ["+", "-", "*", "/", "//", "%", "**"]
+
+
+def random_number(rng: random.Random) -> str:
+    if rng.random() < 0.3:
+        return f"{rng.uniform(0, 1000):.{rng.randint(1, 4)}f}"
+    return str(rng.randint(0, 10 ** rng.randint(1, 6)))
+
+
+def random_expression(rng: random.Random, terms: int, depth: int = 0) -> str:
+    """Build an expression of roughly ``terms`` operands."""
+    parts = []
+    for i in range(terms):
+        if i:
+            operator = rng.choice(OPERATORS)
+            parts.append(operator)
+            if operator == "**":
+                parts.append(str(rng.randint(0, 3)))
+                continue
+        if depth < 3 and rng.random() < 0.15:
+            parts.append(f"({random_expression(rng, rng.randint(2, 4), depth + 1)})")
+        else:
+            parts.append(("-" if rng.random() < 0.1 else "") + random_number(rng))
+    return "".join(parts)
+
+
+def outcome(function, text):
+    try:
+        return function(text)
+    except ArithmeticError as e:
+        return type(e)
+
+
+def run_eval(corpus):
+    for text in corpus:
+        try:
+            eval(text)
+        except ArithmeticError:
+            pass
+
+
+def run_evaluate(corpus):
+    for text in corpus:
+        try:
+            evaluate(text)
+        except ArithmeticError:
+            pass
+
+
+def time_it(function, corpus, repeat: int, before=None) -> list:
+    times = []
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        function(corpus)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def report(name: str, times: list, count: int, baseline: float | None = None) -> float:
+    best = min(times)
+    line = (
+        f"   {name:<14} best={best * 1000:8.1f}ms  "
+        f"median={statistics.median(times) * 1000:8.1f}ms  "
+        f"per expression={best / count * 1e6:6.2f}µs"
+    )
+    if baseline:
+        line += f"  ({baseline / best:.1f}x eval)"
+    print(line)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--expressions", type=int, default=20000, help="Expressions in the corpus"
+    )
+    parser.add_argument(
+        "--terms", type=int, default=6, help="Maximum operands per expression"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per variant")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [
+        random_expression(rng, rng.randint(1, args.terms))
+        for _ in range(args.expressions)
+    ]
+
+    print("=" * 60)
+    print("Expression evaluator benchmark")
+    print("=" * 60)
+    print(f"   {len(corpus)} expressions, up to {args.terms} operands\n")
+
+    mismatches = [
+        text for text in corpus
+        if outcome(eval, text) != outcome(evaluate, text)
+    ]
+    if mismatches:
+        sys.exit(f"{len(mismatches)} results differ from eval, e.g. {mismatches[0]!r}")
+
+    baseline = report("eval", time_it(run_eval, corpus, args.repeat), len(corpus))
+    report(
+        "compiled cold",
+        time_it(
+            run_evaluate, corpus, args.repeat, before=compile_expression.cache_clear
+        ),
+        len(corpus),
+        baseline,
+    )
+    # Warm: expressions that fit in the cache, evaluated again and again
+    warm = corpus[:compile_expression.cache_info().maxsize]
+    run_evaluate(warm)
+    warm_eval = min(time_it(run_eval, warm, args.repeat))
+    report(
+        "compiled warm", time_it(run_evaluate, warm, args.repeat), len(warm), warm_eval
+    )
+
+
+if __name__ == "__main__":
+    main()
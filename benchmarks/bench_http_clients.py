@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Load-test the MCP server's HTTP transport with many concurrent clients.
+
+Starts one server with ``--transport http`` and connects ``--clients``
+simulated clients at once, each with its own MCP session over streamable
+HTTP. Every client calls each of ``--tools`` ``--calls`` times; all
+sessions share the server's warm workers, collection index and result
+store. Reports session setup time, per-tool call latency and overall
+throughput.
+
+With ``--stdio``, the same workload is also run the way stdio clients get
+it: one server process per client, each starting cold.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+TOOL_ARGS = {
+    "list_tools": None,
+    "list_tests": {"test_path": "tests/test_expression.py"},
+    "get_test_results": {},
+    "list_runs": {},
+    "replay_keystrokes": {"script": "12+34= => 46\n10/0= => Error: Division by zero\n"},
+}
+
+
+def percentile(samples_ms: list[float], fraction: float) -> float:
+    """The sample at a fraction of the sorted samples (nearest rank)."""
+    index = max(0, min(len(samples_ms) - 1, round(fraction * len(samples_ms)) - 1))
+    return samples_ms[index]
+
+
+def summarize(name: str, samples: list[float]) -> None:
+    """Print latency statistics for a list of samples in seconds."""
+    if not samples:
+        print(f"   {name}: no samples")
+        return
+    samples_ms = sorted(s * 1000 for s in samples)
+    print(
+        f"   {name:<18} n={len(samples_ms):<5} "
+        f"p50={statistics.median(samples_ms):7.1f}ms "
+        f"p95={percentile(samples_ms, 0.95):7.1f}ms "
+        f"p99={percentile(samples_ms, 0.99):7.1f}ms "
+        f"max={samples_ms[-1]:7.1f}ms"
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def call(session: ClientSession, tool: str):
+    if tool == "list_tools":
+        return await session.list_tools()
+    result = await session.call_tool(tool, TOOL_ARGS.get(tool, {}))
+    if result.isError:
+        raise RuntimeError(f"{tool} failed: {result.content[0].text}")
+    return result
+
+
+async def client_workload(
+    session: ClientSession, tools: list[str], calls: int, samples: dict
+):
+    """Initialize a session and run its calls, recording each latency."""
+    start = time.perf_counter()
+    await session.initialize()
+    samples["initialize"].append(time.perf_counter() - start)
+
+    for _ in range(calls):
+        for tool in tools:
+            start = time.perf_counter()
+            await call(session, tool)
+            samples[tool].append(time.perf_counter() - start)
+
+
+async def http_client(url: str, tools: list[str], calls: int, samples: dict):
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await client_workload(session, tools, calls, samples)
+
+
+async def stdio_client_process(env: dict, tools: list[str], calls: int, samples: dict):
+    server_params = StdioServerParameters(
+        command=sys.executable,
+        args=[str(PROJECT_ROOT / "server.py")],
+        cwd=str(PROJECT_ROOT),
+        env=env
+    )
+    async with stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await client_workload(session, tools, calls, samples)
+
+
+async def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server did not start listening on port {port}")
+            await asyncio.sleep(0.1)
+        else:
+            writer.close()
+            await writer.wait_closed()
+            return
+
+
+async def run_clients(make_client, clients: int, tools: list[str], calls: int):
+    """Run all clients at once; their samples and the wall time taken."""
+    samples = {"initialize": [], **{tool: [] for tool in tools}}
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(make_client(tools, calls, samples) for _ in range(clients)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+    errors = [result for result in results if isinstance(result, BaseException)]
+    return samples, elapsed, errors
+
+
+def report(title: str, samples: dict, elapsed: float, errors: list) -> None:
+    calls = sum(len(values) for name, values in samples.items() if name != "initialize")
+    print(title)
+    for name, values in samples.items():
+        summarize(name, values)
+    print(f"   {calls} calls in {elapsed:.2f}s: {calls / elapsed:.0f} calls/s")
+    if errors:
+        print(f"   {len(errors)} clients failed, first: {errors[0]!r}")
+    print()
+
+
+async def run_benchmark(args) -> None:
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as data_dir:
+        env["PYTEST_MCP_DATA_DIR"] = data_dir
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, str(PROJECT_ROOT / "server.py"),
+             "--transport", "http", "--port", str(port)],
+            cwd=str(PROJECT_ROOT),
+            env=env
+        )
+        try:
+            await wait_for_port(port)
+            url = f"http://127.0.0.1:{port}/mcp"
+
+            async def make_client(tools, calls, samples):
+                await http_client(url, tools, calls, samples)
+
+            report(
+                f"Shared HTTP server, {args.clients} concurrent clients:",
+                *await run_clients(make_client, args.clients, args.tools, args.calls)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+    if args.stdio:
+        with tempfile.TemporaryDirectory() as data_dir:
+            env["PYTEST_MCP_DATA_DIR"] = data_dir
+
+            async def make_client(tools, calls, samples):
+                await stdio_client_process(env, tools, calls, samples)
+
+            report(
+                f"One stdio server per client, {args.clients} concurrent clients:",
+                *await run_clients(make_client, args.clients, args.tools, args.calls)
+            )
+
+
+def main():
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--clients", type=int, default=50, help="Concurrent client sessions"
+    )
+    parser.add_argument(
+        "--calls", type=int, default=5, help="Rounds of tool calls per client"
+    )
+    parser.add_argument(
+        "--tools", nargs="+", default=["list_tools", "list_tests", "get_test_results"],
+        choices=sorted(TOOL_ARGS), help="Tools each client calls every round"
+    )
+    parser.add_argument("--stdio", action="store_true",
+                        help="Also run the workload with one stdio server per client")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("HTTP transport load benchmark")
+    print("=" * 60)
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
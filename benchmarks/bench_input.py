@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark typing long input into the calculator.
+
+Types inputs of growing length one key at a time and reports the time per
+key, which stays flat when typing and backspace take constant time. The
+engine is measured always; the Tk window (one display update per key, and
+press_keys with one update per batch) only when an X display is available.
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.calculator_engine import CalculatorEngine
+
+
+def per_key(function, keys):
+    start = time.perf_counter()
+    function(keys)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def engine_typing(keys):
+    engine = CalculatorEngine()
+    for key in keys:
+        engine.press(key)
+
+
+def engine_backspace(keys):
+    engine = CalculatorEngine()
+    engine.press_keys(keys)
+    start = time.perf_counter()
+    for _ in keys:
+        engine.press("←")
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+        help="Input lengths to type"
+    )
+    args = parser.parse_args()
+
+    calculator = None
+    if os.environ.get("DISPLAY"):
+        import tkinter as tk
+        from src.calculator_app import Calculator
+        calculator = Calculator(tk.Tk())
+
+    print("=" * 60)
+    print("Calculator input benchmark (µs per key)")
+    print("=" * 60)
+    header = f"   {'keys':>8}  {'engine':>8}  {'backspace':>9}"
+    if calculator:
+        header += f"  {'window':>8}  {'press_keys':>10}"
+    print(header)
+
+    for size in args.sizes:
+        keys = "1" * size
+        typing, backspace = per_key(engine_typing, keys), engine_backspace(keys)
+        line = f"   {size:>8}  {typing:8.2f}  {backspace:9.2f}"
+        if calculator:
+            calculator.clear()
+            window = per_key(
+                lambda keys: [calculator.on_button_click(k) for k in keys], keys
+            )
+            calculator.clear()
+            batch = per_key(calculator.press_keys, keys)
+            line += f"  {window:8.2f}  {batch:10.2f}"
+        print(line)
+
+    if not calculator:
+        print("\n   No X display: Tk window not measured")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark the calculator's numeric backends on long operation chains.
+
+Builds random chains of decimal numbers joined by + - * / (and chains of
+ints joined by + - *, which take the exact int fast path) and evaluates
+each with the float, decimal and fraction backends: once from a cold
+cache (parse and compile included) and again warm. The error of the float
+and decimal results against the exact fraction result is shown too.
+"""
+
+import argparse
+import random
+import sys
+import time
+from fractions import Fraction
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.expression import compile_expression
+from src.numeric import BACKENDS
+
+
+def decimal_chain(rng: random.Random, length: int) -> str:
+    parts = [f"{rng.uniform(1, 100):.2f}"]
+    for _ in range(length):
+        parts.append(rng.choice("+-*/"))
+        parts.append(f"{rng.uniform(1, 100):.2f}")
+    return "".join(parts)
+
+
+def int_chain(rng: random.Random, length: int) -> str:
+    parts = [str(rng.randint(1, 10 ** 6))]
+    for _ in range(length):
+        parts.append(rng.choice("+-*"))
+        parts.append(str(rng.randint(1, 10 ** 6)))
+    return "".join(parts)
+
+
+def time_backend(expressions, backend, repeat):
+    """Best cold and warm time per expression, in µs, and the results."""
+    compile_expression.cache_clear()
+    start = time.perf_counter()
+    results = [compile_expression(text, backend).evaluate() for text in expressions]
+    cold = time.perf_counter() - start
+
+    programs = [compile_expression(text, backend) for text in expressions]
+    warm = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for program in programs:
+            program.evaluate()
+        warm = min(warm, time.perf_counter() - start)
+    return cold / len(expressions) * 1e6, warm / len(expressions) * 1e6, results
+
+
+def relative_error(results, exact):
+    errors = []
+    for result, value in zip(results, exact):
+        if value:
+            errors.append(abs(Fraction(result) - value) / abs(value))
+    return float(max(errors)) if errors else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--lengths", type=int, nargs="+", default=[10, 100, 1000],
+        help="Operations per chain"
+    )
+    parser.add_argument("--chains", type=int, default=200, help="Chains per length")
+    parser.add_argument("--repeat", type=int, default=5, help="Warm runs per backend")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    print("=" * 78)
+    print("Numeric backend benchmark (µs per expression)")
+    print("=" * 78)
+    print(
+        f"   {'chain':<22} {'backend':<9} {'cold':>10} {'warm':>10} "
+        f"{'x float':>8} {'max rel. error':>15}"
+    )
+
+    for name, make in [("decimal numbers", decimal_chain), ("ints (exact)", int_chain)]:
+        for length in args.lengths:
+            expressions = [make(rng, length) for _ in range(args.chains)]
+            timings = {
+                backend: time_backend(expressions, backend, args.repeat)
+                for backend in BACKENDS
+            }
+            exact = timings["fraction"][2]
+            float_warm = timings["float"][1]
+            for backend, (cold, warm, results) in timings.items():
+                error = relative_error(results, exact) if backend != "fraction" else 0.0
+                label = f"{name} x{length}" if backend == "float" else ""
+                print(
+                    f"   {label:<22} {backend:<9} {cold:10.1f} {warm:10.1f} "
+                    f"{warm / float_warm:8.1f} {error:15.2e}"
+                )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark reading large pytest-json-report files.
+
+Writes a synthetic report with a large number of tests, then pages through
+its failures after loading it whole with ``json.load`` and with the server's
+streaming reader (used to store each run's results), comparing wall time and
+peak Python memory.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server import iter_report_tests, paginate, test_duration
+
+
+def write_report(path: str, tests: int, failure_rate: float) -> None:
+    """Write a pytest-json-report shaped report with ``tests`` test records."""
+    random.seed(0)
+    records = []
+    for index in range(tests):
+        nodeid = f"tests/test_module_{index // 100}.py::TestCase::test_{index}"
+        failed = random.random() < failure_rate
+        record = {
+            "nodeid": nodeid,
+            "lineno": index % 100,
+            "outcome": "failed" if failed else "passed",
+            "keywords": [f"test_{index}", "TestCase", f"test_module_{index // 100}.py"],
+            "setup": {"duration": random.random() / 1000, "outcome": "passed"},
+            "call": {
+                "duration": random.random() / 100,
+                "outcome": "failed" if failed else "passed",
+            },
+            "teardown": {"duration": random.random() / 1000, "outcome": "passed"},
+        }
+        if failed:
+            record["call"]["longrepr"] = (
+                "def test():\n>       assert 1 == 2\nE       assert 1 == 2\n" * 5
+            )
+        records.append(record)
+
+    collectors = [
+        {
+            "nodeid": f"tests/test_module_{module}.py",
+            "outcome": "passed",
+            "result": [
+                {"nodeid": record["nodeid"], "type": "Function"}
+                for record in records[module * 100:(module + 1) * 100]
+            ],
+        }
+        for module in range((tests + 99) // 100)
+    ]
+    failed = sum(record["outcome"] == "failed" for record in records)
+
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "created": time.time(),
+                "duration": 12.5,
+                "exitcode": 1 if failed else 0,
+                "root": "/project",
+                "environment": {},
+                "summary": {
+                    "passed": tests - failed,
+                    "failed": failed,
+                    "total": tests,
+                    "collected": tests,
+                },
+                "collectors": collectors,
+                "tests": records,
+            },
+            f,
+        )
+
+
+def failures_page(tests):
+    return paginate(
+        (
+            {
+                "nodeid": test["nodeid"],
+                "outcome": test["outcome"],
+                "duration": test_duration(test),
+            }
+            for test in tests
+            if test["outcome"] in ("failed", "error")
+        ),
+        offset=0,
+        limit=20,
+        max_bytes=20000,
+    )
+
+
+def read_whole(path: str):
+    with open(path) as f:
+        return failures_page(json.load(f)["tests"])
+
+
+def read_streaming(path: str):
+    return failures_page(iter_report_tests(path))
+
+
+def measure(name: str, read) -> None:
+    start = time.perf_counter()
+    read()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    read()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"   {name:<20} time={elapsed * 1000:9.1f}ms  peak memory={peak / 2**20:8.1f}MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--tests", type=int, default=100_000, help="Tests in the report"
+    )
+    parser.add_argument(
+        "--failure-rate", type=float, default=0.01, help="Share of failed tests"
+    )
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("JSON report reader benchmark")
+    print("=" * 60)
+
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        write_report(path, args.tests, args.failure_rate)
+        print(f"   {args.tests} tests, {os.path.getsize(path) / 2**20:.1f}MB report\n")
+
+        measure("json.load", lambda: read_whole(path))
+        measure("streaming", lambda: read_streaming(path))
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-test latency while full suites load the server.
+
+``--suites`` clients keep starting full test runs for ``--seconds``, while
+one more client runs a single test over and over. This is done once with
+no limit on concurrent runs and once with the run queue's limit, reserved
+interactive slot and priorities. Reports the single-test latency and how
+many suites finished.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault(
+    "PYTEST_MCP_DATA_DIR", tempfile.mkdtemp(prefix="pytest-mcp-bench-")
+)
+
+import server
+
+DEFAULT_NODE = "tests/test_calculator_engine.py::TestEditing::test_clear"
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """The sample at a fraction of the sorted samples (nearest rank)."""
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))]
+
+
+async def suite_client(mcp_server, client: str, args, deadline: float, finished: list):
+    """Start full suite runs one after another until the deadline."""
+    run_args = {
+        "test_path": args.suite,
+        "markers": "not ui",
+        "verbose": False,
+    }
+    while time.monotonic() < deadline:
+        run = mcp_server._start_run(run_args, timeout=600, client=client)
+        await run.done.wait()
+        finished.append(run.status)
+
+
+async def interactive_client(mcp_server, args, deadline: float) -> list[float]:
+    """Run a single test over and over until the deadline; its latencies."""
+    run_args = {"test_path": args.node, "verbose": False}
+    samples = []
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        run = mcp_server._start_run(run_args, timeout=600, client="interactive")
+        await run.done.wait()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def run_case(name: str, scheduler_args: tuple[int, int], args) -> None:
+    mcp_server = server.PytestMCPServer()
+    mcp_server.scheduler = server.RunScheduler(
+        *scheduler_args, server.RUN_QUEUE_AGING, mcp_server.metrics
+    )
+    deadline = time.monotonic() + args.seconds
+    finished = []
+
+    suites = [
+        asyncio.create_task(
+            suite_client(mcp_server, f"suite-{index}", args, deadline, finished)
+        )
+        for index in range(args.suites)
+    ]
+    # Let the suites fill the server first
+    await asyncio.sleep(0.5)
+    samples = await interactive_client(mcp_server, args, deadline)
+    await asyncio.gather(*suites)
+
+    samples_ms = [sample * 1000 for sample in samples]
+    print(
+        f"   {name:<28} single test: n={len(samples_ms):<4} "
+        f"p50={statistics.median(samples_ms):7.0f}ms "
+        f"p95={percentile(samples_ms, 0.95):7.0f}ms "
+        f"max={max(samples_ms):7.0f}ms  suites finished: {len(finished)}"
+    )
+
+
+async def run_benchmark(args) -> None:
+    await run_case("no limit", (10 ** 6, 0), args)
+    await run_case(
+        f"limit {args.limit}, 1 reserved",
+        (args.limit, server.RESERVED_RUN_SLOTS),
+        args
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--suites", type=int, default=6, help="Clients running full suites"
+    )
+    parser.add_argument("--seconds", type=float, default=20, help="Length of each case")
+    parser.add_argument(
+        "--limit", type=int, default=server.MAX_RUN_SLOTS, help="Run slots"
+    )
+    parser.add_argument(
+        "--suite", default="tests/", help="Test path of the full suites"
+    )
+    parser.add_argument(
+        "--node", default=DEFAULT_NODE, help="Node ID of the single test"
+    )
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Run queue benchmark")
+    print("=" * 60)
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
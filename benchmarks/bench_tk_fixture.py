@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-test setup time of the calculator fixture.
+
+Runs the same parameterized test (1000 cases by default) twice in a scratch
+directory: once with the old fixture, which builds a new Tk root and
+calculator for every test, and once with the session-shared root from
+tests/conftest.py. Setup and teardown times come from each run's JSON
+report. Needs an X display, or Xvfb for the headless mode of conftest.py.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The fixture tests/test_calculator.py used to define, with the display
+# handling of conftest.py so both variants run in the same environment
+PER_TEST_FIXTURE = '''
+
+@pytest.fixture
+def calculator(display):
+    """Create a calculator instance for testing."""
+    root = tk.Tk()
+    calc = Calculator(root)
+    yield calc
+    root.destroy()
+'''
+
+TEST_MODULE = '''
+import pytest
+
+
+@pytest.mark.parametrize("n", range({tests}))
+def test_add(calculator, n):
+    calculator.append_char(str(n))
+    calculator.append_char("+")
+    calculator.append_char("1")
+    calculator.calculate()
+    assert calculator.result == n + 1
+'''
+
+
+def run_variant(directory: Path, conftest: str, tests: int) -> dict:
+    """Run the parameterized test with ``conftest`` and time its fixtures."""
+    directory.mkdir()
+    (directory / "conftest.py").write_text(conftest)
+    (directory / "test_bench.py").write_text(TEST_MODULE.format(tests=tests))
+    report_file = directory / "report.json"
+
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(ROOT), env.get("PYTHONPATH")])
+    )
+    start = time.perf_counter()
+    process = subprocess.run(
+        [
+            sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+            "--rootdir", str(directory), "--json-report",
+            f"--json-report-file={report_file}", str(directory)
+        ],
+        cwd=directory,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    wall = time.perf_counter() - start
+
+    if not report_file.exists():
+        raise RuntimeError(f"pytest failed:\n{process.stdout}\n{process.stderr}")
+    with open(report_file) as f:
+        report = json.load(f)
+
+    fixture_times = [
+        test.get("setup", {}).get("duration", 0)
+        + test.get("teardown", {}).get("duration", 0)
+        for test in report["tests"]
+    ]
+    return {
+        "wall": wall,
+        "summary": report["summary"],
+        "fixture_times": fixture_times,
+    }
+
+
+def report(name: str, result: dict) -> None:
+    times_ms = [t * 1000 for t in result["fixture_times"]]
+    passed = result["summary"].get("passed", 0)
+    print(
+        f"   {name:<12} setup+teardown per test: "
+        f"median={statistics.median(times_ms):8.2f}ms "
+        f"mean={statistics.mean(times_ms):8.2f}ms  "
+        f"total={sum(times_ms) / 1000:6.2f}s  "
+        f"wall={result['wall']:6.2f}s  passed={passed}/{len(times_ms)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--tests", type=int, default=1000, help="Parameterized test cases"
+    )
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Calculator fixture benchmark")
+    print("=" * 60)
+
+    shared = (ROOT / "tests" / "conftest.py").read_text()
+    with tempfile.TemporaryDirectory(prefix="bench-tk-") as tmp:
+        per_test = run_variant(
+            Path(tmp) / "per_test", shared + PER_TEST_FIXTURE, args.tests
+        )
+        session = run_variant(Path(tmp) / "shared", shared, args.tests)
+
+    if not per_test["summary"].get("passed") or not session["summary"].get("passed"):
+        sys.exit("No test passed; Tk needs an X display (or Xvfb to run headless)")
+
+    print(f"   {args.tests} tests\n")
+    report("per-test", per_test)
+    report("shared", session)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold vs warm per-call latency of the Pytest MCP Server.
+
+Runs the same small targeted ``run_tests`` and ``list_tests`` calls against
+a fresh pytest process per call (cold) and against the warm worker pool.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server import PytestMCPServer
+
+DEFAULT_NODE = "tests/test_calculator.py::TestBasicOperations::test_addition"
+
+
+async def time_calls(call, repeat: int) -> list[float]:
+    """Time ``repeat`` awaits of ``call()`` in seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name: str, samples: list[float]) -> None:
+    samples_ms = [s * 1000 for s in samples]
+    print(
+        f"   {name:<24} "
+        f"median={statistics.median(samples_ms):8.1f}ms "
+        f"min={min(samples_ms):8.1f}ms "
+        f"max={max(samples_ms):8.1f}ms"
+    )
+
+
+async def run_benchmark(node: str, repeat: int) -> None:
+    server = PytestMCPServer()
+    
+    try:
+        # Exclude worker start-up from the warm numbers
+        await server.pool.prewarm()
+        
+        for warm in (False, True):
+            label = "warm" if warm else "cold"
+            run_args = {"test_path": node, "verbose": False, "warm": warm}
+            list_args = {"test_path": "tests/", "warm": warm}
+            
+            report(
+                f"run_tests ({label})",
+                await time_calls(
+                    lambda run_args=run_args: server.run_tests(run_args), repeat
+                )
+            )
+            report(
+                f"list_tests ({label})",
+                await time_calls(
+                    lambda list_args=list_args: server.list_tests(list_args), repeat
+                )
+            )
+    finally:
+        await server.pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--node", default=DEFAULT_NODE, help="Node ID to run")
+    parser.add_argument("--repeat", type=int, default=10, help="Calls per case")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("Cold vs warm call latency benchmark")
+    print("=" * 60)
+    asyncio.run(run_benchmark(args.node, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
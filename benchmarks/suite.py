@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite with stored results and regression checks.
+
+Times the calculator logic (``calculate``, ``square_root``, typing with
+``append_char``) and the MCP server's hot paths (``list_tests``,
+``run_tests`` on a single test, ``get_test_results`` on a large report).
+Each benchmark is run ``--samples`` times; a sample calls the operation
+enough times to take at least ``--min-time`` seconds and records the mean
+time per call. Samples are taken round-robin across the benchmarks, so a
+burst of load on the machine slows a sample of each rather than all the
+samples of one.
+
+Results are saved per commit under ``--results-dir``, and compared with a
+baseline: the file saved with ``--save-baseline``, or the results of the
+commit given as ``--baseline``. A benchmark has regressed when the
+Mann-Whitney U test finds its samples differ (p < ``--alpha``) and its
+median is more than ``--threshold`` slower. The exit status is 1 when a
+benchmark regressed. Load from other processes shifts whole runs, which
+no test can tell from a regression, so confirm one by running again.
+
+Run as ``python -m benchmarks.suite`` from the project root; see ``--help``.
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.calculator_engine import CalculatorEngine
+
+RESULTS_DIR = Path(".pytest_mcp") / "benchmarks"
+BASELINE_FILE = "baseline.json"
+
+# Largest sample counts the U test's exact distribution is computed for;
+# beyond them, or with ties, the normal approximation is used
+EXACT_LIMIT = 25
+
+# Tests in the synthetic report read by the get_test_results benchmarks
+REPORT_TESTS = 20_000
+
+# A single test for the run_tests benchmarks
+SINGLE_TEST = "tests/test_calculator_engine.py::TestEditing::test_clear"
+
+
+class Benchmark:
+    """A named operation to time; ``setup`` returns the callable to time."""
+
+    def __init__(
+        self, name: str, setup: Callable[["ServerFixture"], Callable[[], object]]
+    ):
+        self.name = name
+        self.setup = setup
+
+
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark setup function under ``name``."""
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, setup)
+        return setup
+    return register
+
+
+class ServerFixture:
+    """One MCP server and event loop shared by the server benchmarks.
+
+    The server keeps its data in a temporary directory, so the benchmarks
+    neither read nor disturb the project's run history.
+    """
+
+    def __init__(self):
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.server = None
+        self.data_dir: str | None = None
+
+    def get(self):
+        if self.server is None:
+            self.data_dir = tempfile.mkdtemp(prefix="pytest-mcp-bench-")
+            os.environ["PYTEST_MCP_DATA_DIR"] = self.data_dir
+            import server
+            self.loop = asyncio.new_event_loop()
+            self.server = server.PytestMCPServer()
+        return self.server
+
+    def call(self, method: str, args: dict) -> Callable[[], object]:
+        """A callable that awaits a server tool method with ``args``."""
+        handler = getattr(self.get(), method)
+
+        def run():
+            result = self.loop.run_until_complete(handler(args))
+            if result[0].text.startswith("❌"):
+                raise RuntimeError(f"{method} failed: {result[0].text[:500]}")
+            return result
+        return run
+
+    def close(self):
+        if self.server is not None:
+            self.loop.run_until_complete(self.server.pool.close())
+            self.loop.close()
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+
+@benchmark("calculator.calculate")
+def bench_calculate(fixture):
+    engine = CalculatorEngine()
+
+    def run():
+        engine.current_input = "12.5*(3+4)/2-7"
+        engine.calculate()
+    return run
+
+
+@benchmark("calculator.square_root")
+def bench_square_root(fixture):
+    engine = CalculatorEngine()
+
+    def run():
+        engine.current_input = "1522756"
+        engine.square_root()
+    return run
+
+
+@benchmark("calculator.append_char")
+def bench_append_char(fixture):
+    keys = "1234567890+0.5*" * 20
+
+    def run():
+        engine = CalculatorEngine()
+        for key in keys:
+            engine.append_char(key)
+    return run
+
+
+@benchmark("server.list_tests")
+def bench_list_tests(fixture):
+    return fixture.call("list_tests", {"test_path": "tests/"})
+
+
+@benchmark("server.run_tests")
+def bench_run_tests(fixture):
+    return fixture.call("run_tests", {"test_path": SINGLE_TEST})
+
+
+@benchmark("server.run_tests_warm")
+def bench_run_tests_warm(fixture):
+    return fixture.call(
+        "run_tests", {"test_path": SINGLE_TEST, "warm": True}
+    )
+
+
+def large_run(fixture) -> str:
+    """Store a run with a large synthetic report; its run ID."""
+    import server
+    from benchmarks.bench_report_reader import write_report
+    mcp_server = fixture.get()
+    run = server.TestRun({"test_path": "tests/"}, None)
+    mcp_server.store.start_run(run)
+    server.REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    write_report(run.report_file, REPORT_TESTS, 0.01)
+    mcp_server.store.record_results(run.run_id, run.report_file)
+    run.status = "failed"
+    run.finished_at = time.time()
+    mcp_server.store.finish_run(run)
+    return run.run_id
+
+
+@benchmark("server.get_test_results")
+def bench_get_test_results(fixture):
+    return fixture.call("get_test_results", {"run_id": large_run(fixture)})
+
+
+@benchmark("server.get_test_results_last_page")
+def bench_get_test_results_last_page(fixture):
+    return fixture.call("get_test_results", {
+        "run_id": large_run(fixture),
+        "outcome": "all",
+        "offset": REPORT_TESTS - 20
+    })
+
+
+def calls_per_sample(function: Callable[[], object], min_time: float) -> int:
+    """Warm ``function`` up; the calls that make a sample last ``min_time``."""
+    start = time.perf_counter()
+    function()
+    once = time.perf_counter() - start
+    return max(1, math.ceil(min_time / once)) if once > 0 else 1000
+
+
+def sample(function: Callable[[], object], number: int) -> float:
+    """Mean seconds per call over ``number`` calls."""
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start) / number
+
+
+@lru_cache(maxsize=None)
+def u_distribution(m: int, n: int) -> tuple[int, ...]:
+    """Counts of the arrangements of m and n samples giving each U value."""
+    if m == 0 or n == 0:
+        return (1,)
+    counts = [0] * (m * n + 1)
+    for u, count in enumerate(u_distribution(m - 1, n)):
+        counts[u + n] += count
+    for u, count in enumerate(u_distribution(m, n - 1)):
+        counts[u] += count
+    return tuple(counts)
+
+
+def mann_whitney_u(a: list[float], b: list[float]) -> tuple[float, float]:
+    """The U statistic of ``a`` and its two-sided p-value against ``b``.
+
+    The p-value is exact for small samples without ties; otherwise it uses
+    the normal approximation with tie and continuity corrections.
+    """
+    m, n = len(a), len(b)
+    ranked = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    rank_sum = 0.0
+    ties = 0
+    start = 0
+    while start < len(ranked):
+        end = start
+        while end + 1 < len(ranked) and ranked[end + 1][0] == ranked[start][0]:
+            end += 1
+        # Tied values share the mean of their ranks
+        rank = (start + end) / 2 + 1
+        rank_sum += rank * sum(1 for _, group in ranked[start:end + 1] if group == 0)
+        size = end - start + 1
+        ties += size ** 3 - size
+        start = end + 1
+
+    u = rank_sum - m * (m + 1) / 2
+    smaller = min(u, m * n - u)
+    if not ties and m <= EXACT_LIMIT and n <= EXACT_LIMIT:
+        counts = u_distribution(m, n)
+        p = 2 * sum(counts[:int(smaller) + 1]) / math.comb(m + n, m)
+    else:
+        total = m + n
+        variance = m * n / 12 * ((total + 1) - ties / (total * (total - 1)))
+        if variance <= 0:
+            return u, 1.0
+        z = (m * n / 2 - smaller - 0.5) / math.sqrt(variance)
+        p = math.erfc(max(z, 0) / math.sqrt(2))
+    return u, min(p, 1.0)
+
+
+def compare(
+    results: dict, baseline: dict, alpha: float, threshold: float
+) -> list[dict]:
+    """Compare each benchmark's samples with the baseline's."""
+    comparisons = []
+    for name, result in results["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            continue
+        median = statistics.median(result["samples"])
+        base_median = statistics.median(base["samples"])
+        ratio = median / base_median if base_median else 1.0
+        _, p = mann_whitney_u(result["samples"], base["samples"])
+        if p < alpha and ratio > 1 + threshold:
+            status = "regression"
+        elif p < alpha and ratio < 1 - threshold:
+            status = "improvement"
+        else:
+            status = "unchanged"
+        comparisons.append({
+            "name": name,
+            "median": median,
+            "baseline_median": base_median,
+            "ratio": ratio,
+            "p_value": p,
+            "status": status
+        })
+    return comparisons
+
+
+def current_commit() -> str:
+    """The checked-out commit, marked "-dirty" with uncommitted changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short=12", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=PROJECT_ROOT
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "diff", "--quiet", "HEAD"], cwd=PROJECT_ROOT
+        ).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + "-dirty" if dirty else commit
+
+
+def select(patterns: list[str] | None) -> list[Benchmark]:
+    """Benchmarks whose names match any of the glob ``patterns``."""
+    if not patterns:
+        return list(BENCHMARKS.values())
+    return [
+        bench for name, bench in BENCHMARKS.items()
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+    ]
+
+
+def run_suite(benchmarks: list[Benchmark], samples: int, min_time: float) -> dict:
+    """Time each benchmark; the results as stored for a commit."""
+    fixture = ServerFixture()
+    try:
+        functions = {bench.name: bench.setup(fixture) for bench in benchmarks}
+        timings = {
+            name: {"number": calls_per_sample(function, min_time), "samples": []}
+            for name, function in functions.items()
+        }
+        for _ in range(samples):
+            for name, function in functions.items():
+                timings[name]["samples"].append(
+                    sample(function, timings[name]["number"])
+                )
+    finally:
+        fixture.close()
+    return {
+        "commit": current_commit(),
+        "created": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": timings
+    }
+
+
+def load_baseline(results_dir: Path, baseline: str | None) -> dict | None:
+    """The saved baseline, or the stored results of commit ``baseline``."""
+    path = results_dir / (f"{baseline}.json" if baseline else BASELINE_FILE)
+    if not path.exists():
+        if baseline:
+            raise FileNotFoundError(f"No stored results for commit {baseline}")
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save(results: dict, results_dir: Path, save_baseline: bool) -> Path:
+    """Store results under their commit, keeping other benchmarks stored for it."""
+    results_dir.mkdir(parents=True, exist_ok=True)
+    path = results_dir / f"{results['commit']}.json"
+    stored = {}
+    if path.exists():
+        stored = json.loads(path.read_text(encoding="utf-8"))["benchmarks"]
+    path.write_text(
+        json.dumps({**results, "benchmarks": {**stored, **results["benchmarks"]}}),
+        encoding="utf-8"
+    )
+    if save_baseline:
+        shutil.copyfile(path, results_dir / BASELINE_FILE)
+    return path
+
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.2f}µs"
+
+
+def format_report(results: dict, baseline: dict | None, comparisons: list[dict]) -> str:
+    lines = [f"Commit {results['commit']}"]
+    if baseline is not None:
+        lines[0] += f", compared with {baseline['commit']}"
+    by_name = {comparison["name"]: comparison for comparison in comparisons}
+    for name, result in results["benchmarks"].items():
+        samples = result["samples"]
+        line = (
+            f"   {name:<34} median={format_time(statistics.median(samples)):>10} "
+            f"min={format_time(min(samples)):>10}"
+        )
+        comparison = by_name.get(name)
+        if comparison:
+            line += (
+                f"  {comparison['ratio']:6.2f}x  p={comparison['p_value']:.3f}"
+                f"  {comparison['status']}"
+            )
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the suite from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Run the benchmark suite and check for regressions."
+    )
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        help="Glob patterns of benchmarks to run (default: all)",
+    )
+    parser.add_argument("--samples", type=int, default=10, help="Samples per benchmark")
+    parser.add_argument(
+        "--min-time", type=float, default=0.05, help="Least seconds per sample"
+    )
+    parser.add_argument(
+        "--results-dir", type=Path, default=RESULTS_DIR, help="Where results are stored"
+    )
+    parser.add_argument(
+        "--baseline", help="Compare with this commit's results instead of the baseline"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Make these results the baseline"
+    )
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Slowdown of the median, as a fraction, that counts as a regression",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the benchmarks and exit"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    benchmarks = select(args.benchmarks)
+    if args.list:
+        print("\n".join(bench.name for bench in benchmarks))
+        return 0
+    if not benchmarks:
+        print(
+            f"Error: no benchmarks match {' '.join(args.benchmarks)}", file=sys.stderr
+        )
+        return 2
+    if args.samples < 2:
+        print("Error: --samples must be at least 2", file=sys.stderr)
+        return 2
+
+    try:
+        baseline = load_baseline(args.results_dir, args.baseline)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    results = run_suite(benchmarks, args.samples, args.min_time)
+    path = save(results, args.results_dir, args.save_baseline)
+    comparisons = (
+        compare(results, baseline, args.alpha, args.threshold) if baseline else []
+    )
+    regressed = any(comparison["status"] == "regression" for comparison in comparisons)
+
+    if args.json:
+        print(json.dumps({
+            "results": results,
+            "results_file": str(path.resolve()),
+            "baseline": baseline["commit"] if baseline else None,
+            "comparisons": comparisons
+        }))
+    else:
+        print(format_report(results, baseline, comparisons))
+        print(f"\nSaved to {path}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
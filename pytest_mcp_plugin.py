@@ -0,0 +1,288 @@
+"""
+Pytest plugin used by the Pytest MCP Server.
+
+The server loads this plugin into every pytest run it starts
+(``-p pytest_mcp_plugin``). It is driven by environment variables:
+
+- ``PYTEST_MCP_EVENTS`` names a file the plugin appends one JSON object per
+  line to as the run progresses, so the server can stream results while
+  pytest is still running.
+- ``PYTEST_MCP_SELECT`` names a file of test locations, one per line.
+  Only those tests run, in the order listed. The server uses this to hand
+  each shard of a parallel run its share of the suite.
+- ``PYTEST_MCP_COVERAGE`` names a coverage data file. Each test runs in its
+  own coverage context, labelled with its location, so the server can map
+  source lines to the tests that execute them. Requires ``coverage``.
+- ``PYTEST_MCP_PROFILE`` names a directory to write profiles of each test
+  to, and ``PYTEST_MCP_PROFILE_MODES`` says which: ``cpu`` (cProfile),
+  ``memory`` (tracemalloc) or ``cpu,memory``. ``PYTEST_MCP_PROFILE_FRAMES``
+  sets how many frames tracemalloc keeps per allocation.
+
+A test location is the test file's absolute path followed by the part of
+the node ID after the file (``/abs/tests/test_x.py::TestA::test_b``). Unlike
+node IDs, locations do not depend on the rootdir or on the arguments
+pytest was started with.
+"""
+
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+EVENTS_ENV_VAR = "PYTEST_MCP_EVENTS"
+SELECT_ENV_VAR = "PYTEST_MCP_SELECT"
+COVERAGE_ENV_VAR = "PYTEST_MCP_COVERAGE"
+PROFILE_ENV_VAR = "PYTEST_MCP_PROFILE"
+PROFILE_MODES_ENV_VAR = "PYTEST_MCP_PROFILE_MODES"
+PROFILE_FRAMES_ENV_VAR = "PYTEST_MCP_PROFILE_FRAMES"
+
+# Frames kept per traced allocation by default: enough to reach the project
+# code behind most allocations made in a library. Tracing slows allocations
+# down in proportion.
+PROFILE_FRAMES = 10
+
+# Longest failure text written to the event stream
+MAX_LONGREPR = 2000
+
+
+def location_of(item):
+    """The location of a test item (see the module docstring)."""
+    return f"{Path(item.path).resolve()}::{item.nodeid.partition('::')[2]}"
+
+
+def describe_item(item):
+    """Describe a collected test for the server's collection index."""
+    cls = getattr(item, "cls", None)
+    return {
+        "nodeid": item.nodeid,
+        "path": str(item.path),
+        "class": cls.__name__ if cls is not None else None,
+        "function": getattr(item, "originalname", item.name),
+        "markers": sorted({marker.name for marker in item.iter_markers()}),
+        "keywords": sorted(keyword for keyword in item.keywords if keyword),
+    }
+
+
+class EventStream:
+    """Write run events to a JSON-lines file, flushing after every line."""
+
+    def __init__(self, path):
+        self.file = open(path, "a", encoding="utf-8")
+        self.collect_errors = []
+
+    def write(self, event, **data):
+        data["event"] = event
+        self.file.write(json.dumps(data) + "\n")
+        self.file.flush()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_make_collect_report(self, collector):
+        outcome = yield
+        report = outcome.get_result()
+        if report.failed:
+            self.collect_errors.append({
+                "nodeid": report.nodeid,
+                "path": str(Path(collector.path).resolve()),
+                "longrepr": str(report.longrepr)[-MAX_LONGREPR:],
+            })
+
+    def pytest_collection_finish(self, session):
+        data = {"count": len(session.items)}
+        if session.config.option.collectonly:
+            data["items"] = [describe_item(item) for item in session.items]
+            data["errors"] = self.collect_errors
+        self.write("collected", **data)
+
+    def pytest_runtest_logreport(self, report):
+        # One record per test: the call phase, or the phase that stopped it
+        if report.when != "call" and report.passed:
+            return
+
+        outcome = report.outcome
+        if report.when != "call" and report.failed:
+            outcome = "error"
+
+        data = {
+            "nodeid": report.nodeid,
+            "outcome": outcome,
+            "when": report.when,
+            "duration": report.duration,
+        }
+        if report.failed:
+            data["longrepr"] = str(report.longrepr)[-MAX_LONGREPR:]
+        self.write("test", **data)
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        self.write("finished", exitstatus=int(exitstatus))
+
+    def pytest_unconfigure(self, config):
+        self.file.close()
+
+
+class Selection:
+    """Restrict a session to a fixed list of test locations, in list order."""
+
+    def __init__(self, path):
+        with open(path, encoding="utf-8") as f:
+            self.locations = [line.rstrip("\n") for line in f if line.strip()]
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config, items):
+        by_location = {location_of(item): item for item in items}
+        selected = [
+            by_location[location] for location in self.locations
+            if location in by_location
+        ]
+        chosen = set(map(id, selected))
+        deselected = [item for item in items if id(item) not in chosen]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+
+class ImpactRecorder:
+    """Measure coverage with one dynamic context per test."""
+
+    def __init__(self, data_file, source):
+        import coverage
+
+        # data_suffix keeps the files of concurrent shards apart
+        self.coverage = coverage.Coverage(
+            data_file=data_file,
+            data_suffix=True,
+            source=[source],
+            config_file=False,
+        )
+        self.coverage.start()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        self.coverage.switch_context(location_of(item))
+        yield
+        self.coverage.switch_context("")
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_unconfigure(self, config):
+        self.coverage.stop()
+        self.coverage.save()
+
+
+class Profiler:
+    """Profile the CPU time and memory allocations of each test.
+
+    CPU profiles of all tests are merged into one cProfile profile, saved as
+    ``cpu-<pid>.pstats``. For memory, tracemalloc's traces are cleared before
+    each test's setup, so a snapshot taken after its call holds just what the
+    test allocated and still held; that is summed over tests per allocation
+    site. Each site is the line that allocated, and its ``project_sites``
+    counterpart the innermost line of project code on the way there. Those
+    totals, and each test's duration and peak memory, are saved as
+    ``profile-<pid>.json``.
+    """
+
+    def __init__(self, directory, modes, rootdir, frames=PROFILE_FRAMES):
+        self.directory = directory
+        self.rootdir = rootdir
+        self.cpu = cProfile.Profile() if "cpu" in modes else None
+        self.memory = "memory" in modes
+        self.sites = {}
+        self.project_sites = {}
+        self.tests = {}
+        self.started_tracing = False
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self.started_tracing = True
+
+    def in_project(self, filename):
+        return (
+            filename.startswith(self.rootdir + os.sep)
+            and "site-packages" not in Path(filename).parts
+            and filename != __file__
+        )
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        if self.memory:
+            tracemalloc.clear_traces()
+        start = time.perf_counter()
+        if self.cpu:
+            self.cpu.enable()
+        yield
+        if self.cpu:
+            self.cpu.disable()
+
+        test = {"duration": time.perf_counter() - start}
+        if self.memory:
+            test["peak"] = tracemalloc.get_traced_memory()[1]
+        self.tests[item.nodeid] = test
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        yield
+        if not self.memory:
+            return
+        if self.cpu:
+            self.cpu.disable()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        for statistic in snapshot.statistics("traceback"):
+            frames = list(statistic.traceback)
+            self.add_site(self.sites, frames[-1], statistic)
+            project = [frame for frame in frames if self.in_project(frame.filename)]
+            if project:
+                self.add_site(self.project_sites, project[-1], statistic)
+        if self.cpu:
+            self.cpu.enable()
+
+    @staticmethod
+    def add_site(sites, frame, statistic):
+        key = f"{frame.filename}:{frame.lineno}"
+        size, count = sites.get(key, (0, 0))
+        sites[key] = (size + statistic.size, count + statistic.count)
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_unconfigure(self, config):
+        if self.started_tracing:
+            tracemalloc.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        pid = os.getpid()
+        # pstats cannot load a profile that never ran
+        if self.cpu and self.tests:
+            self.cpu.dump_stats(os.path.join(self.directory, f"cpu-{pid}.pstats"))
+        with open(
+            os.path.join(self.directory, f"profile-{pid}.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump({
+                "rootdir": self.rootdir,
+                "tests": self.tests,
+                "sites": self.sites,
+                "project_sites": self.project_sites,
+            }, f)
+
+
+def pytest_configure(config):
+    path = os.environ.get(EVENTS_ENV_VAR)
+    if path:
+        config.pluginmanager.register(EventStream(path), "mcp-event-stream")
+
+    path = os.environ.get(SELECT_ENV_VAR)
+    if path:
+        config.pluginmanager.register(Selection(path), "mcp-selection")
+
+    path = os.environ.get(COVERAGE_ENV_VAR)
+    if path:
+        recorder = ImpactRecorder(path, str(config.rootpath))
+        config.pluginmanager.register(recorder, "mcp-impact-recorder")
+
+    path = os.environ.get(PROFILE_ENV_VAR)
+    if path:
+        modes = os.environ.get(PROFILE_MODES_ENV_VAR, "cpu").split(",")
+        frames = int(os.environ.get(PROFILE_FRAMES_ENV_VAR, PROFILE_FRAMES))
+        profiler = Profiler(path, modes, str(config.rootpath), frames)
+        config.pluginmanager.register(profiler, "mcp-profiler")
@@ -0,0 +1,159 @@
+"""
+Long-lived pytest worker used by the Pytest MCP Server's warm pool.
+
+The worker imports pytest and the project's test modules once, then runs
+requests read from stdin through ``pytest.main`` in the same interpreter,
+so a small targeted run does not pay for interpreter startup and imports.
+
+Protocol: one JSON object per line in each direction.
+
+- Request: ``{"args": [...pytest arguments...], "env": {...}}``. ``env``
+  holds environment variables set for the duration of the run.
+- Response: ``{"returncode": int, "stdout": str, "stderr": str,
+  "cpu": float, "modules": {path: mtime_ns}}``. ``cpu`` is the CPU time the
+  run took, in seconds. ``modules`` lists the non-installed source files
+  loaded in the worker, so the server can retire the worker once any of them
+  changes on disk.
+
+The worker writes ``{"ready": true, ...}`` once it has warmed up by
+collecting the default test paths, plus any paths listed in the
+``PYTEST_MCP_WARMUP`` environment variable.
+"""
+
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+import pytest_mcp_plugin
+
+
+def loaded_source_modules():
+    """Map source files imported in this process to their mtimes.
+
+    Modules from the Python installation and installed packages are left
+    out; everything else (the project, its tests, test files elsewhere) is
+    reported.
+    """
+    prefixes = {
+        Path(p).resolve() for p in (sys.prefix, sys.base_prefix, sys.exec_prefix)
+    }
+    modules = {}
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if not path:
+            continue
+        path = Path(path).resolve()
+        if prefixes.intersection(path.parents):
+            continue
+        if "site-packages" in path.parts or "dist-packages" in path.parts:
+            continue
+        try:
+            modules[str(path)] = path.stat().st_mtime_ns
+        except OSError:
+            pass
+    return modules
+
+
+def run_pytest(args, env):
+    """Run pytest in-process with stdout and stderr captured at fd level."""
+    # The plugin is already imported here; registering the module object
+    # avoids pytest's "already imported, cannot be rewritten" warning
+    plugins = []
+    if "pytest_mcp_plugin" in args:
+        index = args.index("pytest_mcp_plugin")
+        if index > 0 and args[index - 1] == "-p":
+            args = args[:index - 1] + args[index + 1:]
+            plugins.append(pytest_mcp_plugin)
+
+    saved_env = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved_out, saved_err = os.dup(1), os.dup(2)
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        try:
+            returncode = int(pytest.main(args, plugins=plugins))
+        except BaseException as e:
+            print(f"pytest worker error: {e!r}", file=sys.stderr)
+            returncode = 3
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_out, 1)
+            os.dup2(saved_err, 2)
+            os.close(saved_out)
+            os.close(saved_err)
+
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+        out.seek(0)
+        err.seek(0)
+        return (
+            returncode,
+            out.read().decode(errors="replace"),
+            err.read().decode(errors="replace"),
+        )
+
+
+def main():
+    """Serve pytest runs over stdin/stdout until stdin closes."""
+    # The server stops workers by closing stdin or killing them; Ctrl-C in
+    # the server's terminal is for the server
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Keep private copies of the protocol streams; fds 0-2 belong to pytest
+    requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    responses = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+
+    # Warm up: collecting the default test paths imports everything the
+    # tests import
+    warmup = ["--collect-only", "-q", "-p", "no:cacheprovider"]
+    warmup.extend(
+        filter(None, os.environ.get("PYTEST_MCP_WARMUP", "").split(os.pathsep))
+    )
+    run_pytest(warmup, {})
+
+    def respond(data):
+        try:
+            responses.write(json.dumps(data) + "\n")
+            responses.flush()
+        except BrokenPipeError:
+            # The server is gone. Exit without flushing anything else, which
+            # would only raise the same error again at shutdown
+            os._exit(0)
+
+    respond({"ready": True, "modules": loaded_source_modules()})
+
+    for line in requests:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        cpu_start = time.process_time()
+        returncode, stdout, stderr = run_pytest(request["args"], request.get("env", {}))
+        respond({
+            "returncode": returncode,
+            "stdout": stdout,
+            "stderr": stderr,
+            "cpu": time.process_time() - cpu_start,
+            "modules": loaded_source_modules(),
+        })
+
+
+if __name__ == "__main__":
+    main()
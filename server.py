@@ -1,19 +1,2682 @@
 #!/usr/bin/env python3
+import argparse
+import ast
 import asyncio
+import collections
+import contextlib
+import ctypes
+import ctypes.util
+import fnmatch
+import hashlib
+import heapq
+import importlib.metadata
+import itertools
 import json
-import subprocess
+import math
+import os
+import pstats
+import re
+import shutil
+import sqlite3
+import statistics
+import struct
 import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Awaitable, Callable, Iterable, Iterator
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
+try:
+    import coverage
+except ImportError:  # Only needed for test-impact selection
+    coverage = None
+
+try:
+    import resource
+except ImportError:  # Not on Windows; subprocess CPU time is then not reported
+    resource = None
+
+try:
+    import uvicorn
+    from mcp.server.sse import SseServerTransport
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from mcp.server.transport_security import TransportSecuritySettings
+except ImportError:  # Only needed for the HTTP transport
+    uvicorn = None
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+
+# Working data kept between runs (test durations, ...)
+DATA_DIR = Path(os.environ.get("PYTEST_MCP_DATA_DIR", ".pytest_mcp"))
+DURATIONS_FILE = DATA_DIR / "durations.json"
+INDEX_FILE = DATA_DIR / "collection_index.json"
+
+# Full outputs of runs too large to return inline
+OUTPUT_DIR = DATA_DIR / "outputs"
+
+# CPU profiles saved by 'profile_tests', for viewing with pstats or snakeviz
+PROFILES_DIR = DATA_DIR / "profiles"
+
+# Results of 'run_benchmarks' per commit, and the saved baseline
+BENCHMARKS_DIR = DATA_DIR / "benchmarks"
+
+# Orders 'profile_tests' ranks functions in, and the field each sorts by
+PROFILE_SORT_KEYS = {
+    "cumulative": "cumulative_time",
+    "tottime": "own_time",
+    "calls": "calls",
+}
+
+# Files pytest collects tests from by default
+TEST_FILE_PATTERNS = ("test_*.py", "*_test.py")
+
+# Tokens of a -m/-k expression: parentheses, or a name or operator
+EXPRESSION_TOKEN = re.compile(r"[()]|[^\s()]+")
+
+# Directories never searched for test files (pytest's norecursedirs defaults)
+SKIP_DIRS = {"build", "dist", "node_modules", "venv", "CVS", "_darcs", "{arch}"}
+
+# History of runs and their per-test results, and each run's JSON report
+RESULTS_DB = DATA_DIR / "results.sqlite3"
+REPORTS_DIR = DATA_DIR / "reports"
+
+# Runs kept in the history before the oldest are evicted
+MAX_STORED_RUNS = int(os.environ.get("PYTEST_MCP_MAX_STORED_RUNS", "200"))
+MAX_RUN_AGE_DAYS = float(os.environ.get("PYTEST_MCP_MAX_RUN_AGE_DAYS", "30"))
+
+# Longest failure text stored per test result
+MAX_STORED_LONGREPR = 10000
+
+# Map of the source lines each test executes, for 'run_affected_tests'
+IMPACT_DB = DATA_DIR / "impact.sqlite3"
+
+# Outcomes of tests whose inputs have not changed since they passed
+RESULT_CACHE_DB = DATA_DIR / "result_cache.sqlite3"
+
+# Cached test results kept before the least recently used are evicted
+MAX_CACHED_RESULTS = int(os.environ.get("PYTEST_MCP_MAX_CACHED_RESULTS", "10000"))
+
+# Outcomes served from the result cache; anything else always runs again
+CACHEABLE_OUTCOMES = ("passed", "skipped")
+
+# Files that configure pytest for every test under the working directory
+PYTEST_CONFIG_FILES = (
+    "pytest.ini",
+    ".pytest.ini",
+    "pyproject.toml",
+    "tox.ini",
+    "setup.cfg",
+)
+
+# Environment variables that can change test outcomes
+CACHE_ENV_VARS = ("PYTEST_ADDOPTS", "PYTHONPATH", "PYTHONHASHSEED", "DISPLAY")
+
+PYTEST_COMMAND = [sys.executable, "-m", "pytest"]
+
+# Warm pytest worker processes kept by the server
+WARM_WORKERS = int(os.environ.get("PYTEST_MCP_WARM_WORKERS", "2"))
+
+# Runs a warm worker serves before it is replaced
+MAX_WORKER_RUNS = 50
+
+# Slots for test runs executing at once; further runs wait in the run
+# queue. A run takes one slot per pytest process it starts
+MAX_RUN_SLOTS = int(
+    os.environ.get("PYTEST_MCP_MAX_RUNS", str(max(2, os.cpu_count() or 1)))
+)
+
+# Slots only interactive runs may take, so a few tests can start right
+# away while full suites hold the others
+RESERVED_RUN_SLOTS = int(os.environ.get("PYTEST_MCP_RESERVED_RUN_SLOTS", "1"))
+
+# Seconds a batch run waits before it is queued like an interactive one
+RUN_QUEUE_AGING = float(os.environ.get("PYTEST_MCP_RUN_QUEUE_AGING", "120"))
+
+# Most tests in a selection that counts as an interactive run
+INTERACTIVE_MAX_TESTS = 10
+
+# Largest response line accepted from a warm worker
+WORKER_STREAM_LIMIT = 256 * 1024 * 1024
+
+# Seconds between reads of a run's event stream
+EVENT_POLL_INTERVAL = 0.05
+
+# Directories 'watch_tests' watches unless told otherwise
+WATCH_PATHS = ["src", "tests"]
+
+# Seconds between scans of watched directories when inotify is not available
+WATCH_POLL_INTERVAL = 1.0
+
+# Failures kept on a run for status reports while it is still going
+MAX_TRACKED_FAILURES = 100
+
+# Address the HTTP transport listens on
+HTTP_HOST = os.environ.get("PYTEST_MCP_HOST", "127.0.0.1")
+HTTP_PORT = int(os.environ.get("PYTEST_MCP_PORT", "8000"))
+
+# Endpoints of the HTTP transport: streamable HTTP, and the older SSE transport
+MCP_PATH = "/mcp"
+SSE_PATH = "/sse"
+MESSAGES_PATH = "/messages/"
+
+# Hosts that only accept local connections; requests to them must name one
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+# MCP logging levels, least to most severe
+LOG_LEVELS = [
+    "debug", "info", "notice", "warning", "error", "critical", "alert", "emergency"
+]
+
+# Options shared by every tool that launches a pytest run
+RUN_OPTIONS_SCHEMA = {
+    "test_path": {
+        "type": "string",
+        "description": "Path to test file or directory "
+                     "(e.g., 'tests/' or 'tests/test_calculator.py')"
+    },
+    "markers": {
+        "type": "string",
+        "description": "Pytest markers to filter tests "
+                     "(e.g., 'ui' or 'ui and not slow')"
+    },
+    "verbose": {
+        "type": "boolean",
+        "description": "Show detailed test output",
+        "default": True
+    },
+    "capture": {
+        "type": "string",
+        "description": "Output capture method: 'no', 'sys', or 'fd'",
+        "default": "no"
+    },
+    "workers": {
+        "type": ["integer", "string"],
+        "description": "Number of pytest processes to split the tests across, "
+                     "or 'auto' for one per CPU core",
+        "default": 1
+    },
+    "warm": {
+        "type": "boolean",
+        "description": "Run in a pre-imported worker from the warm pool "
+                     "instead of starting a new pytest process",
+        "default": False
+    },
+    "record_impact": {
+        "type": "boolean",
+        "description": "Record which source lines each test executes, for "
+                     "'run_affected_tests' (needs the 'coverage' package)",
+        "default": False
+    },
+    "order": {
+        "type": "string",
+        "enum": ["collection", "failed_first"],
+        "description": "'collection' runs tests in pytest's order; 'failed_first' "
+                     "runs tests that failed last time first, then tests whose "
+                     "code changed since they last ran, fastest first within each",
+        "default": "collection"
+    },
+    "fail_fast": {
+        "type": "boolean",
+        "description": "Stop at the first failure (pytest -x); failures are "
+                     "then not retried, as later tests never ran",
+        "default": False
+    },
+    "retries": {
+        "type": "integer",
+        "description": "Times to re-run each failed test on its own; tests that "
+                     "then pass are reported as flaky and do not fail the run. "
+                     "By default tests known to be flaky get one retry; 0 "
+                     "turns retries off"
+    },
+    "use_cache": {
+        "type": "boolean",
+        "description": "Skip tests with a cached result from an earlier run with "
+                     "the same code and environment, and cache this run's "
+                     "results. Only Python files, pytest configuration and the "
+                     "environment are hashed; list other files tests read in "
+                     "cache_inputs",
+        "default": False
+    },
+    "cache_inputs": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": "Glob patterns, relative to the working directory, of "
+                     "other files the tests read (data, fixtures, templates); "
+                     "a change to any of them invalidates every cached result"
+    },
+    "priority": {
+        "type": "string",
+        "enum": ["auto", "interactive", "batch"],
+        "description": "Place in the run queue when the server is busy: "
+                     "'interactive' runs go ahead of 'batch' runs. 'auto' makes "
+                     "runs of single tests or a few selected ones interactive",
+        "default": "auto"
+    }
+}
+
+# Options controlling the size and shape of returned results
+RESULT_OPTIONS_SCHEMA = {
+    "format": {
+        "type": "string",
+        "enum": ["markdown", "json"],
+        "description": "'markdown' for readable text, 'json' for a structured "
+                     "summary with per-test records",
+        "default": "markdown"
+    },
+    "max_output_bytes": {
+        "type": "integer",
+        "description": "Largest pytest output returned inline; longer output is "
+                     "saved to a file and only its tail is returned",
+        "default": 50000
+    }
+}
+
+# Filters shared by the run history tools
+HISTORY_FILTERS_SCHEMA = {
+    "since": {
+        "type": "string",
+        "description": "Only runs started at or after this time "
+                     "(ISO 8601, e.g., '2024-05-01T12:00')"
+    },
+    "until": {
+        "type": "string",
+        "description": "Only runs started at or before this time (ISO 8601)"
+    },
+    "limit": {
+        "type": "integer",
+        "description": "Maximum number of entries to return",
+        "default": 20
+    }
+}
+
+# Runs with more failures than this are broken, not flaky: nothing is retried
+MAX_RETRIED_TESTS = 20
+
+# Finished runs kept in the job table before the oldest are dropped
+MAX_FINISHED_RUNS = 100
+
+# Recent values kept per measurement for percentiles, and the percentiles shown
+METRICS_WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Measurements of the server: the label each is broken down by, and its help text
+SUMMARIES = {
+    "tool_seconds": ("tool", "Latency of tool calls"),
+    "request_bytes": ("tool", "Size of tool call arguments"),
+    "response_bytes": ("tool", "Size of tool call responses"),
+    "phase_seconds": ("phase", "Time spent in the server's hot paths"),
+    "subprocess_seconds": ("kind", "Wall time of subprocesses and warm worker runs"),
+    "subprocess_cpu_seconds": ("kind", "CPU time of warm worker runs"),
+    "run_queue_seconds": ("priority", "Time test runs waited in the run queue"),
+}
+
+# File the metrics are written to in Prometheus text format, if any, and
+# seconds between writes
+METRICS_FILE = os.environ.get("PYTEST_MCP_METRICS_FILE")
+METRICS_INTERVAL = float(os.environ.get("PYTEST_MCP_METRICS_INTERVAL", "15"))
+
+
+def run_priority(args: dict, select: list[str] | None = None) -> str:
+    """Queue priority of a run: "interactive" or "batch".
+
+    Unless the run asks for one, runs of node IDs (``path::test``) and of
+    selections of at most ``INTERACTIVE_MAX_TESTS`` tests are interactive.
+    """
+    priority = args.get("priority", "auto")
+    if priority != "auto":
+        return priority
+    if select is not None:
+        return "interactive" if len(select) <= INTERACTIVE_MAX_TESTS else "batch"
+    return "interactive" if "::" in args.get("test_path", "tests/") else "batch"
+
+
+# Keys of the client sessions seen so far; a session's goes when it does
+SESSION_IDS: weakref.WeakKeyDictionary[Any, str] = weakref.WeakKeyDictionary()
+SESSION_NUMBERS = itertools.count(1)
+
+
+def session_id(session: Any) -> str:
+    """A client session's key in the run queue's fair sharing.
+
+    Sessions are numbered as they are first seen, as ``id()`` values are
+    reused once a session is gone. Without a session the key is "".
+    """
+    if session is None:
+        return ""
+    key = SESSION_IDS.get(session)
+    if key is None:
+        key = SESSION_IDS[session] = f"session-{next(SESSION_NUMBERS)}"
+    return key
+
+
+def plan_shards(
+    node_ids: list[str],
+    workers: int,
+    durations: dict[str, float]
+) -> list[list[str]]:
+    """Split node IDs into at most ``workers`` shards of similar duration.
+
+    Tests are handed out longest first to the least loaded shard, using
+    durations recorded by earlier runs. Tests without a recorded duration
+    count as the average known duration. Each shard keeps the collection
+    order so module and class fixtures are still shared.
+    """
+    if not node_ids:
+        return []
+    
+    workers = min(workers, len(node_ids))
+    default = sum(durations.values()) / len(durations) if durations else 1.0
+    order = {node_id: index for index, node_id in enumerate(node_ids)}
+    by_duration = sorted(node_ids, key=lambda n: -durations.get(n, default))
+    
+    loads = [(0.0, index) for index in range(workers)]
+    shards: list[list[str]] = [[] for _ in range(workers)]
+    for node_id in by_duration:
+        load, index = heapq.heappop(loads)
+        shards[index].append(node_id)
+        heapq.heappush(loads, (load + durations.get(node_id, default), index))
+    
+    return [sorted(shard, key=order.__getitem__) for shard in shards]
+
+
+def order_tests(
+    tests: list[dict],
+    last_results: dict[str, dict],
+    durations: dict[str, float],
+    test_files: dict[str, list[str]] | None = None
+) -> list[dict]:
+    """Order tests so that a run gives its most useful signal first.
+
+    Tests whose last stored result was a failure or error come first, then
+    tests that changed since they last ran (or never ran), then the rest;
+    each group runs fastest first. A test has changed when its file, or a
+    source file it executed according to ``test_files`` (test location to
+    files), was modified after its last run.
+    """
+    default = sum(durations.values()) / len(durations) if durations else 1.0
+    mtimes: dict[str, float] = {}
+    
+    def mtime(path: str) -> float:
+        if path not in mtimes:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                # A file that is gone counts as changed
+                mtimes[path] = float("inf")
+        return mtimes[path]
+    
+    def key(test: dict) -> tuple[int, float]:
+        last = last_results.get(test["nodeid"])
+        files = [test["path"], *(test_files or {}).get(location_of(test), [])]
+        if last is not None and last["outcome"] in ("failed", "error"):
+            group = 0
+        elif last is None or any(mtime(path) > last["started_at"] for path in files):
+            group = 1
+        else:
+            group = 2
+        return group, durations.get(test["nodeid"], default)
+    
+    return sorted(tests, key=key)
+
+
+def merge_json_reports(reports: list[dict]) -> dict:
+    """Merge pytest-json-report reports from the shards of one run."""
+    merged = dict(reports[0])
+    merged["created"] = min(report.get("created", 0) for report in reports)
+    merged["duration"] = max(report.get("duration", 0) for report in reports)
+    
+    # Any failure fails the run; otherwise report the most severe exit code
+    exitcodes = [report.get("exitcode", 0) for report in reports]
+    if 1 in exitcodes:
+        merged["exitcode"] = 1
+    elif any(code not in (0, 5) for code in exitcodes):
+        merged["exitcode"] = max(code for code in exitcodes if code not in (0, 5))
+    else:
+        merged["exitcode"] = 0 if 0 in exitcodes else 5
+    
+    summary: dict[str, int] = {}
+    for report in reports:
+        for key, value in report.get("summary", {}).items():
+            if key == "collected":
+                # Every shard collects the whole selection
+                summary[key] = max(summary.get(key, 0), value)
+            elif key != "deselected":
+                summary[key] = summary.get(key, 0) + value
+    merged["summary"] = summary
+    
+    collectors = {}
+    for report in reports:
+        for collector in report.get("collectors", []):
+            collectors.setdefault(collector.get("nodeid"), collector)
+    merged["collectors"] = list(collectors.values())
+    
+    for key in ("tests", "warnings"):
+        merged[key] = [item for report in reports for item in report.get(key, [])]
+    
+    return merged
+
+
+def file_stamp(path: str) -> list[int]:
+    """The (mtime, size) stamp a collection index entry is keyed on."""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def discover_test_files(test_path: str) -> tuple[list[str], dict[str, list[int]]]:
+    """Find the test files and conftest.py files that apply to a test path.
+
+    Returns the resolved test file paths in collection order, and the
+    stamps of every conftest.py under the path or in a directory above it
+    (up to the working directory).
+    """
+    base = Path(test_path.split("::")[0]).resolve()
+    files = []
+    conftests = {}
+    
+    if base.is_file():
+        files.append(str(base))
+        top = base.parent
+    elif base.is_dir():
+        top = base
+        for dirpath, dirnames, filenames in os.walk(base):
+            dirnames[:] = sorted(
+                d
+                for d in dirnames
+                if not d.startswith(".")
+                and not d.endswith(".egg")
+                and d not in SKIP_DIRS
+                and d != "__pycache__"
+            )
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                if filename == "conftest.py":
+                    conftests[path] = file_stamp(path)
+                elif any(fnmatch.fnmatch(filename, p) for p in TEST_FILE_PATTERNS):
+                    files.append(path)
+    else:
+        return [], {}
+    
+    cwd = Path.cwd().resolve()
+    for parent in [top, *top.parents]:
+        conftest = parent / "conftest.py"
+        if conftest.is_file():
+            conftests[str(conftest)] = file_stamp(str(conftest))
+        if parent == cwd or cwd not in parent.parents:
+            break
+    
+    return files, conftests
+
+
+def location_of(test: dict) -> str:
+    """Location of an indexed test, as understood by PYTEST_MCP_SELECT."""
+    return f"{test['path']}::{test['nodeid'].partition('::')[2]}"
+
+
+def match_expression(
+    expression: str, names: list[str], substring: bool = False
+) -> bool:
+    """Evaluate a pytest -m/-k style expression against a test's names.
+
+    Expressions combine names with ``and``, ``or``, ``not`` and parentheses.
+    With ``substring``, a name in the expression matches any name that
+    contains it, ignoring case (the -k rules); otherwise names must match
+    exactly (the -m rules). Raises ``ValueError`` for a malformed expression.
+    """
+    if substring:
+        lowered = [name.lower() for name in names]
+        matches = lambda name: any(name.lower() in n for n in lowered)
+    else:
+        matches = lambda name: name in names
+    
+    tokens = EXPRESSION_TOKEN.findall(expression)
+    if not tokens:
+        return True
+    position = 0
+    
+    def error(message: str) -> ValueError:
+        return ValueError(f"Invalid expression {expression!r}: {message}")
+    
+    def take() -> str:
+        nonlocal position
+        if position == len(tokens):
+            raise error("unexpected end")
+        position += 1
+        return tokens[position - 1]
+    
+    def any_of() -> bool:
+        result = all_of()
+        while position < len(tokens) and tokens[position] == "or":
+            take()
+            right = all_of()
+            result = result or right
+        return result
+    
+    def all_of() -> bool:
+        result = negation()
+        while position < len(tokens) and tokens[position] == "and":
+            take()
+            right = negation()
+            result = result and right
+        return result
+    
+    def negation() -> bool:
+        token = take()
+        if token == "not":
+            return not negation()
+        if token == "(":
+            result = any_of()
+            if take() != ")":
+                raise error("expected ')'")
+            return result
+        if token in (")", "and", "or"):
+            raise error(f"unexpected {token!r}")
+        return matches(token)
+    
+    result = any_of()
+    if position != len(tokens):
+        raise error(f"unexpected {tokens[position]!r}")
+    return result
+
+
+class CollectionIndex:
+    """Persistent index of collected tests, keyed by test file.
+
+    Each file entry holds the file's (mtime, size) stamp from when it was
+    collected and its tests: node ID, class and function name, markers and
+    keywords. Only files whose stamp changed are collected again; a changed
+    conftest.py invalidates every file, and files that failed to collect are
+    always retried since the fix may live in another module.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.files: dict[str, dict] = {}
+        self.conftests: dict[str, list[int]] = {}
+        self.lock = asyncio.Lock()
+        self.load()
+    
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == self.VERSION:
+            self.files = data.get("files", {})
+            self.conftests = data.get("conftests", {})
+    
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "version": self.VERSION,
+                "files": self.files,
+                "conftests": self.conftests
+            }, f)
+        os.replace(tmp, self.path)
+    
+    def stale_files(
+        self, files: list[str], conftests: dict[str, list[int]]
+    ) -> list[str]:
+        """Files that have to be collected again."""
+        conftest_changed = any(
+            self.conftests.get(path) != stamp for path, stamp in conftests.items()
+        ) or any(not os.path.exists(path) for path in self.conftests)
+        if conftest_changed:
+            return list(files)
+        
+        stale = []
+        for path in files:
+            entry = self.files.get(path)
+            if (
+                entry is None
+                or entry.get("errors")
+                or entry["stamp"] != file_stamp(path)
+            ):
+                stale.append(path)
+        return stale
+    
+    def update(
+        self,
+        files: list[str],
+        items: list[dict],
+        errors: list[dict],
+        conftests: dict[str, list[int]]
+    ):
+        """Store fresh collection results for ``files``."""
+        tests: dict[str, list[dict]] = {path: [] for path in files}
+        for item in items:
+            path = str(Path(item.pop("path")).resolve())
+            tests.setdefault(path, []).append(item)
+        
+        for path, file_tests in tests.items():
+            if not os.path.exists(path):
+                continue
+            self.files[path] = {
+                "stamp": file_stamp(path),
+                "tests": file_tests,
+                "errors": [error for error in errors if error["path"] == path]
+            }
+        
+        self.conftests = {
+            path: stamp
+            for path, stamp in self.conftests.items()
+            if os.path.exists(path)
+        }
+        self.conftests.update(conftests)
+        
+        # Forget files that were deleted
+        for path in [path for path in self.files if not os.path.exists(path)]:
+            del self.files[path]
+    
+    def select(
+        self,
+        test_path: str,
+        files: list[str],
+        markers: str | None = None,
+        keyword: str | None = None
+    ) -> list[dict]:
+        """Indexed tests under ``test_path`` that match the filters."""
+        suffix = test_path.partition("::")[2]
+        selected = []
+        for path in files:
+            for test in self.files.get(path, {}).get("tests", []):
+                if suffix:
+                    rest = test["nodeid"].partition("::")[2]
+                    if not (
+                        rest == suffix or rest.startswith((suffix + "::", suffix + "["))
+                    ):
+                        continue
+                if markers and not match_expression(markers, test["markers"]):
+                    continue
+                if keyword and not match_expression(
+                    keyword, test["keywords"], substring=True
+                ):
+                    continue
+                selected.append({**test, "path": path})
+        return selected
+    
+    def errors(self, files: list[str]) -> list[dict]:
+        return [
+            error
+            for path in files
+            for error in self.files.get(path, {}).get("errors", [])
+        ]
+
+
+class TestRun:
+    """A pytest run tracked in the server's in-process job table."""
+    
+    # Keep pytest from trying to collect this class if the module is imported
+    __test__ = False
+    
+    def __init__(self, args: dict, timeout: float | None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.args = args
+        self.cmd: list[str] = []
+        self.report_file = str((REPORTS_DIR / f"{self.run_id}.json").absolute())
+        
+        # Locations of the only tests to run, in order, if not all under the
+        # test path
+        self.select: list[str] | None = None
+        
+        # Failed tests that passed when retried on their own
+        self.flaky: list[str] = []
+        
+        # Result cache keys of the run's tests, and the cached results used
+        # instead of running tests
+        self.cache_keys: dict[str, str] = {}
+        self.cached: list[dict] = []
+        self.timeout = timeout
+        self.shards = 1
+        self.status = "queued"
+        
+        # Place in the run queue: priority, the client session that started
+        # the run (for fair sharing), slots wanted, and when it was admitted
+        self.priority = "batch"
+        self.client = ""
+        self.slots = 1
+        self.admitted_at: float | None = None
+        self.returncode: int | None = None
+        self.stdout = ""
+        self.stderr = ""
+        self.error: str | None = None
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self.done = asyncio.Event()
+        
+        # Live progress, fed by the pytest_mcp_plugin event stream
+        self.collected: int | None = None
+        self.counts: dict[str, int] = {}
+        self.failures: list[dict] = []
+        self.listeners: list[Callable[["TestRun", dict], Awaitable[None]]] = []
+    
+    @property
+    def finished(self) -> bool:
+        return self.done.is_set()
+    
+    @property
+    def completed(self) -> int:
+        return sum(self.counts.values())
+    
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.started_at
+    
+    def finish(self, status: str):
+        """Mark the run as finished with the given status."""
+        self.status = status
+        self.finished_at = time.time()
+        self.done.set()
+
+
+class JsonStream:
+    """Scan a JSON document from a file one value at a time."""
+    
+    WHITESPACE = re.compile(r"[ \t\n\r]*")
+    
+    # Everything up to the next bracket that opens a nested container: plain
+    # text, whole strings, and containers holding no other containers. The
+    # lookahead-backreference pairs are atomic groups, which keep a cut-off
+    # container at the end of the buffer from backtracking exponentially.
+    # A bracket or quote left where the match stops is handled by skip().
+    SKIPPABLE = re.compile(
+        r'(?:(?=([^\[\]{}"]+))\1'
+        r'|"[^"\\]*(?:\\.[^"\\]*)*"'
+        r'|\{(?:(?=([^\[\]{}"]+))\2|"[^"\\]*(?:\\.[^"\\]*)*")*\}'
+        r'|\[(?:(?=([^\[\]{}"]+))\3|"[^"\\]*(?:\\.[^"\\]*)*")*\])*',
+        re.S
+    )
+    DELIMITERS = (" ", "\t", "\n", "\r", ",", ":", "]", "}")
+    DECODER = json.JSONDecoder()
+    
+    def __init__(self, file, chunk_size: int = 1 << 16):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self, size: int | None = None) -> bool:
+        """Append the next chunk to the buffer, dropping what was consumed."""
+        if self.eof:
+            return False
+        data = self.file.read(size or self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+    
+    def peek(self) -> str:
+        """The next non-whitespace character, or "" at the end of the file."""
+        while True:
+            self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+    
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(
+                f"Expected {char!r} at offset {self.pos} of the JSON stream"
+            )
+        self.pos += 1
+    
+    def value(self) -> Any:
+        """Decode the next complete value."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.DECODER.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                end = None
+            # A number cut off by the end of the buffer ("12." of "12.5") still
+            # decodes, so only trust values followed by a delimiter
+            if end is not None and (
+                self.eof or self.buffer[end : end + 1] in self.DELIMITERS
+            ):
+                self.pos = end
+                return value
+            if not self._fill(size):
+                if end is not None:
+                    self.pos = end
+                    return value
+                raise ValueError(f"Truncated JSON value at offset {self.pos}")
+            # Grow reads for values larger than a chunk to keep retries few
+            size *= 2
+    
+    def skip(self):
+        """Step over the next value without building it."""
+        if self.peek() not in ("[", "{"):
+            self.value()
+            return
+        
+        # Step into the value first, so SKIPPABLE cannot run past its end
+        self.pos += 1
+        depth = 1
+        while True:
+            self.pos = self.SKIPPABLE.match(self.buffer, self.pos).end()
+            char = self.buffer[self.pos:self.pos + 1]
+            if not char or char == '"':
+                # The buffer ends inside a string (or just ends): read on
+                if not self._fill():
+                    raise ValueError("Truncated JSON value")
+                continue
+            
+            self.pos += 1
+            depth += 1 if char in "[{" else -1
+            if depth == 0:
+                return
+    
+    def items(self) -> Iterator[Any]:
+        """Iterate over the elements of the array that comes next."""
+        self.expect("[")
+        while True:
+            char = self.peek()
+            if char == "]":
+                self.pos += 1
+                return
+            if char == ",":
+                self.pos += 1
+                continue
+            if not char:
+                raise ValueError("Truncated JSON array")
+            yield self.value()
+
+
+def iter_report_tests(path: str | Path, header: dict | None = None) -> Iterator[dict]:
+    """Yield the test records of a pytest-json-report file one at a time.
+    
+    The report is read incrementally, so memory use does not grow with the
+    number of tests. Other top-level fields are decoded into ``header`` as
+    they are passed, except the per-test bulk of "collectors" and "warnings",
+    which is skipped. pytest-json-report writes "summary" before "tests", so
+    the summary is in ``header`` by the time the first test is yielded.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        stream = JsonStream(f)
+        stream.expect("{")
+        while True:
+            char = stream.peek()
+            if char == "}":
+                return
+            if char == ",":
+                stream.pos += 1
+                continue
+            if not char:
+                raise ValueError("Truncated JSON report")
+            
+            key = stream.value()
+            stream.expect(":")
+            if key == "tests":
+                yield from stream.items()
+            elif key in ("collectors", "warnings"):
+                stream.skip()
+            else:
+                value = stream.value()
+                if header is not None:
+                    header[key] = value
+
+
+def test_longrepr(test: dict) -> str:
+    """Failure text of a pytest-json-report test record."""
+    for phase in ("setup", "call", "teardown"):
+        longrepr = test.get(phase, {}).get("longrepr")
+        if longrepr:
+            return longrepr
+    return ""
+
+
+def test_duration(test: dict) -> float:
+    """Total setup, call and teardown time of a pytest-json-report test record."""
+    return sum(
+        test.get(phase, {}).get("duration", 0)
+        for phase in ("setup", "call", "teardown")
+    )
+
+
+def paginate(
+    records: Iterable[dict],
+    offset: int,
+    limit: int,
+    max_bytes: int
+) -> tuple[list[dict], int, int | None]:
+    """Take one page of records within a count and byte budget.
+
+    Returns the page, the total number of records and the offset of the next
+    page (None when this is the last one). A page always holds at least one
+    record, even if that record alone exceeds ``max_bytes``.
+    """
+    page = []
+    used = 0
+    total = 0
+    next_offset = None
+    for index, record in enumerate(records):
+        total += 1
+        if index < offset or next_offset is not None:
+            continue
+        size = len(json.dumps(record))
+        if len(page) >= limit or (page and used + size > max_bytes):
+            next_offset = index
+            continue
+        page.append(record)
+        used += size
+    return page, total, next_offset
+
+
+def truncate(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+
+def parse_time(value: str) -> float:
+    """Parse an ISO 8601 date/time (local time unless it has an offset)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(
+            f"Invalid time {value!r}: expected ISO 8601, e.g. 2024-05-01T12:00"
+        )
+
+
+def format_time(timestamp: float | None) -> str:
+    if timestamp is None:
+        return "-"
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 0.001:
+        return f"{seconds * 1e6:.1f}µs"
+    if seconds < 1:
+        return f"{seconds * 1000:.1f}ms"
+    if seconds < 60:
+        return f"{seconds:.2f}s"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+
+
+def format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class SQLiteStore:
+    """Base for the server's SQLite databases.
+
+    Subclasses define ``SCHEMA``; a database written with another
+    ``VERSION`` is dropped and recreated. Every call opens its own
+    connection, so a store can be used from worker threads and shared by
+    several server processes.
+    """
+    
+    VERSION = 1
+    SCHEMA = ""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            if db.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+                tables = db.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                )
+                for (name,) in tables.fetchall():
+                    db.execute(f'DROP TABLE "{name}"')
+            db.executescript(self.SCHEMA)
+            db.execute(f"PRAGMA user_version = {self.VERSION}")
+    
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+
+class ResultStore(SQLiteStore):
+    """SQLite history of test runs and their per-test results.
+
+    A run gets a row when it starts. When it finishes, its JSON report is
+    streamed into one row per test, indexed by run and by node ID. The
+    oldest runs are evicted, together with their report files, once more
+    than ``max_runs`` are stored or they are older than ``max_age`` seconds.
+    """
+    
+    VERSION = 1
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            test_path TEXT,
+            markers TEXT,
+            pid INTEGER,
+            started_at REAL NOT NULL,
+            finished_at REAL,
+            returncode INTEGER,
+            error TEXT,
+            exitcode INTEGER,
+            duration REAL,
+            summary TEXT,
+            report_file TEXT
+        );
+        CREATE INDEX IF NOT EXISTS runs_by_time ON runs (started_at);
+        CREATE TABLE IF NOT EXISTS results (
+            run_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            nodeid TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            duration REAL,
+            longrepr TEXT,
+            PRIMARY KEY (run_id, position)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS results_by_nodeid ON results (nodeid, run_id);
+        CREATE TABLE IF NOT EXISTS last_results (
+            nodeid TEXT PRIMARY KEY,
+            outcome TEXT NOT NULL,
+            started_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS flaky (
+            nodeid TEXT PRIMARY KEY,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            count INTEGER NOT NULL
+        );
+    """
+    
+    # Test results inserted per statement while reading a report
+    BATCH_SIZE = 1000
+    
+    def __init__(self, path: Path, max_runs: int, max_age: float):
+        super().__init__(path)
+        self.max_runs = max_runs
+        self.max_age = max_age
+        
+        with self._connect() as db:
+            # Runs left unfinished by a server process that is gone
+            rows = db.execute(
+                "SELECT run_id, pid FROM runs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+            for row in rows:
+                if not self._pid_alive(row["pid"]):
+                    db.execute(
+                        "UPDATE runs SET status = 'interrupted' WHERE run_id = ?",
+                        (row["run_id"],)
+                    )
+    
+    @staticmethod
+    def _pid_alive(pid: int | None) -> bool:
+        if not pid:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+    
+    @staticmethod
+    def _run_record(row: sqlite3.Row) -> dict:
+        record = dict(row)
+        record["summary"] = json.loads(record["summary"]) if record["summary"] else None
+        del record["pid"]
+        return record
+    
+    def start_run(self, run: TestRun):
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO runs (run_id, status, test_path, markers, pid, "
+                "started_at, report_file) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run.run_id,
+                    run.status,
+                    run.args.get("test_path"),
+                    run.args.get("markers"),
+                    os.getpid(),
+                    run.started_at,
+                    run.report_file,
+                ),
+            )
+    
+    def mark_running(self, run: TestRun):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE runs SET status = ? WHERE run_id = ?", (run.status, run.run_id)
+            )
+    
+    def finish_run(self, run: TestRun):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE runs SET status = ?, finished_at = ?, returncode = ?, "
+                "error = ? WHERE run_id = ?",
+                (run.status, run.finished_at, run.returncode, run.error, run.run_id),
+            )
+    
+    def record_results(self, run_id: str, report_file: str):
+        """Read a run's JSON report into the store, one batch of tests at a time."""
+        header: dict = {}
+        with self._connect() as db:
+            db.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+            batch = []
+            for position, test in enumerate(iter_report_tests(report_file, header)):
+                longrepr = test_longrepr(test)
+                batch.append((
+                    run_id, position, test.get("nodeid", ""), test.get("outcome", ""),
+                    test_duration(test), longrepr[-MAX_STORED_LONGREPR:] or None
+                ))
+                if len(batch) >= self.BATCH_SIZE:
+                    db.executemany(
+                        "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)", batch
+                    )
+                    batch.clear()
+            db.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)", batch)
+            
+            # Keep the newest result of every test at hand for scheduling
+            db.execute(
+                "INSERT INTO last_results (nodeid, outcome, started_at) "
+                "SELECT nodeid, outcome, "
+                "(SELECT started_at FROM runs WHERE run_id = ?) "
+                "FROM results WHERE run_id = ? "
+                "ON CONFLICT (nodeid) DO UPDATE SET outcome = excluded.outcome, "
+                "started_at = excluded.started_at "
+                "WHERE excluded.started_at >= last_results.started_at",
+                (run_id, run_id),
+            )
+            
+            summary = header.get("summary", {})
+            db.execute(
+                "UPDATE runs SET exitcode = ?, duration = ?, summary = ? "
+                "WHERE run_id = ?",
+                (
+                    header.get("exitcode"),
+                    header.get("duration", summary.get("duration")),
+                    json.dumps(summary),
+                    run_id,
+                ),
+            )
+    
+    def evict(self):
+        """Drop runs beyond the retention limits, with their report files."""
+        cutoff = time.time() - self.max_age
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT run_id, report_file FROM runs WHERE status != 'running' "
+                "AND (started_at < ? OR run_id NOT IN "
+                "(SELECT run_id FROM runs ORDER BY started_at DESC LIMIT ?))",
+                (cutoff, self.max_runs)
+            ).fetchall()
+            for row in rows:
+                db.execute("DELETE FROM results WHERE run_id = ?", (row["run_id"],))
+                db.execute("DELETE FROM runs WHERE run_id = ?", (row["run_id"],))
+            
+            db.execute("DELETE FROM last_results WHERE started_at < ?", (cutoff,))
+            db.execute("DELETE FROM flaky WHERE last_seen < ?", (cutoff,))
+        
+        for row in rows:
+            if row["report_file"]:
+                Path(row["report_file"]).unlink(missing_ok=True)
+    
+    def mark_flaky(self, run_id: str, nodeids: list[str], passed: bool = True):
+        """Record tests of a run that failed, then passed when retried alone.
+
+        ``passed`` says whether the retries made the run pass; only then is
+        its stored exit code cleared once no failures are left.
+        """
+        now = time.time()
+        with self._connect() as db:
+            run = db.execute(
+                "SELECT started_at, summary FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            if run is None:
+                return
+            summary = json.loads(run["summary"]) if run["summary"] else {}
+            
+            for nodeid in nodeids:
+                result = db.execute(
+                    "SELECT outcome FROM results WHERE run_id = ? AND nodeid = ?",
+                    (run_id, nodeid)
+                ).fetchone()
+                if result is None or result["outcome"] == "flaky":
+                    continue
+                
+                db.execute(
+                    "UPDATE results SET outcome = 'flaky' "
+                    "WHERE run_id = ? AND nodeid = ?",
+                    (run_id, nodeid),
+                )
+                db.execute(
+                    "UPDATE last_results SET outcome = 'flaky' "
+                    "WHERE nodeid = ? AND started_at = ?",
+                    (nodeid, run["started_at"])
+                )
+                db.execute(
+                    "INSERT INTO flaky VALUES (?, ?, ?, 1) ON CONFLICT (nodeid) "
+                    "DO UPDATE SET last_seen = excluded.last_seen, count = count + 1",
+                    (nodeid, now, now)
+                )
+                
+                outcome = result["outcome"]
+                summary[outcome] = summary.get(outcome, 1) - 1
+                if not summary[outcome]:
+                    del summary[outcome]
+                summary["flaky"] = summary.get("flaky", 0) + 1
+            
+            db.execute(
+                "UPDATE runs SET summary = ? WHERE run_id = ?",
+                (json.dumps(summary), run_id),
+            )
+            if passed and not summary.get("failed") and not summary.get("error"):
+                db.execute("UPDATE runs SET exitcode = 0 WHERE run_id = ?", (run_id,))
+    
+    def flaky_tests(self) -> set[str]:
+        """Node IDs of tests seen to be flaky within the retention period."""
+        with self._connect() as db:
+            return {row["nodeid"] for row in db.execute("SELECT nodeid FROM flaky")}
+    
+    def last_results(self) -> dict[str, dict]:
+        """The newest stored outcome of every test, with its run's start time."""
+        with self._connect() as db:
+            return {
+                row["nodeid"]: {
+                    "outcome": row["outcome"],
+                    "started_at": row["started_at"],
+                }
+                for row in db.execute(
+                    "SELECT nodeid, outcome, started_at FROM last_results"
+                )
+            }
+    
+    def get_run(self, run_id: str) -> dict | None:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT * FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        return self._run_record(row) if row else None
+    
+    def latest_run(self) -> dict | None:
+        """The most recent run with stored results."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT * FROM runs WHERE summary IS NOT NULL "
+                "ORDER BY started_at DESC LIMIT 1"
+            ).fetchone()
+        return self._run_record(row) if row else None
+    
+    def iter_results(
+        self, run_id: str, outcomes: set[str] | None = None
+    ) -> Iterator[dict]:
+        """A run's test results in report order, optionally of some outcomes only."""
+        query = (
+            "SELECT nodeid, outcome, duration, longrepr FROM results WHERE run_id = ?"
+        )
+        params: list = [run_id]
+        if outcomes:
+            query += f" AND outcome IN ({', '.join('?' * len(outcomes))})"
+            params.extend(sorted(outcomes))
+        query += " ORDER BY position"
+        
+        with self._connect() as db:
+            for row in db.execute(query, params):
+                yield dict(row)
+    
+    def list_runs(
+        self,
+        since: float | None = None,
+        until: float | None = None,
+        status: str | None = None,
+        nodeid: str | None = None,
+        outcome: str | None = None,
+        limit: int = 20
+    ) -> list[dict]:
+        """Runs matching the filters, newest first.
+
+        With ``nodeid``, only runs that ran that test (with ``outcome``, if
+        given) are returned.
+        """
+        query = "SELECT * FROM runs WHERE 1"
+        params: list = []
+        if since is not None:
+            query += " AND started_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND started_at <= ?"
+            params.append(until)
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if nodeid:
+            query += " AND run_id IN (SELECT run_id FROM results WHERE nodeid = ?"
+            params.append(nodeid)
+            if outcome:
+                query += " AND outcome = ?"
+                params.append(outcome)
+            query += ")"
+        query += " ORDER BY started_at DESC LIMIT ?"
+        params.append(limit)
+        
+        with self._connect() as db:
+            return [self._run_record(row) for row in db.execute(query, params)]
+    
+    def test_history(
+        self,
+        nodeid: str,
+        since: float | None = None,
+        until: float | None = None,
+        outcome: str | None = None,
+        limit: int = 20
+    ) -> list[dict]:
+        """Results of one test across runs, newest first."""
+        query = (
+            "SELECT results.run_id, runs.started_at, results.outcome, "
+            "results.duration, results.longrepr FROM results "
+            "JOIN runs ON runs.run_id = results.run_id WHERE results.nodeid = ?"
+        )
+        params: list = [nodeid]
+        if since is not None:
+            query += " AND runs.started_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND runs.started_at <= ?"
+            params.append(until)
+        if outcome:
+            query += " AND results.outcome = ?"
+            params.append(outcome)
+        query += " ORDER BY runs.started_at DESC LIMIT ?"
+        params.append(limit)
+        
+        with self._connect() as db:
+            return [dict(row) for row in db.execute(query, params)]
+
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+\d+(?:,\d+)? @@")
+
+
+def parse_diff(diff: str) -> dict[str, list[tuple[int, int]] | None]:
+    """Files changed by a unified diff, with the line ranges changed in each.
+
+    Paths are as written in the diff, without "a/" and "b/" prefixes, and
+    name the old version of each file. Ranges are (first, last) line
+    numbers in the old version; an insertion after line n is (n, n + 1).
+    Added and deleted files, and changes without hunks (binary files, mode
+    changes), map to None: changed throughout.
+    """
+    def strip_prefix(path: str) -> str | None:
+        path = path.split("\t")[0]
+        if path == "/dev/null":
+            return None
+        return path[2:] if path.startswith(("a/", "b/")) else path
+    
+    changes: dict[str, list[tuple[int, int]] | None] = {}
+    header_path = old_path = current = None
+    for line in diff.splitlines():
+        if line.startswith("diff --git "):
+            # Overridden by the ---/+++ lines if the change has hunks
+            header_path = strip_prefix(line[len("diff --git "):].split(" b/")[0])
+            changes[header_path] = None
+            current = None
+        elif line.startswith("--- "):
+            old_path = strip_prefix(line[4:])
+        elif line.startswith("+++ "):
+            new_path = strip_prefix(line[4:])
+            changes.pop(header_path, None)
+            if old_path is None or new_path is None:
+                changes[old_path or new_path] = None
+                current = None
+            else:
+                current = old_path
+                changes.setdefault(current, [])
+        elif current is not None and (match := HUNK_HEADER.match(line)):
+            start = int(match.group(1))
+            count = int(match.group(2) or 1)
+            if count == 0:
+                changes[current].append((start, start + 1))
+            else:
+                changes[current].append((start, start + count - 1))
+    return changes
+
+
+def function_scopes(path: str) -> list[list[int]]:
+    """(first, last) lines of every function in a Python file, decorators included."""
+    try:
+        tree = ast.parse(Path(path).read_bytes())
+    except (OSError, SyntaxError, ValueError):
+        return []
+    return [
+        [min([node.lineno] + [d.lineno for d in node.decorator_list]), node.end_lineno]
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    ]
+
+
+def function_names(path: str) -> list[tuple[int, int, str]]:
+    """(first, last, qualified name) of every function in a Python file.
+
+    The first line includes decorators, like a code object's co_firstlineno.
+    """
+    try:
+        tree = ast.parse(Path(path).read_bytes())
+    except (OSError, SyntaxError, ValueError):
+        return []
+    
+    functions = []
+    
+    def visit(node: ast.AST, prefix: str):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                name = prefix + child.name
+                first = min([child.lineno] + [d.lineno for d in child.decorator_list])
+                functions.append((first, child.end_lineno, name))
+                visit(child, name + ".<locals>.")
+            elif isinstance(child, ast.ClassDef):
+                visit(child, prefix + child.name + ".")
+            else:
+                visit(child, prefix)
+    
+    visit(tree, "")
+    return functions
+
+
+def is_project_file(path: str, root: str) -> bool:
+    """Whether a source file is the project's own code, not a library's."""
+    return (
+        path.startswith(root + os.sep)
+        and "site-packages" not in Path(path).parts
+        and path != str(PROJECT_ROOT / "pytest_mcp_plugin.py")
+    )
+
+
+def summarize_profile(
+    directory: str,
+    top: int,
+    sort: str = "cumulative",
+    project_only: bool = True,
+    save_to: Path | None = None
+) -> dict:
+    """Merge the profiles pytest_mcp_plugin wrote to ``directory``.
+
+    Returns the ``top`` functions by ``sort`` (see PROFILE_SORT_KEYS), the
+    ``top`` allocation sites by memory held, and the slowest tests. With
+    ``project_only``, library code is left out: allocation sites are then
+    the innermost project line that led to each allocation. The merged CPU
+    profile is saved to ``save_to`` if given.
+    """
+    rootdir = os.getcwd()
+    tests: dict[str, dict] = {}
+    sites: dict[str, list[int]] = {}
+    for path in sorted(Path(directory).glob("profile-*.json")):
+        data = json.loads(path.read_text(encoding="utf-8"))
+        rootdir = data["rootdir"]
+        tests.update(data["tests"])
+        data_sites = data["project_sites" if project_only else "sites"]
+        for site, (size, count) in data_sites.items():
+            total = sites.setdefault(site, [0, 0])
+            total[0] += size
+            total[1] += count
+    
+    names: dict[str, list[tuple[int, int, str]]] = {}
+    
+    def function_at(filename: str, line: int, first_line: bool) -> str | None:
+        """The function starting at, or innermost around, a line of a file."""
+        if filename not in names:
+            names[filename] = (
+                function_names(filename) if filename.endswith(".py") else []
+            )
+        if first_line:
+            matches = [f for f in names[filename] if f[0] == line]
+        else:
+            matches = [f for f in names[filename] if f[0] <= line <= f[1]]
+        return min(matches, key=lambda f: f[1] - f[0])[2] if matches else None
+    
+    def relative(filename: str) -> str:
+        if filename.startswith(rootdir + os.sep):
+            return os.path.relpath(filename, rootdir)
+        return filename
+    
+    functions = []
+    profiled = None
+    stats_files = [str(path) for path in sorted(Path(directory).glob("cpu-*.pstats"))]
+    if stats_files:
+        stats = pstats.Stats(*stats_files)
+        profiled = stats.total_tt
+        for (filename, line, name), row in stats.stats.items():
+            _, calls, own, cumulative, _ = row
+            if project_only and not is_project_file(filename, rootdir):
+                continue
+            functions.append({
+                "function": name,
+                "file": filename,
+                "line": line,
+                "calls": calls,
+                "own_time": own,
+                "cumulative_time": cumulative
+            })
+        functions.sort(key=lambda f: f[PROFILE_SORT_KEYS[sort]], reverse=True)
+        functions = functions[:top]
+        for function in functions:
+            function["function"] = (
+                function_at(function["file"], function["line"], True)
+                or function["function"]
+            )
+            function["file"] = relative(function["file"])
+        if save_to is not None:
+            save_to.parent.mkdir(parents=True, exist_ok=True)
+            stats.dump_stats(save_to)
+    
+    allocations = []
+    largest = sorted(sites.items(), key=lambda item: -item[1][0])[:top]
+    for site, (size, count) in largest:
+        filename, _, line = site.rpartition(":")
+        allocations.append({
+            "site": f"{relative(filename)}:{line}",
+            "function": function_at(filename, int(line), False),
+            "size": size,
+            "blocks": count
+        })
+    
+    slowest = sorted(tests.items(), key=lambda item: -item[1]["duration"])[:top]
+    return {
+        "tests": len(tests),
+        "profiled_seconds": profiled,
+        "functions": functions,
+        "allocations": allocations,
+        "slowest_tests": [{"nodeid": nodeid, **test} for nodeid, test in slowest],
+        "pstats": (
+            str(save_to.resolve()) if save_to is not None and stats_files else None
+        ),
+    }
+
+
+def changed_scope_lines(
+    ranges: list[tuple[int, int]],
+    scopes: list[list[int]]
+) -> set[int] | None:
+    """Widen changed line ranges to the functions they fall in.
+
+    Returns None, meaning the whole file, when a change is not confined to
+    a single function: module-level code runs on import and can affect every
+    test that uses the file.
+    """
+    def innermost(line: int) -> tuple[int, int] | None:
+        containing = [scope for scope in scopes if scope[0] <= line <= scope[1]]
+        if not containing:
+            return None
+        first, last = min(containing, key=lambda scope: scope[1] - scope[0])
+        return first, last
+    
+    lines: set[int] = set()
+    for first, last in ranges:
+        scope = innermost(first)
+        if scope is None or scope != innermost(last):
+            return None
+        lines.update(range(scope[0], scope[1] + 1))
+    return lines
+
+
+class ImpactMap(SQLiteStore):
+    """Which tests execute which source lines, from per-test coverage.
+
+    Filled from coverage data recorded with one context per test location
+    (see pytest_mcp_plugin). Each measured file also keeps the line ranges
+    of its functions as they were when it was recorded, so a change inside a
+    function selects only the tests that run that function.
+    """
+    
+    VERSION = 1
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tests (
+            location TEXT PRIMARY KEY,
+            recorded_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS lines (
+            path TEXT NOT NULL,
+            location TEXT NOT NULL,
+            lines TEXT NOT NULL,
+            PRIMARY KEY (path, location)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS lines_by_location ON lines (location);
+        CREATE TABLE IF NOT EXISTS scopes (
+            path TEXT PRIMARY KEY,
+            scopes TEXT NOT NULL
+        );
+    """
+    
+    def record(self, data_files: list[str]):
+        """Replace the entries of every test measured in ``data_files``."""
+        tests: dict[str, dict[str, set[int]]] = {}
+        for data_file in data_files:
+            data = coverage.CoverageData(basename=data_file)
+            data.read()
+            for path in data.measured_files():
+                for lineno, contexts in data.contexts_by_lineno(path).items():
+                    for context in contexts:
+                        # The empty context is code run outside any test
+                        if context:
+                            tests.setdefault(context, {}).setdefault(path, set()).add(
+                                lineno
+                            )
+        
+        paths = {path for files in tests.values() for path in files}
+        now = time.time()
+        with self._connect() as db:
+            for location, files in tests.items():
+                db.execute("DELETE FROM lines WHERE location = ?", (location,))
+                db.executemany(
+                    "INSERT INTO lines VALUES (?, ?, ?)",
+                    [
+                        (path, location, json.dumps(sorted(lines)))
+                        for path, lines in files.items()
+                    ],
+                )
+                db.execute(
+                    "INSERT OR REPLACE INTO tests VALUES (?, ?)", (location, now)
+                )
+            db.executemany(
+                "INSERT OR REPLACE INTO scopes VALUES (?, ?)",
+                [(path, json.dumps(function_scopes(path))) for path in paths]
+            )
+    
+    def test_files(self) -> dict[str, list[str]]:
+        """The files each mapped test executed code in, by test location."""
+        files: dict[str, list[str]] = {}
+        with self._connect() as db:
+            for row in db.execute("SELECT location, path FROM lines"):
+                files.setdefault(row["location"], []).append(row["path"])
+        return files
+    
+    def mapped_tests(self) -> set[str]:
+        """Locations of the tests with recorded coverage."""
+        with self._connect() as db:
+            return {row["location"] for row in db.execute("SELECT location FROM tests")}
+    
+    def affected_tests(
+        self, changes: dict[str, list[tuple[int, int]] | None]
+    ) -> set[str]:
+        """Locations of the tests that execute any changed code.
+
+        ``changes`` maps absolute file paths to changed line ranges as
+        ``parse_diff`` returns them (None for the whole file).
+        """
+        affected = set()
+        with self._connect() as db:
+            for path, ranges in changes.items():
+                rows = db.execute(
+                    "SELECT location, lines FROM lines WHERE path = ?", (path,)
+                ).fetchall()
+                if not rows:
+                    continue
+                
+                wanted = None
+                if ranges is not None:
+                    scopes = db.execute(
+                        "SELECT scopes FROM scopes WHERE path = ?", (path,)
+                    ).fetchone()
+                    wanted = changed_scope_lines(
+                        ranges, json.loads(scopes["scopes"]) if scopes else []
+                    )
+                
+                for row in rows:
+                    if wanted is None or not wanted.isdisjoint(
+                        json.loads(row["lines"])
+                    ):
+                        affected.add(row["location"])
+        return affected
+
+
+def import_root(path: str) -> Path:
+    """Directory pytest puts on sys.path to import a test or conftest file.
+
+    That is the first directory above the file that is not a package.
+    """
+    directory = Path(path).parent
+    while (directory / "__init__.py").is_file() and directory.parent != directory:
+        directory = directory.parent
+    return directory
+
+
+def local_imports(path: str, roots: list[Path]) -> list[str]:
+    """Files under ``roots`` that a Python file imports directly.
+
+    Absolute imports are looked up under each root and relative imports
+    next to the file; the ``__init__.py`` of every package on the way
+    counts as imported too. Modules that do not resolve to a file under a
+    root (the standard library, installed packages) are left out.
+    """
+    try:
+        tree = ast.parse(Path(path).read_bytes())
+    except (OSError, SyntaxError, ValueError):
+        return []
+    
+    def resolve(base: Path, parts: list[str]) -> list[str]:
+        found = []
+        for depth in range(1, len(parts) + 1):
+            stem = base.joinpath(*parts[:depth])
+            if (stem / "__init__.py").is_file():
+                found.append(str(stem / "__init__.py"))
+            elif depth == len(parts) and stem.with_suffix(".py").is_file():
+                found.append(str(stem.with_suffix(".py")))
+            elif not stem.is_dir():
+                break
+        return found
+    
+    # (directory to resolve from, or None for every root; dotted module parts)
+    modules: list[tuple[Path | None, list[str]]] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.extend((None, alias.name.split(".")) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = None
+            if node.level:
+                base = Path(path).parent
+                for _ in range(node.level - 1):
+                    base = base.parent
+            parts = node.module.split(".") if node.module else []
+            if parts:
+                modules.append((base, parts))
+            # The imported names may be submodules
+            modules.extend((base, parts + [alias.name]) for alias in node.names)
+    
+    files = set()
+    for base, parts in modules:
+        for directory in [base] if base is not None else roots:
+            files.update(resolve(directory, parts))
+    files.discard(str(Path(path)))
+    return sorted(files)
+
+
+class TestInputs:
+    """Content hashes of what test outcomes depend on, for the result cache.
+
+    A test depends on its file, the conftest.py files above it, the pytest
+    configuration, every project module those import (directly or not), any
+    other file it was seen executing when impact was recorded, the files the
+    run declares in ``cache_inputs`` and the Python environment. File hashes
+    and imports are kept by file stamp, so only files that changed are read
+    again.
+    """
+    
+    # Keep pytest from trying to collect this class if the module is imported
+    __test__ = False
+    
+    def __init__(self):
+        self.hashes: dict[str, tuple[list[int], str]] = {}
+        self.imports: dict[str, tuple[list[int], list[str]]] = {}
+    
+    def file_hash(self, path: str) -> str:
+        try:
+            stamp = file_stamp(path)
+            cached = self.hashes.get(path)
+            if cached and cached[0] == stamp:
+                return cached[1]
+            digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+        except OSError:
+            return "missing"
+        self.hashes[path] = (stamp, digest)
+        return digest
+    
+    def dependencies(self, paths: Iterable[str]) -> set[str]:
+        """``paths`` and every project file they import, transitively."""
+        cwd = Path.cwd()
+        seen: set[str] = set()
+        pending = list(paths)
+        while pending:
+            path = pending.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            try:
+                stamp = file_stamp(path)
+            except OSError:
+                continue
+            cached = self.imports.get(path)
+            if not cached or cached[0] != stamp:
+                cached = (stamp, local_imports(path, [cwd, import_root(path)]))
+                self.imports[path] = cached
+            pending.extend(cached[1])
+        return seen
+    
+    def test_dependencies(self, path: str) -> set[str]:
+        """A test file, its conftest.py files and every project file they import."""
+        cwd = Path.cwd().resolve()
+        sources = [path]
+        for parent in Path(path).parents:
+            if (parent / "conftest.py").is_file():
+                sources.append(str(parent / "conftest.py"))
+            if parent == cwd or cwd not in parent.parents:
+                break
+        return self.dependencies(sources)
+    
+    def environment(self, args: dict) -> str:
+        """Hash of the interpreter, installed packages and relevant settings."""
+        packages = sorted(
+            f"{dist.metadata['Name']}=={dist.version}"
+            for dist in importlib.metadata.distributions()
+        )
+        data = [
+            sys.executable,
+            sys.version,
+            packages,
+            {name: os.environ.get(name) for name in CACHE_ENV_VARS},
+            args.get("capture", "no")
+        ]
+        return hashlib.sha256(json.dumps(data).encode()).hexdigest()
+    
+    def declared(self, patterns: list[str]) -> list[str]:
+        """Files matching a run's ``cache_inputs`` glob patterns."""
+        cwd = Path.cwd().resolve()
+        return sorted({
+            str(path) for pattern in patterns for path in cwd.glob(pattern)
+            if path.is_file()
+        })
+    
+    def keys(
+        self,
+        tests: list[dict],
+        args: dict,
+        test_files: dict[str, list[str]] | None = None
+    ) -> dict[str, str]:
+        """Result cache key of every test, by node ID."""
+        cwd = Path.cwd().resolve()
+        environment = self.environment(args)
+        config = [
+            str(cwd / name) for name in PYTEST_CONFIG_FILES if (cwd / name).is_file()
+        ] + self.declared(args.get("cache_inputs", []))
+        
+        file_keys: dict[str, str] = {}
+        keys = {}
+        for test in tests:
+            path = test["path"]
+            if path not in file_keys:
+                files = sorted(self.test_dependencies(path)) + config
+                file_keys[path] = hashlib.sha256(json.dumps(
+                    [environment, [(file, self.file_hash(file)) for file in files]]
+                ).encode()).hexdigest()
+            
+            executed = sorted((test_files or {}).get(location_of(test), []))
+            keys[test["nodeid"]] = hashlib.sha256(json.dumps([
+                test["nodeid"],
+                file_keys[path],
+                [(file, self.file_hash(file)) for file in executed]
+            ]).encode()).hexdigest()
+        return keys
+
+
+class ResultCache(SQLiteStore):
+    """Passed and skipped test results, keyed by a hash of their inputs.
+
+    See ``TestInputs`` for what goes into a key. At most ``max_entries``
+    results are kept; the least recently used are evicted first.
+    """
+    
+    VERSION = 1
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY,
+            nodeid TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            duration REAL,
+            stored_at REAL NOT NULL,
+            used_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS results_by_use ON results (used_at);
+    """
+    
+    # Keys looked up per statement, well under SQLite's parameter limit
+    BATCH_SIZE = 500
+    
+    def __init__(self, path: Path, max_entries: int):
+        super().__init__(path)
+        self.max_entries = max_entries
+    
+    def lookup(self, keys: list[str]) -> dict[str, dict]:
+        """Cached results for any of ``keys``, which count as used now."""
+        found = {}
+        now = time.time()
+        with self._connect() as db:
+            for start in range(0, len(keys), self.BATCH_SIZE):
+                batch = keys[start:start + self.BATCH_SIZE]
+                marks = ", ".join("?" * len(batch))
+                rows = db.execute(
+                    "SELECT key, nodeid, outcome, duration FROM results "
+                    f"WHERE key IN ({marks})",
+                    batch,
+                )
+                found.update((row["key"], dict(row)) for row in rows)
+                db.execute(
+                    f"UPDATE results SET used_at = ? WHERE key IN ({marks})",
+                    [now, *batch],
+                )
+        return found
+    
+    def store(self, results: list[tuple[str, str, str, float]]):
+        """Add (key, node ID, outcome, duration) results and evict the overflow."""
+        now = time.time()
+        with self._connect() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                [(*result, now, now) for result in results]
+            )
+            db.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+
+class Summary:
+    """Count, total and recent values of one measurement."""
+    
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: collections.deque[float] = collections.deque(maxlen=window)
+    
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+    
+    def quantiles(self) -> dict[float, float]:
+        """Nearest-rank percentiles of the recent values."""
+        values = sorted(self.recent)
+        if not values:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: values[max(0, math.ceil(q * len(values)) - 1)] for q in QUANTILES}
+    
+    def as_dict(self) -> dict:
+        result = {
+            "count": self.count,
+            "total": round(self.total, 6),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+        }
+        for q, value in self.quantiles().items():
+            result[f"p{q * 100:g}"] = round(value, 6)
+        return result
+
+
+class ServerMetrics:
+    """Latency, size and error measurements of a running server.
+
+    Each measurement in ``SUMMARIES`` is kept per label value (tool, phase,
+    subprocess kind) as a ``Summary``: exact counts and totals since the
+    server started, and percentiles over the last ``METRICS_WINDOW`` values.
+    Measurements are taken on the event loop and in worker threads alike.
+    """
+    
+    def __init__(self):
+        self.started_at = time.time()
+        self.summaries: dict[str, dict[str, Summary]] = {name: {} for name in SUMMARIES}
+        self.errors: dict[str, int] = {}
+        self.in_flight = 0
+        self.lock = threading.Lock()
+    
+    def observe(self, name: str, label: str, value: float):
+        with self.lock:
+            summary = self.summaries[name].get(label)
+            if summary is None:
+                summary = self.summaries[name][label] = Summary()
+            summary.observe(value)
+    
+    @contextlib.contextmanager
+    def timed(self, name: str, label: str) -> Iterator[None]:
+        """Observe how long the block takes, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, label, time.perf_counter() - start)
+    
+    def record_call(
+        self,
+        tool: str,
+        seconds: float,
+        arguments: Any,
+        result: list[TextContent] | None
+    ):
+        """Record a tool call; ``result`` is None if the call raised."""
+        self.observe("tool_seconds", tool, seconds)
+        self.observe(
+            "request_bytes", tool, len(json.dumps(arguments or {}, default=str))
+        )
+        if result is not None:
+            self.observe(
+                "response_bytes", tool, sum(len(item.text.encode()) for item in result)
+            )
+        # Tools report their own errors as a message starting with ❌
+        if result is None or any(item.text.startswith("❌") for item in result):
+            with self.lock:
+                self.errors[tool] = self.errors.get(tool, 0) + 1
+    
+    @staticmethod
+    def children_cpu_time() -> float | None:
+        """CPU seconds of every subprocess that has exited so far."""
+        if resource is None:
+            return None
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+    
+    def snapshot(self, queues: dict[str, int]) -> dict:
+        """All measurements, with the given current queue depths."""
+        with self.lock:
+            summaries = {
+                name: {
+                    label: summary.as_dict()
+                    for label, summary in sorted(labels.items())
+                }
+                for name, labels in self.summaries.items()
+            }
+            errors = dict(self.errors)
+        return {
+            "uptime": round(time.time() - self.started_at, 3),
+            **summaries,
+            "tool_errors": errors,
+            "children_cpu_seconds": self.children_cpu_time(),
+            "queues": queues,
+        }
+    
+    def prometheus(self, queues: dict[str, int]) -> str:
+        """All measurements in the Prometheus text exposition format."""
+        snapshot = self.snapshot(queues)
+        lines = [
+            "# HELP pytest_mcp_uptime_seconds Seconds since the server started",
+            "# TYPE pytest_mcp_uptime_seconds gauge",
+            f"pytest_mcp_uptime_seconds {snapshot['uptime']}",
+        ]
+        for name, (label, help_text) in SUMMARIES.items():
+            metric = f"pytest_mcp_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} summary")
+            for value, summary in snapshot[name].items():
+                labels = f'{label}="{prometheus_label(value)}"'
+                for q in QUANTILES:
+                    value = summary[f"p{q * 100:g}"]
+                    lines.append(f'{metric}{{{labels},quantile="{q:g}"}} {value}')
+                lines.append(f"{metric}_sum{{{labels}}} {summary['total']}")
+                lines.append(f"{metric}_count{{{labels}}} {summary['count']}")
+        
+        lines.append("# HELP pytest_mcp_tool_errors_total Tool calls that failed")
+        lines.append("# TYPE pytest_mcp_tool_errors_total counter")
+        for tool, count in sorted(snapshot["tool_errors"].items()):
+            tool_label = prometheus_label(tool)
+            lines.append(f'pytest_mcp_tool_errors_total{{tool="{tool_label}"}} {count}')
+        
+        if snapshot["children_cpu_seconds"] is not None:
+            lines.append(
+                "# HELP pytest_mcp_children_cpu_seconds_total "
+                "CPU time of the server's exited subprocesses"
+            )
+            lines.append("# TYPE pytest_mcp_children_cpu_seconds_total counter")
+            cpu_seconds = snapshot["children_cpu_seconds"]
+            lines.append(f"pytest_mcp_children_cpu_seconds_total {cpu_seconds:.6f}")
+        
+        lines.append(
+            "# HELP pytest_mcp_queue_depth Work in progress or waiting, by queue"
+        )
+        lines.append("# TYPE pytest_mcp_queue_depth gauge")
+        for queue, depth in queues.items():
+            lines.append(f'pytest_mcp_queue_depth{{queue="{queue}"}} {depth}')
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path: str, queues: dict[str, int]):
+        """Replace ``path`` with the current metrics, in one step."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.prometheus(queues))
+        os.replace(tmp, path)
+
+
+def prometheus_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PytestWorker:
+    """A long-lived pytest process from the warm pool (see pytest_worker.py)."""
+    
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.modules: dict[str, int] = {}
+        self.runs = 0
+        self.cpu_time = 0.0
+    
+    @classmethod
+    async def spawn(cls, env: dict[str, str]) -> "PytestWorker":
+        """Start a worker and wait until it has warmed up."""
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, str(PROJECT_ROOT / "pytest_worker.py"),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=env,
+            limit=WORKER_STREAM_LIMIT
+        )
+        worker = cls(process)
+        try:
+            worker.modules = (await worker._read())["modules"]
+        except BaseException:
+            await worker.close()
+            raise
+        return worker
+    
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+    
+    def is_stale(self) -> bool:
+        """Whether a source file the worker has imported changed on disk."""
+        for path, mtime in self.modules.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+    
+    async def _read(self) -> dict:
+        line = await self.process.stdout.readline()
+        if not line:
+            raise RuntimeError("pytest worker exited unexpectedly")
+        return json.loads(line)
+    
+    async def run(self, args: list[str], env: dict[str, str]) -> tuple[int, str, str]:
+        """Run pytest with ``args`` in the worker."""
+        request = json.dumps({"args": args, "env": env}) + "\n"
+        self.process.stdin.write(request.encode())
+        await self.process.stdin.drain()
+        
+        response = await self._read()
+        self.modules = response["modules"]
+        self.cpu_time = response.get("cpu", 0.0)
+        self.runs += 1
+        return response["returncode"], response["stdout"], response["stderr"]
+    
+    async def close(self):
+        if self.alive:
+            self.process.kill()
+        await self.process.wait()
+
+
+class WorkerPool:
+    """Pool of warm pytest workers.
+
+    Workers are started on demand, up to ``size`` at a time, and reused for
+    later runs. A worker is replaced instead of reused once any project
+    module it imported changed on disk, after ``MAX_WORKER_RUNS`` runs, or
+    when a run in it is cancelled or times out (``pytest.main`` cannot be
+    interrupted from outside).
+    """
+    
+    def __init__(self, size: int, env: dict[str, str], metrics: ServerMetrics):
+        self.size = size
+        self.env = env
+        self.metrics = metrics
+        self.idle: list[PytestWorker] = []
+        self.slots = asyncio.Semaphore(size)
+        # Runs waiting for a free slot, and runs holding one
+        self.waiting = 0
+        self.busy = 0
+    
+    async def run(self, args: list[str], env: dict[str, str]) -> tuple[int, str, str]:
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.busy += 1
+        try:
+            worker = await self._acquire()
+            start = time.perf_counter()
+            try:
+                result = await worker.run(args, env)
+            except BaseException:
+                await worker.close()
+                raise
+            self.metrics.observe(
+                "subprocess_seconds", "worker", time.perf_counter() - start
+            )
+            self.metrics.observe("subprocess_cpu_seconds", "worker", worker.cpu_time)
+            self.idle.append(worker)
+            return result
+        finally:
+            self.busy -= 1
+            self.slots.release()
+    
+    async def _acquire(self) -> PytestWorker:
+        while self.idle:
+            worker = self.idle.pop()
+            if worker.alive and worker.runs < MAX_WORKER_RUNS and not worker.is_stale():
+                return worker
+            await worker.close()
+        return await self._spawn()
+    
+    async def _spawn(self) -> PytestWorker:
+        with self.metrics.timed("phase_seconds", "worker_start"):
+            return await PytestWorker.spawn(self.env)
+    
+    async def prewarm(self):
+        """Start one worker ahead of the first warm run."""
+        if self.size > 0 and not self.idle:
+            self.idle.append(await self._spawn())
+    
+    async def close(self):
+        while self.idle:
+            await self.idle.pop().close()
+
+
+class RunScheduler:
+    """Admission control for test runs.
+
+    Runs take slots while they execute, and at most ``limit`` slots are in
+    use at once. Batch runs cannot take the last ``reserved`` of them, which
+    are kept for interactive runs. Waiting runs are admitted by priority,
+    then fairly across clients: the client with the fewest slots in use
+    first, and among those the one whose last turn was longest ago, so
+    clients take turns. Each client's runs go in order of arrival. A batch
+    run waiting ``aging`` seconds is treated as interactive, so a stream of
+    small runs cannot starve it; the queue is checked again when one ages.
+    While the first run in that order does not fit, later runs that do are
+    admitted in its place (backfilled), but only until it has waited
+    ``aging`` seconds: from then on it holds the queue until slots free up
+    for it, so a stream of small runs cannot keep a wide one out either.
+    """
+    
+    def __init__(self, limit: int, reserved: int, aging: float, metrics: ServerMetrics):
+        self.limit = max(1, limit)
+        self.reserved = min(max(0, reserved), self.limit - 1)
+        self.aging = aging
+        self.metrics = metrics
+        # Waiting runs in arrival order, and the slots each admitted run holds
+        self.waiting: dict[str, tuple[TestRun, asyncio.Future]] = {}
+        self.holding: dict[str, tuple[str, int]] = {}
+        self.used = 0
+        self.by_client: dict[str, int] = {}
+        # Admission count when each client with queued or running runs was
+        # last admitted
+        self.turn = 0
+        self.last_turn: dict[str, int] = {}
+        # Wakes the queue up when the next waiting batch run ages
+        self.timer: asyncio.TimerHandle | None = None
+    
+    def capacity(self, priority: str) -> int:
+        """Slots runs of a priority may fill."""
+        return self.limit if priority == "interactive" else self.limit - self.reserved
+    
+    def _urgent(self, run: TestRun, now: float) -> bool:
+        return run.priority == "interactive" or now - run.started_at >= self.aging
+    
+    def _rank(self, run: TestRun, now: float) -> tuple[bool, int, int, float]:
+        return (
+            not self._urgent(run, now),
+            self.by_client.get(run.client, 0),
+            self.last_turn.get(run.client, 0),
+            run.started_at
+        )
+    
+    def queue(self, now: float | None = None) -> list[TestRun]:
+        """Waiting runs in the order they will be admitted."""
+        now = time.time() if now is None else now
+        return sorted(
+            (run for run, _ in self.waiting.values()),
+            key=lambda run: self._rank(run, now),
+        )
+    
+    def _fits(self, run: TestRun, now: float) -> bool:
+        capacity = self.limit if self._urgent(run, now) else self.capacity("batch")
+        return self.used + run.slots <= capacity
+    
+    def position(self, run: TestRun) -> int | None:
+        """Place of a waiting run in the queue, counting from 1."""
+        for index, waiting in enumerate(self.queue(), 1):
+            if waiting is run:
+                return index
+        return None
+    
+    def submit(self, run: TestRun) -> asyncio.Future:
+        """Queue a run; the future is done when it is admitted."""
+        run.slots = max(1, min(run.slots, self.capacity(run.priority)))
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[run.run_id] = (run, future)
+        self._admit()
+        return future
+    
+    def release(self, run: TestRun):
+        """Take a run out of the queue, or give back the slots it holds."""
+        if self.waiting.pop(run.run_id, None) is None and run.run_id in self.holding:
+            client, slots = self.holding.pop(run.run_id)
+            self.used -= slots
+            self.by_client[client] -= slots
+            if not self.by_client[client]:
+                del self.by_client[client]
+        if run.client not in self.by_client and all(
+            waiting.client != run.client for waiting, _ in self.waiting.values()
+        ):
+            self.last_turn.pop(run.client, None)
+        self._admit()
+    
+    def _admit(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        while self.waiting:
+            now = time.time()
+            queue = self.queue(now)
+            run = next((run for run in queue if self._fits(run, now)), None)
+            if run is None or (
+                run is not queue[0] and now - queue[0].started_at >= self.aging
+            ):
+                self._wake_on_aging(now)
+                return
+            _, future = self.waiting.pop(run.run_id)
+            self.holding[run.run_id] = (run.client, run.slots)
+            self.used += run.slots
+            self.by_client[run.client] = self.by_client.get(run.client, 0) + run.slots
+            self.turn += 1
+            self.last_turn[run.client] = self.turn
+            run.status = "running"
+            run.admitted_at = now
+            self.metrics.observe(
+                "run_queue_seconds", run.priority, now - run.started_at
+            )
+            if not future.done():
+                future.set_result(None)
+    
+    def _wake_on_aging(self, now: float):
+        """Admit again once the next waiting batch run ages, if that can help.
+
+        Aged runs only gain the reserved slots, so while every slot is in use
+        there is nothing to wait for: releasing one checks the queue anyway.
+        """
+        if self.used >= self.limit:
+            return
+        aged_at = [
+            run.started_at + self.aging
+            for run, _ in self.waiting.values()
+            if not self._urgent(run, now)
+        ]
+        if aged_at:
+            self.timer = asyncio.get_running_loop().call_later(
+                min(aged_at) - now, self._admit
+            )
+
+
+def skipped_dir(name: str) -> bool:
+    """Whether a directory is left out of watching (hidden, caches, builds)."""
+    return name.startswith(".") or name in SKIP_DIRS or name == "__pycache__"
+
+
+def watched_file(path: str) -> bool:
+    """Whether a change to ``path`` can affect tests.
+
+    That is a Python source or pytest configuration file outside the
+    skipped directories.
+    """
+    parts = Path(path).parts
+    if any(skipped_dir(part) for part in parts[:-1]):
+        return False
+    return parts[-1].endswith(".py") or parts[-1] in PYTEST_CONFIG_FILES
+
+
+class FileWatcher:
+    """Collects changed files under a set of directories.
+
+    Subclasses feed changes to ``_changed``; ``changes`` hands them out in
+    debounced batches.
+    """
+    
+    kind = ""
+    
+    def __init__(self, roots: list[str]):
+        self.roots = [str(Path(root).resolve()) for root in roots]
+        self.pending: set[str] = set()
+        self.event = asyncio.Event()
+    
+    def _changed(self, path: str):
+        if watched_file(path):
+            self.pending.add(path)
+            self.event.set()
+    
+    async def changes(self, debounce: float) -> set[str]:
+        """Wait for changes, then until none came for ``debounce`` seconds.
+
+        A steady stream of changes is cut into batches of at most ten times
+        ``debounce`` seconds.
+        """
+        while not self.pending:
+            self.event.clear()
+            await self.event.wait()
+        
+        deadline = time.monotonic() + debounce * 10
+        while time.monotonic() < deadline:
+            self.event.clear()
+            try:
+                await asyncio.wait_for(self.event.wait(), debounce)
+            except asyncio.TimeoutError:
+                break
+        
+        batch, self.pending = self.pending, set()
+        return batch
+    
+    def start(self):
+        raise NotImplementedError
+    
+    def close(self):
+        raise NotImplementedError
+
+
+class InotifyWatcher(FileWatcher):
+    """Linux inotify watcher, through libc with ctypes.
+
+    inotify watches single directories, so every directory of the trees is
+    watched and new ones are added as they appear. If the kernel's event
+    queue overflows, the roots themselves are reported as changed.
+    """
+    
+    kind = "inotify"
+    
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+    
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct("iIII")
+    
+    def __init__(self, roots: list[str]):
+        super().__init__(roots)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories: dict[int, str] = {}
+    
+    def _watch_tree(self, root: str):
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not skipped_dir(d)]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), self.MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                # A directory that vanished while walking is fine
+                if dirpath == root and error != 2:
+                    raise OSError(error, f"Cannot watch {dirpath}")
+                continue
+            self.directories[wd] = dirpath
+    
+    def start(self):
+        for root in self.roots:
+            if os.path.isdir(root):
+                self._watch_tree(root)
+        asyncio.get_running_loop().add_reader(self.fd, self._read)
+    
+    def _read(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            
+            if mask & self.IN_Q_OVERFLOW:
+                for root in self.roots:
+                    self.pending.add(root)
+                self.event.set()
+                continue
+            if mask & self.IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            
+            directory = self.directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO) and not skipped_dir(name):
+                    # Files may have been written before the watch was added
+                    self._watch_tree(path)
+                    for dirpath, _, filenames in os.walk(path):
+                        for filename in filenames:
+                            self._changed(os.path.join(dirpath, filename))
+            else:
+                self._changed(path)
+    
+    def close(self):
+        with contextlib.suppress(Exception):
+            asyncio.get_running_loop().remove_reader(self.fd)
+        os.close(self.fd)
+
+
+class PollingWatcher(FileWatcher):
+    """Portable watcher that compares file stamps every ``interval`` seconds."""
+    
+    kind = "polling"
+    
+    def __init__(self, roots: list[str], interval: float = WATCH_POLL_INTERVAL):
+        super().__init__(roots)
+        self.interval = interval
+        self.task: asyncio.Task | None = None
+    
+    def _scan(self) -> dict[str, list[int]]:
+        stamps = {}
+        for root in self.roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if not skipped_dir(d)]
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    if watched_file(path):
+                        with contextlib.suppress(OSError):
+                            stamps[path] = file_stamp(path)
+        return stamps
+    
+    async def _poll(self):
+        stamps = await asyncio.to_thread(self._scan)
+        while True:
+            await asyncio.sleep(self.interval)
+            current = await asyncio.to_thread(self._scan)
+            for path in current.keys() | stamps.keys():
+                if current.get(path) != stamps.get(path):
+                    self._changed(path)
+            stamps = current
+    
+    def start(self):
+        self.task = asyncio.create_task(self._poll())
+    
+    def close(self):
+        if self.task:
+            self.task.cancel()
+
+
+def create_watcher(roots: list[str]) -> FileWatcher:
+    """An inotify watcher on Linux, else (or if inotify fails) a polling one."""
+    if sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(roots)
+            watcher.start()
+            return watcher
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable, polling instead: {e}", file=sys.stderr)
+    watcher = PollingWatcher(roots)
+    watcher.start()
+    return watcher
+
+
+class TestWatch:
+    """A 'watch_tests' session: re-runs affected tests as files change."""
+    
+    # Keep pytest from trying to collect this class if the module is imported
+    __test__ = False
+    
+    def __init__(self, args: dict, watcher: FileWatcher, session: Any):
+        self.watch_id = uuid.uuid4().hex[:12]
+        self.args = args
+        self.watcher = watcher
+        self.session = session
+        self.run_ids: list[str] = []
+        self.started_at = time.time()
+        self.task: asyncio.Task | None = None
+
 
 class PytestMCPServer:
     def __init__(self):
         self.server = Server("pytest-mcp-server")
+        self.runs: dict[str, TestRun] = {}
+        self.watches: dict[str, TestWatch] = {}
+        self.metrics = ServerMetrics()
+        self.pool = WorkerPool(WARM_WORKERS, self._subprocess_env({}), self.metrics)
+        self.scheduler = RunScheduler(
+            MAX_RUN_SLOTS, RESERVED_RUN_SLOTS, RUN_QUEUE_AGING, self.metrics
+        )
+        self.index = CollectionIndex(INDEX_FILE)
+        self.store = ResultStore(RESULTS_DB, MAX_STORED_RUNS, MAX_RUN_AGE_DAYS * 86400)
+        self.impact = ImpactMap(IMPACT_DB)
+        self.inputs = TestInputs()
+        self.cache = ResultCache(RESULT_CACHE_DB, MAX_CACHED_RESULTS)
+        self.log_levels = weakref.WeakKeyDictionary()
         self.setup_handlers()
     
     def setup_handlers(self):
@@ -22,40 +2685,197 @@ class PytestMCPServer:
             """List available pytest tools."""
             return [
                 Tool(
-                    name="run_tests",
-                    description="Run pytest tests with specified options. "
-                               "You can target specific test files or run all tests.",
+                    name="run_tests",
+                    description="Run pytest tests with specified options. "
+                               "You can target specific test files or run all tests.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            **RUN_OPTIONS_SCHEMA,
+                            **RESULT_OPTIONS_SCHEMA,
+                            "timeout": {
+                                "type": "number",
+                                "description": "Seconds before the run is killed",
+                                "default": 300
+                            }
+                        },
+                        "required": ["test_path"]
+                    }
+                ),
+                Tool(
+                    name="run_affected_tests",
+                    description="Run only the tests affected by changed files, "
+                               "using per-test coverage recorded by earlier runs. "
+                               "Changes come from 'changed_files', a unified "
+                               "'diff', or 'git diff' against 'base'.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "changed_files": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Changed files; every test that runs "
+                                             "code in them is affected"
+                            },
+                            "diff": {
+                                "type": "string",
+                                "description": "Unified diff of the changes; only "
+                                             "tests running the changed functions "
+                                             "are affected"
+                            },
+                            "base": {
+                                "type": "string",
+                                "description": "Git revision to diff the working tree "
+                                             "against when neither 'changed_files' nor "
+                                             "'diff' is given",
+                                "default": "HEAD"
+                            },
+                            **RUN_OPTIONS_SCHEMA,
+                            "test_path": {
+                                "type": "string",
+                                "description": "Path to choose affected tests from",
+                                "default": "tests/"
+                            },
+                            "record_impact": {
+                                **RUN_OPTIONS_SCHEMA["record_impact"],
+                                "default": True
+                            },
+                            **RESULT_OPTIONS_SCHEMA,
+                            "timeout": {
+                                "type": "number",
+                                "description": "Seconds before the run is killed",
+                                "default": 300
+                            }
+                        }
+                    }
+                ),
+                Tool(
+                    name="watch_tests",
+                    description="Watch source and test directories and re-run the "
+                               "tests affected by each batch of file changes. "
+                               "Results are sent as log messages on the "
+                               "'pytest.watch' logger until 'stop_watch' is called.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "paths": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Directories to watch",
+                                "default": WATCH_PATHS
+                            },
+                            "debounce": {
+                                "type": "number",
+                                "description": "Seconds without further changes "
+                                             "before the affected tests are run",
+                                "default": 0.5
+                            },
+                            **RUN_OPTIONS_SCHEMA,
+                            "test_path": {
+                                "type": "string",
+                                "description": "Path to choose affected tests from",
+                                "default": "tests/"
+                            },
+                            "warm": {
+                                **RUN_OPTIONS_SCHEMA["warm"],
+                                "default": True
+                            },
+                            "timeout": {
+                                "type": "number",
+                                "description": "Seconds before each run is killed "
+                                             "(no limit by default)"
+                            }
+                        }
+                    }
+                ),
+                Tool(
+                    name="stop_watch",
+                    description="Stop a watch started with 'watch_tests'.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "watch_id": {
+                                "type": "string",
+                                "description": "ID returned by 'watch_tests'"
+                            }
+                        },
+                        "required": ["watch_id"]
+                    }
+                ),
+                Tool(
+                    name="start_test_run",
+                    description="Start a pytest run in the background and return "
+                               "its run ID immediately. Poll it with "
+                               "'get_run_status' or 'wait_for_run'.",
                     inputSchema={
                         "type": "object",
                         "properties": {
-                            "test_path": {
+                            **RUN_OPTIONS_SCHEMA,
+                            "timeout": {
+                                "type": "number",
+                                "description": "Seconds before the run is killed "
+                                             "(no limit by default)"
+                            }
+                        },
+                        "required": ["test_path"]
+                    }
+                ),
+                Tool(
+                    name="get_run_status",
+                    description="Get the status of a background test run.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "run_id": {
                                 "type": "string",
-                                "description": "Path to test file or directory "
-                                             "(e.g., 'tests/' or 'tests/test_calculator.py')"
-                            },
-                            "markers": {
+                                "description": "ID returned by 'start_test_run'"
+                            }
+                        },
+                        "required": ["run_id"]
+                    }
+                ),
+                Tool(
+                    name="wait_for_run",
+                    description="Wait for a background test run to finish and "
+                               "return its output. Returns the current status "
+                               "if the run is still going when the wait ends.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "run_id": {
                                 "type": "string",
-                                "description": "Pytest markers to filter tests "
-                                             "(e.g., 'ui' or 'ui and not slow')"
-                            },
-                            "verbose": {
-                                "type": "boolean",
-                                "description": "Show detailed test output",
-                                "default": True
+                                "description": "ID returned by 'start_test_run'"
                             },
-                            "capture": {
+                            **RESULT_OPTIONS_SCHEMA,
+                            "timeout": {
+                                "type": "number",
+                                "description": "Maximum seconds to wait",
+                                "default": 60
+                            }
+                        },
+                        "required": ["run_id"]
+                    }
+                ),
+                Tool(
+                    name="cancel_run",
+                    description="Cancel a background test run and kill its "
+                               "pytest process.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "run_id": {
                                 "type": "string",
-                                "description": "Output capture method: 'no', 'sys', or 'fd'",
-                                "default": "no"
+                                "description": "ID returned by 'start_test_run'"
                             }
                         },
-                        "required": ["test_path"]
+                        "required": ["run_id"]
                     }
                 ),
                 Tool(
                     name="list_tests",
                     description="List all available tests without running them. "
-                               "Useful for discovering what tests exist.",
+                               "Answers from a cached collection index; only "
+                               "changed test files are collected again.",
                     inputSchema={
                         "type": "object",
                         "properties": {
@@ -63,102 +2883,1674 @@ class PytestMCPServer:
                                 "type": "string",
                                 "description": "Path to scan for tests",
                                 "default": "tests/"
-                            }
+                            },
+                            "markers": {
+                                "type": "string",
+                                "description": "Only list tests matching this marker "
+                                             "expression (e.g., 'ui and not slow')"
+                            },
+                            "keyword": {
+                                "type": "string",
+                                "description": "Only list tests matching this keyword "
+                                             "expression, like pytest -k"
+                            },
+                            "warm": RUN_OPTIONS_SCHEMA["warm"]
                         }
                     }
                 ),
                 Tool(
                     name="get_test_results",
-                    description="Get the last test run results in JSON format. "
-                               "Shows detailed information about passes and failures.",
+                    description="Get a test run's results, by default the latest "
+                               "run's. Shows a summary and a page of failures; "
+                               "use offset/limit to page through the rest.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "run_id": {
+                                "type": "string",
+                                "description": "Run to show (default: the latest run "
+                                             "with results)"
+                            },
+                            "format": RESULT_OPTIONS_SCHEMA["format"],
+                            "outcome": {
+                                "type": "string",
+                                "description": "Which tests to list: 'failed' "
+                                             "(failures and errors), 'all', or one "
+                                             "pytest outcome",
+                                "default": "failed"
+                            },
+                            "offset": {
+                                "type": "integer",
+                                "description": "Index of the first test to list",
+                                "default": 0
+                            },
+                            "limit": {
+                                "type": "integer",
+                                "description": "Maximum number of tests to list",
+                                "default": 20
+                            },
+                            "max_bytes": {
+                                "type": "integer",
+                                "description": "Byte budget for the listed tests",
+                                "default": 20000
+                            },
+                            "max_longrepr": {
+                                "type": "integer",
+                                "description": "Characters of failure text kept "
+                                             "per test",
+                                "default": 200
+                            }
+                        }
+                    }
+                ),
+                Tool(
+                    name="list_runs",
+                    description="List past and current test runs from the run "
+                               "history, newest first.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            **HISTORY_FILTERS_SCHEMA,
+                            "status": {
+                                "type": "string",
+                                "description": "Only runs with this status (e.g., "
+                                             "'passed', 'failed', 'running', 'queued')"
+                            },
+                            "nodeid": {
+                                "type": "string",
+                                "description": "Only runs that ran this test"
+                            },
+                            "outcome": {
+                                "type": "string",
+                                "description": "With 'nodeid': only runs where the "
+                                             "test had this outcome (e.g., 'failed')"
+                            },
+                            "format": RESULT_OPTIONS_SCHEMA["format"]
+                        }
+                    }
+                ),
+                Tool(
+                    name="get_test_history",
+                    description="Show one test's results across past runs, "
+                               "newest first.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "nodeid": {
+                                "type": "string",
+                                "description": "Node ID of the test"
+                            },
+                            **HISTORY_FILTERS_SCHEMA,
+                            "outcome": {
+                                "type": "string",
+                                "description": "Only results with this outcome"
+                            },
+                            "max_longrepr": {
+                                "type": "integer",
+                                "description": "Characters of failure text kept "
+                                             "per result",
+                                "default": 200
+                            },
+                            "format": RESULT_OPTIONS_SCHEMA["format"]
+                        },
+                        "required": ["nodeid"]
+                    }
+                ),
+                Tool(
+                    name="replay_keystrokes",
+                    description="Replay keystroke scripts against the calculator in "
+                               "bulk and check the final displays. One case per line: "
+                               "keys, then optionally '=>' and the expected display, "
+                               "e.g. '12+34= => 46'. Keys: digits . + - * / ( ) = C "
+                               "CE, '<' or [BS] for backspace, [SQRT] for square root.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "script": {
+                                "type": "string",
+                                "description": "Script text"
+                            },
+                            "script_file": {
+                                "type": "string",
+                                "description": "Path of a script file"
+                            },
+                            "fuzz": {
+                                "type": "integer",
+                                "description": "Also replay this many random key "
+                                             "sequences",
+                                "default": 0
+                            },
+                            "seed": {
+                                "type": "integer",
+                                "description": "Random seed for 'fuzz'"
+                            },
+                            "backend": {
+                                "type": "string",
+                                "enum": ["float", "decimal", "fraction"],
+                                "description": "Numeric backend of the calculator",
+                                "default": "float"
+                            },
+                            "ui": {
+                                "type": "boolean",
+                                "description": "Drive the Tk window instead of "
+                                             "the calculator engine (needs a "
+                                             "display); cases without an expected "
+                                             "display are compared with the engine",
+                                "default": False
+                            },
+                            "timeout": {
+                                "type": "number",
+                                "description": "Seconds before the replay is killed",
+                                "default": 300
+                            },
+                            "format": RESULT_OPTIONS_SCHEMA["format"]
+                        }
+                    }
+                ),
+                Tool(
+                    name="profile_tests",
+                    description="Run tests under cProfile and/or tracemalloc and "
+                               "report the hotspots across all of them: the top "
+                               "functions by cumulative time, the top allocation "
+                               "sites and the slowest tests. The merged CPU profile "
+                               "can be saved as a .pstats file.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "node_ids": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Tests to profile, e.g. "
+                                             "'tests/test_calculator.py::TestCalculatorUI"
+                                             "::test_addition'; default: every test "
+                                             "under 'test_path'"
+                            },
+                            "test_path": {
+                                **RUN_OPTIONS_SCHEMA["test_path"],
+                                "default": "tests/"
+                            },
+                            "markers": RUN_OPTIONS_SCHEMA["markers"],
+                            "profilers": {
+                                "type": "array",
+                                "items": {"type": "string", "enum": ["cpu", "memory"]},
+                                "description": "'cpu' for cProfile, 'memory' for "
+                                             "tracemalloc, or both (each slows the "
+                                             "other's numbers down)",
+                                "default": ["cpu"]
+                            },
+                            "top": {
+                                "type": "integer",
+                                "description": "Functions, allocation sites and tests "
+                                             "to report",
+                                "default": 20
+                            },
+                            "sort": {
+                                "type": "string",
+                                "enum": list(PROFILE_SORT_KEYS),
+                                "description": "Rank functions by time including "
+                                             "callees, own time, or calls",
+                                "default": "cumulative"
+                            },
+                            "scope": {
+                                "type": "string",
+                                "enum": ["project", "all"],
+                                "description": "'project' reports only the project's "
+                                             "code, attributing library allocations "
+                                             "to the project line that caused them; "
+                                             "'all' includes pytest and libraries",
+                                "default": "project"
+                            },
+                            "frames": {
+                                "type": "integer",
+                                "description": "Frames traced per allocation; more "
+                                             "find project code behind deeper library "
+                                             "calls but trace more slowly",
+                                "default": 10
+                            },
+                            "save_pstats": {
+                                "type": "boolean",
+                                "description": "Save the merged CPU profile as a "
+                                             ".pstats file for offline viewing",
+                                "default": False
+                            },
+                            "warm": RUN_OPTIONS_SCHEMA["warm"],
+                            "timeout": {
+                                "type": "number",
+                                "description": "Seconds before the run is killed",
+                                "default": 300
+                            },
+                            "format": RESULT_OPTIONS_SCHEMA["format"]
+                        }
+                    }
+                ),
+                Tool(
+                    name="run_benchmarks",
+                    description="Run the benchmark suite (calculator logic and "
+                               "server hot paths), store the results for the current "
+                               "commit and compare them with a saved baseline. A "
+                               "benchmark regressed when a Mann-Whitney U test finds "
+                               "its timings differ significantly and its median is "
+                               "slower by more than the threshold.",
                     inputSchema={
                         "type": "object",
-                        "properties": {}
+                        "properties": {
+                            "benchmarks": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Glob patterns of benchmarks to run, "
+                                             "e.g. 'calculator.*'; default: all"
+                            },
+                            "samples": {
+                                "type": "integer",
+                                "description": "Timing samples per benchmark",
+                                "default": 10
+                            },
+                            "baseline": {
+                                "type": "string",
+                                "description": "Commit whose stored results to compare "
+                                             "with, instead of the saved baseline"
+                            },
+                            "save_baseline": {
+                                "type": "boolean",
+                                "description": "Make these results the baseline",
+                                "default": False
+                            },
+                            "alpha": {
+                                "type": "number",
+                                "description": "Significance level of the test",
+                                "default": 0.05
+                            },
+                            "threshold": {
+                                "type": "number",
+                                "description": "Slowdown of the median, as a fraction, "
+                                             "that counts as a regression",
+                                "default": 0.1
+                            },
+                            "timeout": {
+                                "type": "number",
+                                "description": "Seconds before the suite is killed",
+                                "default": 600
+                            },
+                            "format": RESULT_OPTIONS_SCHEMA["format"]
+                        }
+                    }
+                ),
+                Tool(
+                    name="get_server_metrics",
+                    description="Show where the server spends its time: per-tool "
+                               "latency percentiles (p50/p95/p99), time in hot paths "
+                               "(subprocess spawn, test collection, report parsing, "
+                               "formatting), subprocess wall and CPU time, request "
+                               "and response sizes, and current queue depths.",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "format": {
+                                "type": "string",
+                                "enum": ["markdown", "json", "prometheus"],
+                                "description": "'markdown' for readable text, 'json' "
+                                             "for all measurements, 'prometheus' for "
+                                             "the Prometheus text format",
+                                "default": "markdown"
+                            }
+                        }
                     }
                 )
-            ]
+            ]
+        
+        @self.server.set_logging_level()
+        async def set_logging_level(level: str) -> None:
+            """Set the minimum level of streamed test results."""
+            self.log_levels[self.server.request_context.session] = level
+        
+        @self.server.call_tool()
+        async def call_tool(name: str, arguments: Any) -> list[TextContent]:
+            """Handle tool calls, measuring each."""
+            self.metrics.in_flight += 1
+            start = time.perf_counter()
+            try:
+                result = await self._dispatch(name, arguments)
+            except BaseException:
+                self.metrics.record_call(
+                    name, time.perf_counter() - start, arguments, None
+                )
+                raise
+            finally:
+                self.metrics.in_flight -= 1
+            if result is None:
+                raise ValueError(f"Unknown tool: {name}")
+            self.metrics.record_call(
+                name, time.perf_counter() - start, arguments, result
+            )
+            return result
+    
+    async def _dispatch(self, name: str, arguments: Any) -> list[TextContent] | None:
+        """Run a tool; None if there is no tool of that name."""
+        if name == "run_tests":
+            return await self.run_tests(arguments)
+        elif name == "start_test_run":
+            return await self.start_test_run(arguments)
+        elif name == "get_run_status":
+            return await self.get_run_status(arguments)
+        elif name == "wait_for_run":
+            return await self.wait_for_run(arguments)
+        elif name == "cancel_run":
+            return await self.cancel_run(arguments)
+        elif name == "list_tests":
+            return await self.list_tests(arguments)
+        elif name == "get_test_results":
+            return await self.get_test_results(arguments)
+        elif name == "run_affected_tests":
+            return await self.run_affected_tests(arguments)
+        elif name == "list_runs":
+            return await self.list_runs(arguments)
+        elif name == "get_test_history":
+            return await self.get_test_history(arguments)
+        elif name == "watch_tests":
+            return await self.watch_tests(arguments)
+        elif name == "stop_watch":
+            return await self.stop_watch(arguments)
+        elif name == "replay_keystrokes":
+            return await self.replay_keystrokes(arguments)
+        elif name == "get_server_metrics":
+            return await self.get_server_metrics(arguments)
+        elif name == "profile_tests":
+            return await self.profile_tests(arguments)
+        elif name == "run_benchmarks":
+            return await self.run_benchmarks(arguments)
+        return None
+    
+    async def _run_command(
+        self,
+        cmd: list[str],
+        timeout: float | None,
+        env: dict[str, str] | None = None,
+        kind: str = "command"
+    ) -> tuple[int, str, str]:
+        """Run a command without blocking the event loop.
+
+        Other tool calls keep being served while the subprocess runs. The
+        process is killed if it exceeds ``timeout`` or the call is cancelled.
+        Its wall time is recorded in the metrics under ``kind``.
+        """
+        start = time.perf_counter()
+        with self.metrics.timed("phase_seconds", "spawn"):
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env
+            )
+        
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            raise
+        finally:
+            self.metrics.observe(
+                "subprocess_seconds", kind, time.perf_counter() - start
+            )
+        
+        return (
+            process.returncode,
+            stdout.decode(errors="replace"),
+            stderr.decode(errors="replace")
+        )
+    
+    def _build_pytest_args(self, args: dict, report_file: str) -> list[str]:
+        """Build the pytest arguments for a run."""
+        test_path = args.get("test_path", "tests/")
+        markers = args.get("markers")
+        verbose = args.get("verbose", True)
+        capture = args.get("capture", "no")
+        
+        cmd = ["-p", "pytest_mcp_plugin", test_path]
+        
+        if verbose:
+            cmd.append("-v")
+        
+        cmd.append(f"--capture={capture}")
+        
+        if markers:
+            cmd.extend(["-m", markers])
+        
+        if args.get("fail_fast"):
+            cmd.append("-x")
+        
+        # Add JSON report
+        cmd.extend(["--json-report", f"--json-report-file={report_file}"])
+        
+        return cmd
+    
+    def _start_run(
+        self,
+        args: dict,
+        timeout: float | None,
+        select: list[str] | None = None,
+        client: str | None = None
+    ) -> TestRun:
+        """Create a run, register it in the job table and queue it to start.
+
+        ``select`` restricts the run to the tests at those locations.
+        ``client`` identifies who started it for fair sharing of the run
+        queue; by default, the session of the current request.
+        """
+        if args.get("record_impact") and coverage is None:
+            raise ValueError("Recording test impact needs the 'coverage' package")
+        
+        run = TestRun(args, timeout)
+        run.select = select
+        run.cmd = PYTEST_COMMAND + self._build_pytest_args(args, run.report_file)
+        run.priority = run_priority(args, select)
+        run.client = client if client is not None else self._client_id()
+        run.slots = self._resolve_workers(args)
+        self.runs[run.run_id] = run
+        self._prune_runs()
+        admitted = self.scheduler.submit(run)
+        # Recorded as running, or as queued if it has to wait
+        self.store.start_run(run)
+        run.task = asyncio.create_task(self._admit_and_execute(run, admitted))
+        
+        def done(task: asyncio.Task):
+            self.scheduler.release(run)
+            # Covers a task cancelled before it ever started running
+            if not run.finished:
+                self._finish_run(run, "cancelled")
+        
+        run.task.add_done_callback(done)
+        return run
+    
+    async def _admit_and_execute(self, run: TestRun, admitted: asyncio.Future):
+        """Wait for the run queue to admit a run, then execute it."""
+        if not admitted.done():
+            await admitted
+            await asyncio.to_thread(self.store.mark_running, run)
+        await self._execute_run(run)
+    
+    def _client_id(self) -> str:
+        """The client session of the current request, or "" outside one."""
+        try:
+            return session_id(self.server.request_context.session)
+        except LookupError:
+            return ""
+    
+    def _finish_run(self, run: TestRun, status: str):
+        """Mark a run finished and record its final state in the history."""
+        run.finish(status)
+        try:
+            self.store.finish_run(run)
+        except sqlite3.Error as e:
+            print(f"Could not record run {run.run_id}: {e}", file=sys.stderr)
+    
+    def _prune_runs(self):
+        """Drop the oldest finished runs once the job table is full."""
+        finished = [run for run in self.runs.values() if run.finished]
+        for run in finished[:max(0, len(finished) - MAX_FINISHED_RUNS)]:
+            del self.runs[run.run_id]
+            (OUTPUT_DIR / f"{run.run_id}.log").unlink(missing_ok=True)
+    
+    def _plugin_env(
+        self,
+        events_path: str,
+        select_path: str | None = None,
+        coverage_path: str | None = None,
+        profile_dir: str | None = None,
+        profilers: list[str] | None = None,
+        frames: int | None = None
+    ) -> dict[str, str]:
+        """Variables that make pytest_mcp_plugin stream events to ``events_path``.
+
+        When ``select_path`` is given, only the tests listed in that file
+        are run. When ``coverage_path`` is given, per-test coverage is saved
+        to files named after it. When ``profile_dir`` is given, each test is
+        profiled with ``profilers`` ("cpu", "memory"), keeping ``frames``
+        frames per traced allocation, and the profiles are saved there.
+        """
+        env = {"PYTEST_MCP_EVENTS": events_path}
+        if select_path:
+            env["PYTEST_MCP_SELECT"] = select_path
+        if coverage_path:
+            env["PYTEST_MCP_COVERAGE"] = coverage_path
+        if profile_dir:
+            env["PYTEST_MCP_PROFILE"] = profile_dir
+            env["PYTEST_MCP_PROFILE_MODES"] = ",".join(profilers or ["cpu"])
+            if frames:
+                env["PYTEST_MCP_PROFILE_FRAMES"] = str(frames)
+        return env
+    
+    def _write_selection(self, path: str, locations: list[str]) -> str:
+        """Write a test selection file for pytest_mcp_plugin."""
+        Path(path).write_text(
+            "".join(location + "\n" for location in locations), encoding="utf-8"
+        )
+        return path
+    
+    def _subprocess_env(self, overrides: dict[str, str]) -> dict[str, str]:
+        """Environment for a pytest subprocess or warm worker."""
+        env = os.environ.copy()
+        # Make pytest_mcp_plugin importable whatever the working directory is
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")])
+        )
+        env.update(overrides)
+        return env
+    
+    async def _run_pytest(
+        self,
+        pytest_args: list[str],
+        timeout: float | None,
+        plugin_env: dict[str, str],
+        warm: bool = False
+    ) -> tuple[int, str, str]:
+        """Run pytest in a fresh subprocess or, if ``warm``, in a pooled worker."""
+        if warm and self.pool.size > 0:
+            return await asyncio.wait_for(
+                self.pool.run(pytest_args, plugin_env), timeout
+            )
+        return await self._run_command(
+            PYTEST_COMMAND + pytest_args,
+            timeout=timeout,
+            env=self._subprocess_env(plugin_env),
+            kind="pytest"
+        )
+    
+    def _resolve_workers(self, args: dict) -> int:
+        """Number of pytest processes requested for a run."""
+        workers = args.get("workers", 1)
+        if workers == "auto":
+            return os.cpu_count() or 1
+        return max(1, int(workers))
+    
+    async def _execute_run(self, run: TestRun):
+        """Run pytest for a job and record its outcome."""
+        work_dir = tempfile.mkdtemp(prefix="pytest-mcp-")
+        REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+        events_path = os.path.join(work_dir, "events.jsonl")
+        Path(events_path).touch()
+        stop = asyncio.Event()
+        follower = asyncio.create_task(self._follow_events(run, events_path, stop))
+        
+        coverage_path = None
+        if run.args.get("record_impact"):
+            coverage_path = os.path.join(work_dir, "coverage")
+        
+        try:
+            # Collection, the cache check and retries count against the run's
+            # time limit as much as pytest itself
+            await asyncio.wait_for(
+                self._execute_steps(run, work_dir, events_path, coverage_path),
+                run.timeout,
+            )
+            await asyncio.to_thread(self._record_durations, run.report_file)
+            status = "passed" if run.returncode == 0 else "failed"
+        except asyncio.TimeoutError:
+            status = "timed_out"
+        except asyncio.CancelledError:
+            status = "cancelled"
+        except Exception as e:
+            run.error = str(e)
+            status = "error"
+        
+        # Deliver whatever the plugin wrote before pytest exited
+        stop.set()
+        await follower
+        if run.flaky:
+            flaky = set(run.flaky)
+            for failure in [f for f in run.failures if f["nodeid"] in flaky]:
+                run.failures.remove(failure)
+                run.counts[failure["outcome"]] -= 1
+            run.counts = {
+                outcome: count for outcome, count in run.counts.items() if count
+            }
+            run.counts["flaky"] = len(flaky)
+        if run.cached:
+            for result in run.cached:
+                run.counts[result["outcome"]] = run.counts.get(result["outcome"], 0) + 1
+            run.collected = (run.collected or 0) + len(run.cached)
+        if coverage_path:
+            data_files = [str(path) for path in Path(work_dir).glob("coverage.*")]
+            try:
+                await asyncio.to_thread(self.impact.record, data_files)
+            except Exception as e:
+                print(
+                    f"Could not record test impact of run {run.run_id}: {e}",
+                    file=sys.stderr,
+                )
+        shutil.rmtree(work_dir, ignore_errors=True)
+        
+        # Store the results before waiters are woken, so they can read them
+        if os.path.exists(run.report_file):
+            try:
+                await asyncio.to_thread(self._store_results, run)
+            except (sqlite3.Error, OSError, ValueError) as e:
+                run.error = run.error or f"Could not store results: {e}"
+        self._finish_run(run, status)
+    
+    async def _execute_steps(
+        self,
+        run: TestRun,
+        work_dir: str,
+        events_path: str,
+        coverage_path: str | None
+    ):
+        """Select, run and retry a run's tests; the caller bounds the time."""
+        if run.args.get("use_cache") and MAX_CACHED_RESULTS > 0:
+            with self.metrics.timed("phase_seconds", "cache_check"):
+                await self._check_cache(run)
+        if run.args.get("order") == "failed_first":
+            await self._schedule(run)
+        
+        workers = self._resolve_workers(run.args)
+        if run.cached and not run.select:
+            run.returncode = 0
+            run.stdout = (
+                f"All {len(run.cached)} tests have cached results for unchanged "
+                "inputs; nothing was run. Leave out 'use_cache' to run them.\n"
+            )
+        elif workers > 1:
+            await self._execute_shards(
+                run, work_dir, events_path, workers, coverage_path
+            )
+        else:
+            select_path = None
+            if run.select is not None:
+                select_path = self._write_selection(
+                    os.path.join(work_dir, "selection.txt"), run.select
+                )
+            run.returncode, run.stdout, run.stderr = await self._run_pytest(
+                run.cmd[len(PYTEST_COMMAND) :],
+                timeout=None,
+                plugin_env=self._plugin_env(events_path, select_path, coverage_path),
+                warm=run.args.get("warm", False),
+            )
+        if run.cached:
+            await asyncio.to_thread(self._add_cached_results, run)
+        if run.returncode == 1:
+            await self._retry_failures(run, work_dir)
+    
+    async def _execute_shards(
+        self,
+        run: TestRun,
+        work_dir: str,
+        events_path: str,
+        workers: int,
+        coverage_path: str | None = None
+    ):
+        """Split a run's tests across concurrent pytest processes.
+
+        Each shard collects the same test path but only runs the tests
+        handed to it. The shards' JSON reports are merged into the run's
+        report file so 'get_test_results' sees a single run.
+        """
+        tests = await self._collect_tests(run.args)
+        if run.select is not None:
+            # Shards keep the selection's order
+            position = {location: index for index, location in enumerate(run.select)}
+            tests = sorted(
+                (test for test in tests if location_of(test) in position),
+                key=lambda test: position[location_of(test)]
+            )
+        by_id = {test["nodeid"]: test for test in tests}
+        shards = plan_shards(list(by_id), workers, self._load_durations())
+        if len(shards) <= 1:
+            select_path = None
+            if run.select is not None:
+                select_path = self._write_selection(
+                    os.path.join(work_dir, "selection.txt"), run.select
+                )
+            run.returncode, run.stdout, run.stderr = await self._run_pytest(
+                run.cmd[len(PYTEST_COMMAND):],
+                timeout=None,
+                plugin_env=self._plugin_env(events_path, select_path, coverage_path),
+                warm=run.args.get("warm", False)
+            )
+            return
+        
+        run.shards = len(shards)
+        
+        commands = []
+        report_files = []
+        for index, shard in enumerate(shards):
+            select_path = self._write_selection(
+                os.path.join(work_dir, f"shard-{index}.txt"),
+                [location_of(by_id[node_id]) for node_id in shard]
+            )
+            report_file = os.path.join(work_dir, f"shard-{index}.json")
+            report_files.append(report_file)
+            commands.append((
+                self._build_pytest_args(run.args, report_file=report_file),
+                self._plugin_env(events_path, select_path, coverage_path)
+            ))
+        
+        results = await asyncio.gather(*(
+            self._run_pytest(
+                pytest_args,
+                timeout=None,
+                plugin_env=plugin_env,
+                warm=run.args.get("warm", False)
+            )
+            for pytest_args, plugin_env in commands
+        ))
+        
+        stdout = []
+        stderr = []
+        for index, (_, shard_stdout, shard_stderr) in enumerate(results):
+            header = f"===== shard {index + 1}/{len(shards)} ====="
+            stdout.append(f"{header}\n{shard_stdout}")
+            if shard_stderr:
+                stderr.append(f"{header}\n{shard_stderr}")
+        run.stdout = "\n".join(stdout)
+        run.stderr = "\n".join(stderr)
+        
+        reports = []
+        for report_file in report_files:
+            if os.path.exists(report_file):
+                with open(report_file, "r") as f:
+                    reports.append(json.load(f))
+        
+        if reports:
+            merged = merge_json_reports(reports)
+            with open(run.report_file, "w") as f:
+                json.dump(merged, f)
+            run.returncode = merged["exitcode"]
+        else:
+            run.returncode = max(returncode for returncode, _, _ in results)
+    
+    async def _check_cache(self, run: TestRun):
+        """Find the run's tests that can reuse a cached result.
+
+        Those are taken out of the run's selection; the cache keys of the
+        others are kept so that the results of this run can be cached.
+        """
+        tests = await self._collect_tests(run.args)
+        if run.select is not None:
+            selected = set(run.select)
+            tests = [test for test in tests if location_of(test) in selected]
+        
+        test_files = await asyncio.to_thread(self.impact.test_files)
+        run.cache_keys = await asyncio.to_thread(
+            self.inputs.keys, tests, run.args, test_files
+        )
+        
+        hits = await asyncio.to_thread(self.cache.lookup, list(run.cache_keys.values()))
+        if not hits:
+            return
+        run.cached = [
+            hits[run.cache_keys[test["nodeid"]]] for test in tests
+            if run.cache_keys[test["nodeid"]] in hits
+        ]
+        run.select = [
+            location_of(test) for test in tests
+            if run.cache_keys[test["nodeid"]] not in hits
+        ]
+    
+    def _add_cached_results(self, run: TestRun):
+        """Add a run's cached results to its JSON report."""
+        records = [
+            {
+                "nodeid": result["nodeid"],
+                "outcome": result["outcome"],
+                "cached": True,
+                "call": {
+                    "duration": result["duration"] or 0.0,
+                    "outcome": result["outcome"],
+                },
+            }
+            for result in run.cached
+        ]
+        summary: dict[str, int] = {}
+        for record in records:
+            summary[record["outcome"]] = summary.get(record["outcome"], 0) + 1
+        summary["total"] = summary["collected"] = len(records)
+        report = {
+            "created": time.time(),
+            "duration": 0.0,
+            "exitcode": 0,
+            "root": os.getcwd(),
+            "summary": summary,
+            "collectors": [],
+            "tests": records,
+            "warnings": []
+        }
+        
+        if os.path.exists(run.report_file):
+            with open(run.report_file, "r") as f:
+                report = merge_json_reports([json.load(f), report])
+        with open(run.report_file, "w") as f:
+            json.dump(report, f)
+    
+    def _cache_results(self, run: TestRun):
+        """Cache the passed and skipped results a run produced."""
+        flaky = set(run.flaky)
+        results = [
+            (
+                run.cache_keys[test["nodeid"]],
+                test["nodeid"],
+                test["outcome"],
+                test_duration(test),
+            )
+            for test in iter_report_tests(run.report_file)
+            if test.get("outcome") in CACHEABLE_OUTCOMES
+            and not test.get("cached")
+            and test.get("nodeid") in run.cache_keys
+            and test["nodeid"] not in flaky
+        ]
+        if results:
+            self.cache.store(results)
+    
+    async def _schedule(self, run: TestRun):
+        """Put a run's tests in failed-first order (see ``order_tests``)."""
+        tests = await self._collect_tests(run.args)
+        if run.select is not None:
+            selected = set(run.select)
+            tests = [test for test in tests if location_of(test) in selected]
+        
+        last_results = await asyncio.to_thread(self.store.last_results)
+        test_files = await asyncio.to_thread(self.impact.test_files)
+        ordered = order_tests(tests, last_results, self._load_durations(), test_files)
+        run.select = [location_of(test) for test in ordered]
+    
+    async def _retry_failures(self, run: TestRun, work_dir: str):
+        """Re-run a run's failed tests one at a time; those that pass are flaky.
+
+        Each failed test gets the run's ``retries`` attempts or, without
+        ``retries``, one if it has been flaky before. If every failure passes
+        on a retry, so does the run. A run that stopped at its first failure
+        (``fail_fast``) is not retried: the tests after that one never ran,
+        so it fails whatever the retry shows.
+        """
+        retries = run.args.get("retries")
+        if retries == 0 or run.args.get("fail_fast"):
+            return
+        if not os.path.exists(run.report_file):
+            return
+        failed = await asyncio.to_thread(self._failed_tests, run.report_file)
+        if not failed:
+            return
+        
+        if retries is None:
+            known = await asyncio.to_thread(self.store.flaky_tests)
+            attempts = {nodeid: int(nodeid in known) for nodeid in failed}
+        else:
+            attempts = dict.fromkeys(failed, retries)
+        if not any(attempts.values()):
+            return
+        
+        by_id = {test["nodeid"]: test for test in await self._collect_tests(run.args)}
+        pytest_args = self._build_pytest_args(
+            {**run.args, "verbose": False, "fail_fast": False},
+            os.path.join(work_dir, "retry.json")
+        )
+        # Retries report to their own event stream, not the run's
+        events_path = os.path.join(work_dir, "retry-events.jsonl")
+        
+        for nodeid, count in attempts.items():
+            test = by_id.get(nodeid)
+            if test is None:
+                continue
+            select_path = self._write_selection(
+                os.path.join(work_dir, "retry.txt"), [location_of(test)]
+            )
+            for _ in range(count):
+                # The run's time limit covers its retries
+                returncode, _, _ = await self._run_pytest(
+                    pytest_args,
+                    timeout=None,
+                    plugin_env=self._plugin_env(events_path, select_path),
+                    warm=run.args.get("warm", False)
+                )
+                if returncode == 0:
+                    run.flaky.append(nodeid)
+                    break
+        
+        if len(run.flaky) == len(failed):
+            run.returncode = 0
+    
+    def _failed_tests(self, report_file: str) -> list[str] | None:
+        """Failed tests in a JSON report, or None if there are too many to retry."""
+        failed = []
+        for test in iter_report_tests(report_file):
+            if test.get("outcome") in ("failed", "error"):
+                failed.append(test["nodeid"])
+                if len(failed) > MAX_RETRIED_TESTS:
+                    return None
+        return failed
+    
+    async def _collect_tests(
+        self, args: dict, timeout: float | None = None
+    ) -> list[dict]:
+        """Indexed tests a run would execute, in collection order."""
+        test_path = args.get("test_path", "tests/")
+        files = await self._refresh_index(
+            test_path, warm=args.get("warm", False), timeout=timeout
+        )
+        return self.index.select(test_path, files, markers=args.get("markers"))
+    
+    async def _refresh_index(
+        self, test_path: str, warm: bool = False, timeout: float | None = None
+    ) -> list[str]:
+        """Bring the collection index up to date for a test path.
+
+        Only test files that changed since they were last collected are
+        passed to pytest, which is stopped after ``timeout`` seconds
+        (``asyncio.TimeoutError``). Returns the test files under the path.
+        """
+        files, conftests = discover_test_files(test_path)
+        
+        async with self.index.lock:
+            stale = self.index.stale_files(files, conftests)
+            if not stale:
+                return files
+            
+            # Collecting the whole path is cheaper than listing every file
+            base = test_path.split("::")[0]
+            targets = [base] if len(stale) == len(files) else stale
+            pytest_args = ["-p", "pytest_mcp_plugin", "--collect-only", "-q", *targets]
+            
+            with (
+                self.metrics.timed("phase_seconds", "collection"),
+                tempfile.TemporaryDirectory(prefix="pytest-mcp-") as tmp
+            ):
+                events_path = os.path.join(tmp, "events.jsonl")
+                Path(events_path).touch()
+                try:
+                    await self._run_pytest(
+                        pytest_args,
+                        timeout=timeout,
+                        plugin_env=self._plugin_env(events_path),
+                        warm=warm
+                    )
+                except asyncio.TimeoutError:
+                    raise asyncio.TimeoutError(
+                        f"Collecting {test_path} timed out after {timeout:g} seconds."
+                    ) from None
+                
+                collected = {}
+                with open(events_path, encoding="utf-8") as f:
+                    for line in f:
+                        event = json.loads(line)
+                        if event.get("event") == "collected":
+                            collected = event
+            
+            self.index.update(
+                stale,
+                collected.get("items", []),
+                collected.get("errors", []),
+                conftests
+            )
+            self.index.save()
+        
+        return files
+    
+    def _store_results(self, run: TestRun):
+        """Add a finished run's results to the history and apply retention."""
+        with self.metrics.timed("phase_seconds", "report_parsing"):
+            self.store.record_results(run.run_id, run.report_file)
+        if run.flaky:
+            self.store.mark_flaky(run.run_id, run.flaky, passed=run.returncode == 0)
+        self.store.evict()
+        if run.cache_keys:
+            self._cache_results(run)
+    
+    def _load_durations(self) -> dict[str, float]:
+        """Per-test durations recorded by earlier runs."""
+        try:
+            with open(DURATIONS_FILE, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _record_durations(self, report_file: str):
+        """Remember how long each test in a JSON report took."""
+        durations = self._load_durations()
+        try:
+            with self.metrics.timed("phase_seconds", "durations"):
+                for test in iter_report_tests(report_file):
+                    durations[test["nodeid"]] = test_duration(test)
+        except (OSError, ValueError):
+            return
+        
+        # Written off the event loop, so replace the file in one step
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=DATA_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(durations, f)
+        os.replace(tmp, DURATIONS_FILE)
+    
+    async def _follow_events(self, run: TestRun, path: str, stop: asyncio.Event):
+        """Tail a run's event stream until ``stop`` is set and it is drained."""
+        with open(path, encoding="utf-8") as f:
+            pending = ""
+            while True:
+                stopping = stop.is_set()
+                chunk = f.read()
+                if chunk:
+                    pending += chunk
+                    *lines, pending = pending.split("\n")
+                    for line in lines:
+                        await self._handle_event(run, line)
+                elif stopping:
+                    break
+                else:
+                    try:
+                        await asyncio.wait_for(stop.wait(), EVENT_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+    
+    async def _handle_event(self, run: TestRun, line: str):
+        """Update a run from one event line and pass it to its listeners."""
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return
+        
+        if event.get("event") == "collected":
+            # Shards of a parallel run each report their own share
+            run.collected = (run.collected or 0) + event["count"]
+        elif event.get("event") == "test":
+            outcome = event["outcome"]
+            run.counts[outcome] = run.counts.get(outcome, 0) + 1
+            if (
+                outcome in ("failed", "error")
+                and len(run.failures) < MAX_TRACKED_FAILURES
+            ):
+                run.failures.append(event)
+        
+        for listener in list(run.listeners):
+            try:
+                await listener(run, event)
+            except Exception:
+                # A client that went away must not break the run
+                run.listeners.remove(listener)
+    
+    def _make_notifier(self) -> Callable[[TestRun, dict], Awaitable[None]] | None:
+        """Build a run listener that streams results to the calling client.
+
+        Every finished test is sent as an MCP log message (``error`` for
+        failures, ``info`` otherwise) and, when the client asked for it with
+        a progress token, as a progress notification.
+        """
+        try:
+            ctx = self.server.request_context
+        except LookupError:
+            return None
+        
+        session = ctx.session
+        token = ctx.meta.progressToken if ctx.meta else None
+        
+        async def notify(run: TestRun, event: dict):
+            if event.get("event") != "test":
+                return
+            
+            text = f"{event['outcome'].upper()} {event['nodeid']}"
+            if token is not None:
+                await session.send_progress_notification(
+                    token,
+                    run.completed,
+                    run.collected,
+                    message=text,
+                    related_request_id=ctx.request_id
+                )
+            
+            level = "error" if event["outcome"] in ("failed", "error") else "info"
+            min_level = self.log_levels.get(session, "info")
+            if LOG_LEVELS.index(level) >= LOG_LEVELS.index(min_level):
+                await session.send_log_message(
+                    level,
+                    {"run_id": run.run_id, **event},
+                    logger="pytest",
+                    related_request_id=ctx.request_id
+                )
         
-        @self.server.call_tool()
-        async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-            """Handle tool calls."""
-            if name == "run_tests":
-                return await self.run_tests(arguments)
-            elif name == "list_tests":
-                return await self.list_tests(arguments)
-            elif name == "get_test_results":
-                return await self.get_test_results()
-            else:
-                raise ValueError(f"Unknown tool: {name}")
+        return notify
+    
+    def _get_run(self, args: dict) -> TestRun | None:
+        return self.runs.get(args.get("run_id", ""))
+    
+    def _unknown_run(self, args: dict) -> list[TextContent]:
+        return [TextContent(
+            type="text",
+            text=f"⚠️ Unknown run ID: {args.get('run_id')}"
+        )]
+    
+    def _format_run_status(self, run: TestRun) -> str:
+        """Format a short status block for a run."""
+        output = f"**Run ID:** `{run.run_id}`\n\n"
+        output += f"**Status:** {run.status}"
+        position = self.scheduler.position(run)
+        if position is not None:
+            output += f" (position {position} of {len(self.scheduler.waiting)} "
+            output += f"in the run queue, {run.priority} priority)"
+        output += "\n\n"
+        output += f"**Command:** `{' '.join(run.cmd)}`\n\n"
+        if run.shards > 1:
+            output += f"**Shards:** {run.shards}\n\n"
+        output += f"**Elapsed:** {run.elapsed:.2f}s"
+        if run.admitted_at is not None and run.admitted_at - run.started_at >= 0.01:
+            output += f" ({run.admitted_at - run.started_at:.2f}s queued)"
+        output += "\n\n"
+        if run.returncode is not None:
+            output += f"**Exit Code:** {run.returncode}\n\n"
+        
+        total = run.collected if run.collected is not None else "?"
+        counts = ", ".join(f"{k} {v}" for k, v in sorted(run.counts.items()))
+        output += f"**Progress:** {run.completed}/{total} tests"
+        output += f" ({counts})\n\n" if counts else "\n\n"
+        
+        if run.failures:
+            output += "**Failures so far:**\n\n"
+            for failure in run.failures[:10]:
+                output += f"- `{failure['nodeid']}` ({failure['outcome']})\n"
+            if len(run.failures) > 10:
+                output += f"- ...and {len(run.failures) - 10} more\n"
+        return output
+    
+    def _bounded_output(self, run: TestRun, max_bytes: int) -> dict:
+        """A run's pytest output, cut down to ``max_bytes``.
+
+        Output over the budget is written in full to a file under
+        ``OUTPUT_DIR`` and only its tail, where pytest prints its summary,
+        is returned.
+        """
+        text = run.stdout
+        if run.stderr:
+            text += f"\n\n--- stderr ---\n{run.stderr}"
+        
+        data = text.encode()
+        result = {"bytes": len(data), "truncated": False, "text": text}
+        if len(data) > max_bytes:
+            OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+            path = OUTPUT_DIR / f"{run.run_id}.log"
+            path.write_bytes(data)
+            result.update(
+                truncated=True,
+                text=data[len(data) - max_bytes:].decode(errors="ignore"),
+                path=str(path.resolve())
+            )
+        return result
+    
+    def _format_run_output(self, run: TestRun, args: dict | None = None) -> str:
+        """Format a finished run as markdown or JSON, within the size budget."""
+        with self.metrics.timed("phase_seconds", "format"):
+            return self._render_run_output(run, args or {})
+    
+    def _render_run_output(self, run: TestRun, args: dict) -> str:
+        max_bytes = args.get("max_output_bytes", 50000)
+        
+        if args.get("format") == "json":
+            return json.dumps(self._run_result(run, max_bytes))
+        
+        if run.status == "timed_out":
+            return f"❌ Test execution timed out after {run.timeout:g} seconds."
+        if run.status == "cancelled":
+            return f"⚠️ Test run `{run.run_id}` was cancelled."
+        if run.status == "error":
+            return f"❌ Error running tests: {run.error}"
+        
+        output = self._bounded_output(run, max_bytes)
+        
+        text = f"**Command:** `{' '.join(run.cmd)}`\n\n"
+        if run.shards > 1:
+            text += f"**Shards:** {run.shards}\n\n"
+        text += f"**Exit Code:** {run.returncode}\n\n"
+        if run.cached:
+            text += f"**Cached:** {len(run.cached)} tests with unchanged inputs "
+            text += "were not run again (leave out `use_cache` to run them)\n\n"
+        if run.flaky:
+            text += "**Flaky (failed, then passed on retry):** "
+            text += ", ".join(f"`{nodeid}`" for nodeid in run.flaky) + "\n\n"
+        if output["truncated"]:
+            text += (
+                f"**Output** (last {max_bytes} of {output['bytes']} bytes, "
+                f"full output in `{output['path']}`):\n```\n"
+            )
+        else:
+            text += "**Output:**\n```\n"
+        text += output["text"]
+        text += "\n```"
+        return text
+    
+    def _run_result(self, run: TestRun, max_bytes: int) -> dict:
+        """Structured summary of a run for the JSON result format."""
+        failures, _, _ = paginate(
+            (
+                {
+                    "nodeid": failure["nodeid"],
+                    "outcome": failure["outcome"],
+                    "longrepr": truncate(failure.get("longrepr", ""), 500)
+                }
+                for failure in run.failures
+            ),
+            offset=0,
+            limit=20,
+            max_bytes=max_bytes // 2
+        )
+        
+        result = {
+            "run_id": run.run_id,
+            "status": run.status,
+            "exit_code": run.returncode,
+            "command": run.cmd,
+            "shards": run.shards,
+            "elapsed": round(run.elapsed, 3),
+            "collected": run.collected,
+            "summary": run.counts,
+            "failures": failures,
+            "flaky": run.flaky,
+            "cached": len(run.cached),
+            "failures_omitted": (
+                run.counts.get("failed", 0) + run.counts.get("error", 0) - len(failures)
+            )
+        }
+        if run.error:
+            result["error"] = run.error
+        if run.finished and run.status not in ("cancelled", "timed_out"):
+            result["output"] = self._bounded_output(run, max_bytes // 2)
+        return result
     
     async def run_tests(self, args: dict) -> list[TextContent]:
         """Execute pytest with specified parameters."""
-        test_path = args.get("test_path", "tests/")
-        markers = args.get("markers")
-        verbose = args.get("verbose", True)
-        capture = args.get("capture", "no")
+        run = self._start_run(args, timeout=args.get("timeout", 300))
+        await self._wait_in_call(run)
+        return [TextContent(type="text", text=self._format_run_output(run, args))]
+    
+    async def _wait_in_call(self, run: TestRun):
+        """Wait for a run started by the current tool call, streaming its results."""
+        notifier = self._make_notifier()
+        if notifier:
+            run.listeners.append(notifier)
         
-        # Build pytest command
-        cmd = ["pytest", test_path]
+        try:
+            await run.done.wait()
+        except asyncio.CancelledError:
+            # The client gave up on the call, so stop the run as well
+            run.task.cancel()
+            raise
+    
+    async def run_affected_tests(self, args: dict) -> list[TextContent]:
+        """Run only the tests that execute code touched by a set of changes."""
+        if coverage is None:
+            return [TextContent(
+                type="text",
+                text="❌ 'run_affected_tests' needs the 'coverage' package "
+                     "(pip install coverage)."
+            )]
         
-        if verbose:
-            cmd.append("-v")
+        try:
+            changes = await self._find_changes(args)
+        except (ValueError, OSError) as e:
+            return [
+                TextContent(type="text", text=f"❌ Could not find changes: {str(e)}")
+            ]
         
-        cmd.append(f"--capture={capture}")
+        try:
+            tests = await self._collect_tests(args, timeout=args.get("timeout", 300))
+        except asyncio.TimeoutError as e:
+            return [TextContent(type="text", text=f"❌ {e}")]
+        mapped = await asyncio.to_thread(self.impact.mapped_tests)
+        affected = await asyncio.to_thread(self.impact.affected_tests, changes)
         
-        if markers:
-            cmd.extend(["-m", markers])
+        # Tests never recorded may depend on anything, so they always run
+        selected = []
+        unmapped = 0
+        for test in tests:
+            location = location_of(test)
+            if location in affected:
+                selected.append(location)
+            elif location not in mapped:
+                selected.append(location)
+                unmapped += 1
         
-        # Add JSON report
-        cmd.extend(["--json-report", "--json-report-file=test_results.json"])
+        changed_files = [os.path.relpath(path) for path in changes]
+        if args.get("format") == "json" and not selected:
+            return [TextContent(type="text", text=json.dumps({
+                "changed_files": changed_files,
+                "selected": 0,
+                "total": len(tests),
+                "unmapped": 0
+            }))]
+        
+        header = f"**Changed files ({len(changed_files)}):** "
+        header += ", ".join(f"`{path}`" for path in changed_files[:10]) or "none"
+        if len(changed_files) > 10:
+            header += f" and {len(changed_files) - 10} more"
+        header += f"\n\n**Affected tests:** {len(selected)} of {len(tests)}"
+        if unmapped:
+            header += f" ({unmapped} without recorded coverage)"
+        
+        if not selected:
+            return [TextContent(
+                type="text",
+                text=header + "\n\n✅ No tests are affected by these changes."
+            )]
+        
+        run_args = {**args, "record_impact": args.get("record_impact", True)}
+        run = self._start_run(
+            run_args, timeout=args.get("timeout", 300), select=selected
+        )
+        await self._wait_in_call(run)
+        
+        if args.get("format") == "json":
+            result = self._run_result(run, args.get("max_output_bytes", 50000))
+            return [TextContent(type="text", text=json.dumps({
+                "changed_files": changed_files,
+                "selected": len(selected),
+                "total": len(tests),
+                "unmapped": unmapped,
+                **result
+            }))]
+        
+        return [TextContent(
+            type="text",
+            text=header + "\n\n" + self._format_run_output(run, args)
+        )]
+    
+    async def _find_changes(
+        self, args: dict
+    ) -> dict[str, list[tuple[int, int]] | None]:
+        """Changed files (absolute paths) and line ranges for 'run_affected_tests'.
+
+        Taken from ``changed_files``, from a unified ``diff``, or else from
+        ``git diff`` against ``base`` (default: HEAD, i.e. uncommitted changes).
+        """
+        if args.get("changed_files"):
+            return {str(Path(path).resolve()): None for path in args["changed_files"]}
+        
+        # Diff paths are relative to the repository root
+        returncode, stdout, _ = await self._run_command(
+            ["git", "rev-parse", "--show-toplevel"], timeout=30
+        )
+        root = Path(stdout.strip()) if returncode == 0 else Path.cwd()
+        
+        diff = args.get("diff")
+        if diff is None:
+            returncode, diff, stderr = await self._run_command(
+                [
+                    "git",
+                    "diff",
+                    "-U0",
+                    "--no-color",
+                    "--no-ext-diff",
+                    args.get("base", "HEAD"),
+                ],
+                timeout=60,
+            )
+            if returncode != 0:
+                raise ValueError(stderr.strip() or f"git diff exited with {returncode}")
+        
+        return {
+            str((root / path).resolve()): ranges
+            for path, ranges in parse_diff(diff).items()
+        }
+    
+    async def watch_tests(self, args: dict) -> list[TextContent]:
+        """Start re-running the affected tests whenever watched files change."""
+        paths = args.get("paths") or WATCH_PATHS
+        existing = [path for path in paths if os.path.isdir(path)]
+        if not existing:
+            return [TextContent(
+                type="text",
+                text="❌ None of the directories to watch exist: "
+                     + ", ".join(f"`{path}`" for path in paths)
+            )]
+        
+        try:
+            session = self.server.request_context.session
+        except LookupError:
+            session = None
+        
+        run_args = {"test_path": "tests/", "warm": True}
+        run_args.update(
+            (key, value)
+            for key, value in args.items()
+            if key not in ("paths", "debounce")
+        )
+        watch = TestWatch(run_args, create_watcher(existing), session)
+        self.watches[watch.watch_id] = watch
+        watch.task = asyncio.create_task(
+            self._watch_loop(watch, args.get("debounce", 0.5))
+        )
+        
+        output = f"👀 Watching {', '.join(f'`{path}`' for path in existing)} "
+        output += f"({watch.watcher.kind}) as watch `{watch.watch_id}`.\n\n"
+        output += "Tests affected by each batch of changes are run and their results "
+        output += "sent as log messages on the `pytest.watch` logger. "
+        output += "Call `stop_watch` to stop."
+        if len(existing) < len(paths):
+            skipped = [path for path in paths if path not in existing]
+            output += "\n\n⚠️ Not found, not watched: "
+            output += ", ".join(f"`{path}`" for path in skipped)
+        return [TextContent(type="text", text=output)]
+    
+    async def stop_watch(self, args: dict) -> list[TextContent]:
+        """Stop a watch and any run it has in progress."""
+        watch = self.watches.pop(args.get("watch_id", ""), None)
+        if watch is None:
+            return [TextContent(
+                type="text",
+                text=f"⚠️ Unknown watch ID: {args.get('watch_id')}"
+            )]
+        
+        watch.task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await watch.task
+        return [TextContent(
+            type="text",
+            text=f"⏹️ Stopped watch `{watch.watch_id}` after {len(watch.run_ids)} runs."
+        )]
+    
+    async def _watch_loop(self, watch: TestWatch, debounce: float):
+        """Run the tests affected by each batch of changes, one run at a time.
+
+        Changes made while a run is going are batched for the next one. A run
+        that cannot be started ends the watch, after an error notice.
+        """
+        run = None
+        try:
+            while True:
+                changed = await watch.watcher.changes(debounce)
+                notice = {
+                    "changed_files": sorted(os.path.relpath(path) for path in changed)
+                }
+                
+                try:
+                    tests = await self._collect_tests(
+                        watch.args, timeout=watch.args.get("timeout")
+                    )
+                    selected = await asyncio.to_thread(
+                        self._watch_selection, tests, changed
+                    )
+                except Exception as e:
+                    if not await self._notify_watch(
+                        watch, "error", {**notice, "error": str(e)}
+                    ):
+                        break
+                    continue
+                
+                notice["selected"] = len(selected)
+                if not selected:
+                    if not await self._notify_watch(watch, "info", notice):
+                        break
+                    continue
+                
+                try:
+                    run = self._start_run(
+                        watch.args,
+                        timeout=watch.args.get("timeout"),
+                        select=selected,
+                        client=session_id(watch.session)
+                    )
+                except Exception as e:
+                    # The watch's arguments never change, so neither would this
+                    await self._notify_watch(
+                        watch, "error", {**notice, "error": str(e), "stopped": True}
+                    )
+                    break
+                watch.run_ids.append(run.run_id)
+                await run.done.wait()
+                
+                level = "info" if run.status == "passed" else "error"
+                if not await self._notify_watch(watch, level, {
+                    **notice,
+                    "run_id": run.run_id,
+                    "status": run.status,
+                    "summary": run.counts,
+                    "failures": [failure["nodeid"] for failure in run.failures[:20]],
+                    "flaky": run.flaky
+                }):
+                    break
+        finally:
+            if run is not None and not run.finished:
+                run.task.cancel()
+            watch.watcher.close()
+            self.watches.pop(watch.watch_id, None)
+    
+    def _watch_selection(self, tests: list[dict], changed: set[str]) -> list[str]:
+        """Locations of the tests a batch of changed files can affect.
+
+        A test is affected when the impact map says it ran code in a changed
+        file, or when its file or a conftest.py above it imports a changed
+        file, directly or not. A changed pytest configuration file, or a
+        changed directory (the watcher lost track of events), affects all.
+        """
+        if any(
+            os.path.isdir(path) or os.path.basename(path) in PYTEST_CONFIG_FILES
+            for path in changed
+        ):
+            return [location_of(test) for test in tests]
+        
+        affected = self.impact.affected_tests({path: None for path in changed})
+        importers: dict[str, bool] = {}
+        selected = []
+        for test in tests:
+            path = test["path"]
+            if path not in importers:
+                importers[path] = not changed.isdisjoint(
+                    self.inputs.test_dependencies(path)
+                )
+            if importers[path] or location_of(test) in affected:
+                selected.append(location_of(test))
+        return selected
+    
+    async def _notify_watch(self, watch: TestWatch, level: str, data: dict) -> bool:
+        """Send a watch's news to its client; False if the client is gone."""
+        if watch.session is None:
+            return True
         
+        min_level = self.log_levels.get(watch.session, "info")
+        if LOG_LEVELS.index(level) < LOG_LEVELS.index(min_level):
+            return True
         try:
-            # Run pytest
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minutes timeout
+            await watch.session.send_log_message(
+                level,
+                {"watch_id": watch.watch_id, **data},
+                logger="pytest.watch"
             )
-            
-            output = f"**Command:** `{' '.join(cmd)}`\n\n"
-            output += f"**Exit Code:** {result.returncode}\n\n"
-            output += "**Output:**\n```\n"
-            output += result.stdout
-            if result.stderr:
-                output += f"\n\n**Errors:**\n{result.stderr}"
-            output += "\n```"
-            
-            return [TextContent(type="text", text=output)]
-            
-        except subprocess.TimeoutExpired:
+        except Exception:
+            return False
+        return True
+    
+    async def start_test_run(self, args: dict) -> list[TextContent]:
+        """Start a pytest run in the background."""
+        run = self._start_run(args, timeout=args.get("timeout"))
+        
+        position = self.scheduler.position(run)
+        if position is None:
+            output = f"🚀 Started test run `{run.run_id}`\n\n"
+        else:
+            output = f"⏳ Queued test run `{run.run_id}` at position {position} of "
+            output += f"{len(self.scheduler.waiting)} ({run.priority} priority); the "
+            output += "server is at its limit of concurrent runs\n\n"
+        output += f"**Command:** `{' '.join(run.cmd)}`\n\n"
+        output += "Use 'get_run_status' or 'wait_for_run' with this run ID."
+        
+        return [TextContent(type="text", text=output)]
+    
+    async def get_run_status(self, args: dict) -> list[TextContent]:
+        """Report the status of a background run."""
+        run = self._get_run(args)
+        if run is None:
+            return self._unknown_run(args)
+        
+        return [TextContent(type="text", text=self._format_run_status(run))]
+    
+    async def wait_for_run(self, args: dict) -> list[TextContent]:
+        """Wait for a background run to finish."""
+        run = self._get_run(args)
+        if run is None:
+            return self._unknown_run(args)
+        
+        notifier = self._make_notifier()
+        if notifier:
+            run.listeners.append(notifier)
+        
+        try:
+            await asyncio.wait_for(run.done.wait(), args.get("timeout", 60))
+        except asyncio.TimeoutError:
             return [TextContent(
                 type="text",
-                text="❌ Test execution timed out after 5 minutes."
+                text="⏳ Run is still in progress.\n\n" + self._format_run_status(run)
             )]
-        except Exception as e:
+        finally:
+            if notifier in run.listeners:
+                run.listeners.remove(notifier)
+        
+        return [TextContent(type="text", text=self._format_run_output(run, args))]
+    
+    async def cancel_run(self, args: dict) -> list[TextContent]:
+        """Cancel a background run."""
+        run = self._get_run(args)
+        if run is None:
+            return self._unknown_run(args)
+        
+        if run.finished:
             return [TextContent(
                 type="text",
-                text=f"❌ Error running tests: {str(e)}"
+                text=f"⚠️ Run `{run.run_id}` already finished with status "
+                     f"'{run.status}'."
             )]
+        
+        run.task.cancel()
+        await run.done.wait()
+        
+        return [TextContent(
+            type="text",
+            text=f"🛑 Cancelled test run `{run.run_id}`."
+        )]
     
     async def list_tests(self, args: dict) -> list[TextContent]:
-        """List all available tests."""
+        """List all available tests from the collection index."""
         test_path = args.get("test_path", "tests/")
-        
-        cmd = ["pytest", "--collect-only", "-q", test_path]
+        markers = args.get("markers")
+        keyword = args.get("keyword")
         
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
+            files = await asyncio.wait_for(
+                self._refresh_index(test_path, warm=args.get("warm", False)),
                 timeout=30
             )
+            tests = self.index.select(
+                test_path, files, markers=markers, keyword=keyword
+            )
+            errors = self.index.errors(files)
             
-            output = f"**Available Tests in {test_path}:**\n\n"
+            output = f"**Available Tests in {test_path}:** {len(tests)} tests\n\n"
             output += "```\n"
-            output += result.stdout
-            output += "\n```"
+            for test in tests:
+                output += test["nodeid"]
+                if test["markers"]:
+                    output += f"  [{', '.join(test['markers'])}]"
+                output += "\n"
+            output += "```"
+            
+            if errors:
+                output += "\n\n**Collection Errors:**\n\n"
+                for error in errors:
+                    output += f"- `{error['nodeid']}`\n"
+                    output += f"  ```\n  {error['longrepr'][-500:]}\n  ```\n"
             
             return [TextContent(type="text", text=output)]
             
@@ -168,39 +4560,81 @@ class PytestMCPServer:
                 text=f"❌ Error listing tests: {str(e)}"
             )]
     
-    async def get_test_results(self) -> list[TextContent]:
-        """Read and format the last test results."""
-        results_file = Path("test_results.json")
-        
-        if not results_file.exists():
-            return [TextContent(
-                type="text",
-                text="⚠️ No test results found. Run tests first using 'run_tests'."
-            )]
+    async def get_test_results(self, args: dict | None = None) -> list[TextContent]:
+        """Format a run's stored test results, one page at a time."""
+        args = args or {}
+        run_id = args.get("run_id")
         
         try:
-            with open(results_file, "r") as f:
-                data = json.load(f)
+            if run_id:
+                record = await asyncio.to_thread(self.store.get_run, run_id)
+                if record is None:
+                    return self._unknown_run(args)
+                if record["status"] in ("queued", "running"):
+                    return [TextContent(
+                        type="text",
+                        text=f"⏳ Run `{run_id}` is still running. Use 'wait_for_run' "
+                             "and ask again once it has finished."
+                    )]
+            else:
+                record = await asyncio.to_thread(self.store.latest_run)
             
-            summary = data.get("summary", {})
+            if record is None or record["summary"] is None:
+                return [TextContent(
+                    type="text",
+                    text="⚠️ No test results found. Run tests first using 'run_tests'."
+                )]
             
-            output = "**Test Results Summary:**\n\n"
-            output += f"✅ Passed: {summary.get('passed', 0)}\n"
-            output += f"❌ Failed: {summary.get('failed', 0)}\n"
-            output += f"⏭️ Skipped: {summary.get('skipped', 0)}\n"
-            output += f"⏱️ Duration: {summary.get('duration', 0):.2f}s\n\n"
+            outcome = args.get("outcome", "failed")
+            offset = args.get("offset", 0)
+            with self.metrics.timed("phase_seconds", "read_results"):
+                page, total, next_offset = await asyncio.to_thread(
+                    self._read_results, record["run_id"], args
+                )
+            summary = record["summary"]
+            duration = record["duration"] or 0
             
-            # Show failed tests
-            tests = data.get("tests", [])
-            failed_tests = [t for t in tests if t.get("outcome") == "failed"]
+            if args.get("format") == "json":
+                return [TextContent(type="text", text=json.dumps({
+                    "run_id": record["run_id"],
+                    "started_at": record["started_at"],
+                    "exit_code": record["exitcode"],
+                    "duration": duration,
+                    "summary": summary,
+                    "tests": page,
+                    "total": total,
+                    "offset": offset,
+                    "next_offset": next_offset
+                }))]
             
-            if failed_tests:
-                output += "**Failed Tests:**\n\n"
-                for test in failed_tests:
-                    output += f"- `{test.get('nodeid')}`\n"
-                    if "call" in test:
-                        longrepr = test["call"].get("longrepr", "")
-                        output += f"  ```\n  {longrepr[:200]}...\n  ```\n"
+            with self.metrics.timed("phase_seconds", "format"):
+                output = f"**Test Results Summary** (run `{record['run_id']}`, "
+                output += f"{format_time(record['started_at'])}):\n\n"
+                output += f"✅ Passed: {summary.get('passed', 0)}\n"
+                output += f"❌ Failed: {summary.get('failed', 0)}\n"
+                if summary.get("error"):
+                    output += f"💥 Errors: {summary['error']}\n"
+                if summary.get("flaky"):
+                    output += f"🔁 Flaky: {summary['flaky']}\n"
+                output += f"⏭️ Skipped: {summary.get('skipped', 0)}\n"
+                output += f"⏱️ Duration: {duration:.2f}s\n\n"
+                
+                if page:
+                    title = "Failed Tests" if outcome == "failed" else "Tests"
+                    first, last = offset + 1, offset + len(page)
+                    output += f"**{title} ({first}-{last} of {total}):**\n\n"
+                    for test in page:
+                        output += f"- `{test['nodeid']}`"
+                        output += (
+                            f" ({test['outcome']})\n" if outcome != "failed" else "\n"
+                        )
+                        if test["longrepr"]:
+                            output += f"  ```\n  {test['longrepr']}\n  ```\n"
+                
+                if next_offset is not None:
+                    output += (
+                        f"\n_More results: call again with offset={next_offset}._\n"
+                    )
             
             return [TextContent(type="text", text=output)]
             
@@ -210,24 +4644,654 @@ class PytestMCPServer:
                 text=f"❌ Error reading results: {str(e)}"
             )]
     
-    async def run(self):
-        """Start the MCP server."""
+    def _read_results(
+        self, run_id: str, args: dict
+    ) -> tuple[list[dict], int, int | None]:
+        """One page of a run's stored test results, as ``paginate`` returns it."""
+        outcome = args.get("outcome", "failed")
+        max_longrepr = args.get("max_longrepr", 200)
+        
+        if outcome == "failed":
+            wanted = {"failed", "error"}
+        elif outcome == "all":
+            wanted = None
+        else:
+            wanted = {outcome}
+        
+        return paginate(
+            (
+                {
+                    "nodeid": test["nodeid"],
+                    "outcome": test["outcome"],
+                    "duration": round(test["duration"] or 0, 4),
+                    "longrepr": truncate(test["longrepr"] or "", max_longrepr)
+                }
+                for test in self.store.iter_results(run_id, wanted)
+            ),
+            offset=args.get("offset", 0),
+            limit=args.get("limit", 20),
+            max_bytes=args.get("max_bytes", 20000)
+        )
+    
+    async def list_runs(self, args: dict) -> list[TextContent]:
+        """List past and current runs from the run history."""
+        try:
+            since = parse_time(args["since"]) if args.get("since") else None
+            until = parse_time(args["until"]) if args.get("until") else None
+            runs = await asyncio.to_thread(
+                self.store.list_runs,
+                since=since,
+                until=until,
+                status=args.get("status"),
+                nodeid=args.get("nodeid"),
+                outcome=args.get("outcome"),
+                limit=args.get("limit", 20)
+            )
+        except Exception as e:
+            return [TextContent(type="text", text=f"❌ Error listing runs: {str(e)}")]
+        
+        if args.get("format") == "json":
+            return [TextContent(type="text", text=json.dumps({"runs": runs}))]
+        
+        if not runs:
+            return [TextContent(type="text", text="No matching runs found.")]
+        
+        output = f"**Runs ({len(runs)}, newest first):**\n\n"
+        for record in runs:
+            output += f"- `{record['run_id']}` {record['status']} — "
+            output += f"{format_time(record['started_at'])} — `{record['test_path']}`"
+            if record["markers"]:
+                output += f" -m `{record['markers']}`"
+            summary = record["summary"]
+            if summary:
+                counts = ", ".join(
+                    f"{summary[key]} {key}"
+                    for key in ("passed", "failed", "error", "skipped")
+                    if summary.get(key)
+                )
+                output += f" — {counts or 'no tests'} ({record['duration'] or 0:.2f}s)"
+            output += "\n"
+        
+        return [TextContent(type="text", text=output)]
+    
+    async def get_test_history(self, args: dict) -> list[TextContent]:
+        """Show how one test did across past runs."""
+        nodeid = args["nodeid"]
+        try:
+            since = parse_time(args["since"]) if args.get("since") else None
+            until = parse_time(args["until"]) if args.get("until") else None
+            history = await asyncio.to_thread(
+                self.store.test_history,
+                nodeid,
+                since=since,
+                until=until,
+                outcome=args.get("outcome"),
+                limit=args.get("limit", 20)
+            )
+        except Exception as e:
+            return [
+                TextContent(type="text", text=f"❌ Error reading history: {str(e)}")
+            ]
+        
+        max_longrepr = args.get("max_longrepr", 200)
+        for result in history:
+            result["longrepr"] = truncate(result["longrepr"] or "", max_longrepr)
+        
+        if args.get("format") == "json":
+            return [TextContent(type="text", text=json.dumps({
+                "nodeid": nodeid,
+                "results": history
+            }))]
+        
+        if not history:
+            return [TextContent(type="text", text=f"No stored results for `{nodeid}`.")]
+        
+        counts: dict[str, int] = {}
+        for result in history:
+            counts[result["outcome"]] = counts.get(result["outcome"], 0) + 1
+        
+        output = f"**History of `{nodeid}`** (last {len(history)} runs: "
+        output += ", ".join(f"{count} {outcome}" for outcome, count in counts.items())
+        output += "):\n\n"
+        for result in history:
+            output += (
+                f"- {format_time(result['started_at'])} run `{result['run_id']}`: "
+            )
+            output += f"{result['outcome']} ({result['duration'] or 0:.3f}s)\n"
+            if result["longrepr"]:
+                output += f"  ```\n  {result['longrepr']}\n  ```\n"
+        
+        return [TextContent(type="text", text=output)]
+    
+    async def replay_keystrokes(self, args: dict) -> list[TextContent]:
+        """Replay keystroke scripts against the calculator.
+
+        The replay runs in its own process (``python -m src.replay``), like
+        a test run, so a Tk window never shares the server's event loop.
+        """
+        if (
+            not args.get("script")
+            and not args.get("script_file")
+            and not args.get("fuzz")
+        ):
+            return [TextContent(
+                type="text",
+                text="❌ Give a 'script', a 'script_file' or a number of 'fuzz' cases."
+            )]
+        
+        cmd = [sys.executable, "-m", "src.replay", "--json"]
+        cmd.extend(["--backend", args.get("backend", "float")])
+        if args.get("fuzz"):
+            cmd.extend(["--fuzz", str(args["fuzz"])])
+        if args.get("seed") is not None:
+            cmd.extend(["--seed", str(args["seed"])])
+        if args.get("ui"):
+            cmd.append("--ui")
+        timeout = args.get("timeout", 300)
+        
+        script_path = None
+        if args.get("script"):
+            fd, script_path = tempfile.mkstemp(prefix="replay-", suffix=".txt")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(args["script"])
+            cmd.append(script_path)
+        elif args.get("script_file"):
+            cmd.append(args["script_file"])
+        
+        try:
+            returncode, stdout, stderr = await self._run_command(
+                cmd, timeout, self._subprocess_env({})
+            )
+        except asyncio.TimeoutError:
+            return [TextContent(
+                type="text",
+                text=f"❌ Replay timed out after {timeout:g} seconds."
+            )]
+        finally:
+            if script_path:
+                os.unlink(script_path)
+        
+        # Exit status 1 only means some cases failed; the result says which
+        if returncode not in (0, 1):
+            output = truncate(stderr.strip() or stdout.strip(), 2000)
+            return [TextContent(
+                type="text",
+                text=f"❌ Replay failed (exit code {returncode}): {output}"
+            )]
+        try:
+            result = json.loads(stdout)
+        except json.JSONDecodeError:
+            output = truncate(stderr.strip() or stdout.strip(), 2000)
+            return [TextContent(type="text", text=f"❌ Replay failed: {output}")]
+        
+        if args.get("format") == "json":
+            return [TextContent(type="text", text=json.dumps(result))]
+        
+        status = "✅" if not result["failed"] else "❌"
+        output = f"{status} **Replayed {result['cases']} cases** "
+        output += f"({result['keys']} keys) in {result['elapsed']:.3f}s — "
+        output += f"{result['cases_per_second']:.0f} cases/s, "
+        output += f"{result['keys_per_second']:.0f} keys/s\n\n"
+        output += f"**Checked:** {result['checked']}, **Failed:** {result['failed']}\n"
+        if result["failures"]:
+            output += "\n**Failures:**\n"
+            for failure in result["failures"]:
+                where = f"line {failure['line']}: " if failure["line"] else ""
+                output += f"- {where}`{failure['keys']}` showed `{failure['actual']}`, "
+                output += f"expected `{failure['expected']}`\n"
+            hidden = result["failed"] - len(result["failures"])
+            if hidden:
+                output += f"- ... {hidden} more\n"
+        
+        return [TextContent(type="text", text=output)]
+    
+    async def profile_tests(self, args: dict) -> list[TextContent]:
+        """Run tests under cProfile and/or tracemalloc and report their hotspots."""
+        profilers = args.get("profilers", ["cpu"])
+        if not profilers or not set(profilers) <= {"cpu", "memory"}:
+            return [TextContent(
+                type="text",
+                text="❌ 'profilers' must list 'cpu', 'memory' or both."
+            )]
+        sort = args.get("sort", "cumulative")
+        if sort not in PROFILE_SORT_KEYS:
+            return [TextContent(
+                type="text",
+                text=f"❌ Unknown sort {sort!r}: use one of "
+                     f"{', '.join(PROFILE_SORT_KEYS)}."
+            )]
+        timeout = args.get("timeout", 300)
+        
+        pytest_args = ["-p", "pytest_mcp_plugin"]
+        pytest_args.extend(args.get("node_ids") or [args.get("test_path", "tests/")])
+        if args.get("markers"):
+            pytest_args.extend(["-m", args["markers"]])
+        
+        save_to = None
+        if args.get("save_pstats") and "cpu" in profilers:
+            save_to = PROFILES_DIR / f"{uuid.uuid4().hex[:12]}.pstats"
+        
+        work_dir = tempfile.mkdtemp(prefix="pytest-mcp-")
+        events_path = os.path.join(work_dir, "events.jsonl")
+        Path(events_path).touch()
+        try:
+            returncode, stdout, stderr = await self._run_pytest(
+                pytest_args,
+                timeout=timeout,
+                plugin_env=self._plugin_env(
+                    events_path,
+                    profile_dir=os.path.join(work_dir, "profile"),
+                    profilers=profilers,
+                    frames=args.get("frames")
+                ),
+                warm=args.get("warm", False)
+            )
+            profile = await asyncio.to_thread(
+                summarize_profile,
+                os.path.join(work_dir, "profile"),
+                top=args.get("top", 20),
+                sort=sort,
+                project_only=args.get("scope", "project") == "project",
+                save_to=save_to
+            )
+            outcomes: dict[str, int] = {}
+            failed = []
+            with open(events_path, encoding="utf-8") as f:
+                for line in f:
+                    event = json.loads(line)
+                    if event.get("event") == "test":
+                        outcomes[event["outcome"]] = (
+                            outcomes.get(event["outcome"], 0) + 1
+                        )
+                        if event["outcome"] in ("failed", "error"):
+                            failed.append(event["nodeid"])
+        except asyncio.TimeoutError:
+            return [TextContent(
+                type="text",
+                text=f"❌ Profiling timed out after {timeout:g} seconds."
+            )]
+        except Exception as e:
+            return [TextContent(
+                type="text",
+                text=f"❌ Error profiling tests: {str(e)}"
+            )]
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        if not profile["tests"]:
+            output = truncate((stdout + stderr).strip()[-2000:], 2000)
+            return [TextContent(
+                type="text",
+                text=f"❌ No tests were profiled (pytest exit code {returncode}):"
+                     f"\n```\n{output}\n```"
+            )]
+        
+        if args.get("format") == "json":
+            return [TextContent(type="text", text=json.dumps({
+                "exit_code": returncode,
+                "profilers": profilers,
+                "summary": outcomes,
+                "failed": failed,
+                **profile
+            }))]
+        
+        counts = ", ".join(f"{count} {outcome}" for outcome, count in outcomes.items())
+        scope = (
+            "project code" if args.get("scope", "project") == "project" else "all code"
+        )
+        output = f"🔬 **Profiled {profile['tests']} tests** "
+        output += f"({', '.join(profilers)}) — {counts}\n\n"
+        if failed:
+            output += "**Failed:** "
+            output += ", ".join(f"`{nodeid}`" for nodeid in failed[:10])
+            output += (
+                f" and {len(failed) - 10} more\n\n" if len(failed) > 10 else "\n\n"
+            )
+        
+        if profile["profiled_seconds"] is not None:
+            title = {
+                "cumulative": "cumulative time",
+                "tottime": "own time",
+                "calls": "calls",
+            }[sort]
+            output += f"**Top functions by {title}** ({scope}, "
+            output += f"{format_duration(profile['profiled_seconds'])} profiled):\n"
+            for index, function in enumerate(profile["functions"], 1):
+                output += f"{index}. `{function['function']}` — "
+                output += f"{function['file']}:{function['line']} — "
+                output += f"{format_duration(function['cumulative_time'])} cumulative, "
+                output += f"{format_duration(function['own_time'])} own, "
+                output += f"{function['calls']} calls\n"
+            if not profile["functions"]:
+                output += "- No functions\n"
+            output += "\n"
+        
+        if "memory" in profilers:
+            output += f"**Top allocation sites** ({scope}; memory held after each "
+            output += "test's call, summed over tests):\n"
+            for index, site in enumerate(profile["allocations"], 1):
+                output += f"{index}. `{site['site']}`"
+                if site["function"]:
+                    output += f" in `{site['function']}`"
+                output += f" — {format_size(site['size'])} in {site['blocks']} blocks\n"
+            if not profile["allocations"]:
+                output += "- No allocations\n"
+            output += "\n"
+        
+        output += "**Slowest tests** (with profiling overhead):\n"
+        for test in profile["slowest_tests"][:10]:
+            output += f"- `{test['nodeid']}` — {format_duration(test['duration'])}"
+            if "peak" in test:
+                output += f", peak {format_size(test['peak'])}"
+            output += "\n"
+        
+        if profile["pstats"]:
+            output += f"\n**CPU profile saved:** `{profile['pstats']}` "
+            output += "(view with `python -m pstats` or snakeviz)\n"
+        
+        return [TextContent(type="text", text=output)]
+    
+    async def run_benchmarks(self, args: dict) -> list[TextContent]:
+        """Run the benchmark suite and compare it with the baseline."""
+        timeout = args.get("timeout", 600)
+        cmd = [
+            sys.executable, "-m", "benchmarks.suite", "--json",
+            "--results-dir", str(BENCHMARKS_DIR.absolute()),
+            "--samples", str(args.get("samples", 10)),
+            "--alpha", str(args.get("alpha", 0.05)),
+            "--threshold", str(args.get("threshold", 0.1))
+        ]
+        if args.get("baseline"):
+            cmd.extend(["--baseline", args["baseline"]])
+        if args.get("save_baseline"):
+            cmd.append("--save-baseline")
+        # Patterns are never options, even ones starting with '-'
+        cmd.append("--")
+        cmd.extend(args.get("benchmarks") or [])
+        
+        try:
+            returncode, stdout, stderr = await self._run_command(
+                cmd, timeout, self._subprocess_env({}), kind="benchmark"
+            )
+        except asyncio.TimeoutError:
+            return [TextContent(
+                type="text",
+                text=f"❌ Benchmarks timed out after {timeout:g} seconds."
+            )]
+        except Exception as e:
+            return [TextContent(
+                type="text",
+                text=f"❌ Error running benchmarks: {str(e)}"
+            )]
+        
+        if returncode not in (0, 1):
+            output = truncate((stdout + stderr).strip()[-2000:], 2000)
+            return [TextContent(
+                type="text",
+                text=f"❌ Benchmarks failed (exit code {returncode}):"
+                     f"\n```\n{output}\n```"
+            )]
+        
+        try:
+            report = json.loads(stdout)
+        except json.JSONDecodeError:
+            output = truncate(stderr.strip() or stdout.strip(), 2000)
+            return [TextContent(type="text", text=f"❌ Benchmarks failed: {output}")]
+        if args.get("format") == "json":
+            return [TextContent(type="text", text=stdout.strip())]
+        
+        results = report["results"]
+        comparisons = {
+            comparison["name"]: comparison for comparison in report["comparisons"]
+        }
+        output = f"📊 **Benchmarks** at `{results['commit']}`"
+        if report["baseline"]:
+            output += f", compared with `{report['baseline']}`"
+        output += ":\n\n"
+        for name, result in results["benchmarks"].items():
+            samples = result["samples"]
+            median = statistics.median(samples)
+            output += f"- `{name}` — median {format_duration(median)}, "
+            output += f"min {format_duration(min(samples))}"
+            comparison = comparisons.get(name)
+            if comparison:
+                status = comparison["status"]
+                icon = {"regression": "🔴", "improvement": "🟢"}.get(status, "⚪")
+                output += f" — {icon} {comparison['ratio']:.2f}x baseline "
+                output += f"(p={comparison['p_value']:.3f})"
+            output += "\n"
+        
+        regressions = [
+            c["name"] for c in report["comparisons"] if c["status"] == "regression"
+        ]
+        if regressions:
+            output += f"\n🔴 **{len(regressions)} significant regressions:** "
+            output += ", ".join(f"`{name}`" for name in regressions)
+            output += ". Run again to confirm they are not load on the machine.\n"
+        elif report["baseline"]:
+            output += "\n✅ No significant regressions.\n"
+        else:
+            output += "\n⚠️ No baseline to compare with; pass 'save_baseline' to make "
+            output += "these results the baseline.\n"
+        output += f"\nResults saved to `{report['results_file']}`\n"
+        
+        return [TextContent(type="text", text=output)]
+    
+    def _queue_depths(self) -> dict[str, int]:
+        """Work in progress or waiting for a turn, right now."""
+        return {
+            "tool_calls": self.metrics.in_flight,
+            "active_runs": sum(not run.finished for run in self.runs.values()),
+            "runs_queued": len(self.scheduler.waiting),
+            "run_slots_used": self.scheduler.used,
+            "worker_waiting": self.pool.waiting,
+            "worker_busy": self.pool.busy,
+            "worker_idle": len(self.pool.idle),
+            "watches": len(self.watches),
+        }
+    
+    async def get_server_metrics(self, args: dict) -> list[TextContent]:
+        """Report the server's latency, size and queue measurements."""
+        queues = self._queue_depths()
+        if args.get("format") == "prometheus":
+            return [TextContent(type="text", text=self.metrics.prometheus(queues))]
+        
+        snapshot = self.metrics.snapshot(queues)
+        if args.get("format") == "json":
+            return [TextContent(type="text", text=json.dumps(snapshot))]
+        
+        def latency(summary: dict) -> str:
+            return (
+                f"p50 {format_duration(summary['p50'])}, "
+                f"p95 {format_duration(summary['p95'])}, "
+                f"p99 {format_duration(summary['p99'])}, "
+                f"max {format_duration(summary['max'])}"
+            )
+        
+        calls = sum(summary["count"] for summary in snapshot["tool_seconds"].values())
+        output = f"📈 **Server metrics** — up {format_duration(snapshot['uptime'])}, "
+        output += f"{calls} tool calls\n\n"
+        
+        output += "**Tool latency:**\n"
+        for tool, summary in snapshot["tool_seconds"].items():
+            errors = snapshot["tool_errors"].get(tool, 0)
+            output += f"- `{tool}`: {summary['count']} calls"
+            output += f", {errors} failed" if errors else ""
+            output += f" — {latency(summary)}\n"
+        if not calls:
+            output += "- No tool calls yet\n"
+        
+        if snapshot["phase_seconds"]:
+            output += "\n**Hot paths:**\n"
+            for phase, summary in snapshot["phase_seconds"].items():
+                output += f"- {phase}: {summary['count']}x, "
+                output += (
+                    f"{format_duration(summary['total'])} total — {latency(summary)}\n"
+                )
+        
+        output += "\n**Subprocesses:**\n"
+        for kind, summary in snapshot["subprocess_seconds"].items():
+            output += f"- {kind}: {summary['count']} runs, "
+            output += f"{format_duration(summary['total'])} wall"
+            cpu = snapshot["subprocess_cpu_seconds"].get(kind)
+            if cpu:
+                output += f", {format_duration(cpu['total'])} CPU"
+            output += f" — {latency(summary)}\n"
+        if snapshot["children_cpu_seconds"] is not None:
+            output += "- CPU time of all exited subprocesses: "
+            output += f"{format_duration(snapshot['children_cpu_seconds'])}\n"
+        
+        if snapshot["run_queue_seconds"]:
+            output += "\n**Run queue wait:**\n"
+            for priority, summary in snapshot["run_queue_seconds"].items():
+                output += f"- {priority}: {summary['count']} runs — "
+                output += f"{latency(summary)}\n"
+        
+        output += "\n**Payload sizes:**\n"
+        for tool, summary in snapshot["response_bytes"].items():
+            request = snapshot["request_bytes"][tool]
+            output += f"- `{tool}`: requests p50 {format_size(request['p50'])}, "
+            output += f"responses p50 {format_size(summary['p50'])}, "
+            output += f"p99 {format_size(summary['p99'])}, "
+            output += f"max {format_size(summary['max'])}\n"
+        
+        output += "\n**Queues:** "
+        output += ", ".join(
+            f"{queue} {depth}" for queue, depth in snapshot["queues"].items()
+        )
+        output += "\n"
+        
+        return [TextContent(type="text", text=output)]
+    
+    async def _write_metrics(self, path: str, interval: float):
+        """Rewrite the Prometheus metrics file every ``interval`` seconds."""
+        while True:
+            try:
+                await asyncio.to_thread(
+                    self.metrics.write_prometheus, path, self._queue_depths()
+                )
+            except OSError as e:
+                print(f"Could not write metrics to {path}: {e}", file=sys.stderr)
+            await asyncio.sleep(interval)
+    
+    async def run(
+        self, transport: str = "stdio", host: str = HTTP_HOST, port: int = HTTP_PORT
+    ):
+        """Start the MCP server on stdio, or on HTTP for many clients at once."""
         # Print startup message to stderr (won't interfere with MCP protocol)
         print("Pytest MCP Server starting...", file=sys.stderr)
-        print("Waiting for MCP client connection...", file=sys.stderr)
         
-        async with stdio_server() as (read_stream, write_stream):
-            await self.server.run(
-                read_stream,
-                write_stream,
-                self.server.create_initialization_options()
+        prewarm = asyncio.create_task(self.pool.prewarm())
+        metrics_writer = None
+        if METRICS_FILE:
+            metrics_writer = asyncio.create_task(
+                self._write_metrics(METRICS_FILE, METRICS_INTERVAL)
+            )
+        try:
+            if transport == "http":
+                await self.run_http(host, port)
+            else:
+                print("Waiting for MCP client connection...", file=sys.stderr)
+                async with stdio_server() as (read_stream, write_stream):
+                    await self.server.run(
+                        read_stream,
+                        write_stream,
+                        self.server.create_initialization_options()
+                    )
+        finally:
+            tasks = [prewarm] + [watch.task for watch in self.watches.values()]
+            if metrics_writer:
+                tasks.append(metrics_writer)
+            for task in tasks:
+                task.cancel()
+            # Let them finish first: a prewarm could add a worker after closing
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.pool.close()
+            if metrics_writer:
+                # Leave the final numbers behind
+                try:
+                    self.metrics.write_prometheus(METRICS_FILE, self._queue_depths())
+                except OSError:
+                    pass
+    
+    def http_app(self, host: str = HTTP_HOST) -> tuple[Callable, Any]:
+        """ASGI app serving MCP sessions over HTTP, and its session manager.
+
+        Streamable HTTP is served at MCP_PATH and the older SSE transport at
+        SSE_PATH (posting to MESSAGES_PATH). Every session is handled by this
+        server, so they all share its warm workers, run history and result
+        cache. The session manager must be running while requests are served.
+        """
+        security = None
+        if host in LOOPBACK_HOSTS:
+            # Keep web pages from reaching a local server by DNS rebinding
+            security = TransportSecuritySettings(
+                enable_dns_rebinding_protection=True,
+                allowed_hosts=["127.0.0.1:*", "localhost:*", "[::1]:*"],
+                allowed_origins=["http://127.0.0.1:*", "http://localhost:*", "http://[::1]:*"]
             )
+        sessions = StreamableHTTPSessionManager(self.server, security_settings=security)
+        sse = SseServerTransport(MESSAGES_PATH, security_settings=security)
+        
+        async def app(scope, receive, send):
+            if scope["type"] != "http":
+                return
+            path = scope["path"]
+            if path in (MCP_PATH, MCP_PATH + "/"):
+                await sessions.handle_request(scope, receive, send)
+            elif path == SSE_PATH and scope["method"] == "GET":
+                async with sse.connect_sse(scope, receive, send) as streams:
+                    await self.server.run(
+                        *streams, self.server.create_initialization_options()
+                    )
+            elif path == MESSAGES_PATH and scope["method"] == "POST":
+                await sse.handle_post_message(scope, receive, send)
+            else:
+                await send({
+                    "type": "http.response.start",
+                    "status": 404,
+                    "headers": [(b"content-type", b"text/plain")]
+                })
+                await send({"type": "http.response.body", "body": b"Not Found"})
+        
+        return app, sessions
+    
+    async def run_http(self, host: str = HTTP_HOST, port: int = HTTP_PORT):
+        """Serve MCP sessions over HTTP until the server is stopped."""
+        if uvicorn is None:
+            raise RuntimeError("The HTTP transport needs mcp 1.10 or newer")
+        
+        app, sessions = self.http_app(host)
+        config = uvicorn.Config(
+            app, host=host, port=port, lifespan="off", log_level="warning"
+        )
+        print(
+            f"Serving MCP on http://{host}:{port}{MCP_PATH} "
+            f"(SSE: http://{host}:{port}{SSE_PATH})",
+            file=sys.stderr
+        )
+        async with sessions.run():
+            await uvicorn.Server(config).serve()
 
 
-async def main():
+def main(argv: list[str] | None = None):
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Pytest MCP Server")
+    parser.add_argument(
+        "--transport", choices=["stdio", "http"], default="stdio",
+        help="stdio for one client that starts the server, http for many clients "
+             "sharing one long-lived server"
+    )
+    parser.add_argument(
+        "--host", default=HTTP_HOST, help="Address the HTTP transport listens on"
+    )
+    parser.add_argument(
+        "--port", type=int, default=HTTP_PORT, help="Port of the HTTP transport"
+    )
+    args = parser.parse_args(argv)
+    
     # Check if running in a terminal without a client
-    if sys.stdin.isatty():
+    if args.transport == "stdio" and sys.stdin.isatty():
         print("=" * 60)
         print("⚠️  Pytest MCP Server")
         print("=" * 60)
@@ -236,6 +5300,7 @@ async def main():
         print("It should NOT be run directly from the command line.")
         print()
         print("To test the server, use: python test_server.py")
+        print("To serve many clients over HTTP, use: python server.py --transport http")
         print()
         print("To configure with Claude Desktop:")
         print("1. Edit: ~/Library/Application Support/Claude/claude_desktop_config.json")
@@ -246,8 +5311,11 @@ async def main():
         sys.exit(1)
     
     server = PytestMCPServer()
-    await server.run()
+    try:
+        asyncio.run(server.run(args.transport, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
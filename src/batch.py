@@ -0,0 +1,232 @@
+"""Evaluate many calculations in one call.
+
+Results come back in input order: the value the calculator would show as
+its result, or, for an element that fails, the error text the display
+would show (``DIVISION_BY_ZERO``, ``NEGATIVE_NUMBER`` or ``ERROR``). One
+bad element never stops the rest of a batch.
+
+Operands given as NumPy arrays are computed vectorized, for a binary
+operation over numeric columns and for square roots. The fast path is
+only taken when it gives exactly what element-by-element Python
+arithmetic gives: operands of a single type (all int or all float), and
+ints small enough that int64 cannot overflow. Anything else, Python
+lists included (converting them to arrays and back costs more than the
+arithmetic), is evaluated one element at a time.
+"""
+
+import math
+
+from src.calculator_engine import DIVISION_BY_ZERO, ERROR, NEGATIVE_NUMBER
+from src.expression import BINARY_OPERATORS, evaluate
+from src.numeric import FLOAT, get_backend
+
+try:
+    import numpy
+except ImportError:  # Only needed for the vectorized fast path
+    numpy = None
+
+# Operators with a vectorized fast path, and the largest int operand for
+# which int64 gives the same result as Python's unbounded ints (true
+# division goes through float64, exact for ints up to 2**53)
+VECTOR_INT_LIMITS = {
+    "+": 2 ** 62,
+    "-": 2 ** 62,
+    "*": 2 ** 31,
+    "/": 2 ** 53,
+    "//": 2 ** 62,
+    "%": 2 ** 62,
+}
+
+DIVISIONS = ("/", "//", "%")
+
+if numpy is not None:
+    VECTOR_OPERATORS = {
+        "+": numpy.add,
+        "-": numpy.subtract,
+        "*": numpy.multiply,
+        "/": numpy.true_divide,
+        "//": numpy.floor_divide,
+        "%": numpy.remainder,
+    }
+
+
+def calculate_many(expressions, backend=FLOAT):
+    """Evaluate expressions as the calculator's = key would.
+
+    ``backend`` is the numeric backend to compute with, as for
+    ``CalculatorEngine``.
+    """
+    backend = get_backend(backend)
+    results = []
+    append = results.append
+    for text in expressions:
+        try:
+            append(evaluate(text, backend))
+        except ZeroDivisionError:
+            append(DIVISION_BY_ZERO)
+        except Exception:
+            append(ERROR)
+    return results
+
+
+def apply_operator(left, operator_, right):
+    """Apply a binary operator to columns of operands.
+
+    Either side may be a single number, used with every element of the
+    other side.
+    """
+    if operator_ not in BINARY_OPERATORS:
+        raise ValueError(f"Unknown operator: {operator_!r}")
+    
+    if _has_array(left, right) and operator_ in VECTOR_OPERATORS:
+        result = _vector_operation(left, operator_, right)
+        if result is not None:
+            return result
+    
+    function = BINARY_OPERATORS[operator_]
+    results = []
+    append = results.append
+    for a, b in _pairs(left, right):
+        try:
+            append(function(a, b))
+        except ZeroDivisionError:
+            append(DIVISION_BY_ZERO)
+        except Exception:
+            append(ERROR)
+    return results
+
+
+def square_root_many(values):
+    """Take the square root of each value as the calculator's √ key would.
+
+    Values may be numbers or input text; empty text counts as zero.
+    """
+    if _has_array(values):
+        array = _numeric_array(values, kinds="iuf")
+        if array is not None and array.ndim == 1:
+            return _vector_square_root(array)
+    
+    results = []
+    append = results.append
+    for text in values:
+        try:
+            value = float(text) if text != "" else 0
+            if value < 0:
+                append(NEGATIVE_NUMBER)
+            else:
+                append(math.sqrt(value))
+        except Exception:
+            append(ERROR)
+    return results
+
+
+def _pairs(left, right):
+    if numpy is not None:
+        # Python numbers, so arithmetic and its errors are Python's
+        if isinstance(left, (numpy.ndarray, numpy.generic)):
+            left = left.tolist()
+        if isinstance(right, (numpy.ndarray, numpy.generic)):
+            right = right.tolist()
+    left_scalar = _is_scalar(left)
+    right_scalar = _is_scalar(right)
+    if left_scalar and right_scalar:
+        return [(left, right)]
+    if left_scalar:
+        return [(left, b) for b in right]
+    if right_scalar:
+        return [(a, right) for a in left]
+    if len(left) != len(right):
+        raise ValueError(
+            f"Operand columns differ in length: {len(left)} and {len(right)}"
+        )
+    return zip(left, right)
+
+
+def _has_array(*values):
+    return numpy is not None and any(isinstance(v, numpy.ndarray) for v in values)
+
+
+def _is_scalar(value):
+    return isinstance(value, (int, float, complex)) or (
+        numpy is not None and isinstance(value, numpy.generic)
+    )
+
+
+def _numeric_array(values, kinds="if"):
+    """Values as an int64 or float64 array, or None if that would change results.
+
+    Lists must hold only ints or only floats: mixing them would turn ints
+    into floats and change results such as ``2 + 2``.
+    """
+    if isinstance(values, numpy.ndarray):
+        array = values
+    elif _is_scalar(values):
+        if type(values) not in (int, float):
+            return None
+        array = numpy.asarray(values)
+    else:
+        values = list(values)
+        if (
+            not values
+            or len(set(map(type, values))) != 1
+            or type(values[0]) not in (int, float)
+        ):
+            return None
+        try:
+            array = numpy.asarray(values)
+        except OverflowError:
+            return None
+    
+    if array.dtype.kind not in kinds or array.ndim > 1:
+        return None
+    if array.dtype.kind in "iu":
+        if array.dtype.itemsize > 8 or (
+            array.dtype.kind == "u" and array.dtype.itemsize == 8
+        ):
+            return None
+        return array.astype(numpy.int64, copy=False)
+    return array.astype(numpy.float64, copy=False)
+
+
+def _vector_operation(left, operator_, right):
+    a = _numeric_array(left)
+    b = _numeric_array(right)
+    if a is None or b is None or (a.ndim == 0 and b.ndim == 0):
+        return None
+    if a.ndim == 1 and b.ndim == 1 and len(a) != len(b):
+        raise ValueError(f"Operand columns differ in length: {len(a)} and {len(b)}")
+    if a.dtype != b.dtype:
+        # int with float: Python converts the int, so must numpy, exactly
+        if max(_largest(a), _largest(b)) > 2 ** 53:
+            return None
+    elif a.dtype.kind == "i":
+        limit = VECTOR_INT_LIMITS[operator_]
+        if _largest(a) >= limit or _largest(b) >= limit:
+            return None
+    
+    with numpy.errstate(all="ignore"):
+        result = VECTOR_OPERATORS[operator_](a, b)
+    results = result.tolist()
+    
+    if operator_ in DIVISIONS:
+        zeros = numpy.broadcast_to(b == 0, result.shape)
+        for index in numpy.flatnonzero(zeros).tolist():
+            results[index] = DIVISION_BY_ZERO
+    return results
+
+
+def _vector_square_root(array):
+    values = array.astype(numpy.float64)
+    negative = values < 0
+    with numpy.errstate(all="ignore"):
+        roots = numpy.sqrt(numpy.where(negative, 0.0, values))
+    results = roots.tolist()
+    for index in numpy.flatnonzero(negative).tolist():
+        results[index] = NEGATIVE_NUMBER
+    return results
+
+
+def _largest(array):
+    if array.dtype.kind != "i" or not array.size:
+        return 0
+    return max(abs(int(array.max())), abs(int(array.min())))
@@ -1,23 +1,49 @@
 import tkinter as tk
 from tkinter import ttk
 
+from src.calculator_engine import CalculatorEngine
+
 
 class Calculator:
-    """A simple desktop calculator application."""
+    """A simple desktop calculator application.
+
+    The window is a view over a ``CalculatorEngine``, which does the
+    arithmetic; every operation is passed to the engine and the display is
+    then updated from it. While the display shows the input being typed,
+    only the part of it that changed is redrawn.
+    """
     
-    def __init__(self, root):
+    def __init__(self, root, backend="float"):
         self.root = root
         self.root.title("Calculator")
         self.root.geometry("400x500")
         self.root.resizable(False, False)
         
         # Current calculation
-        self.current_input = ""
-        self.result = 0
+        self.engine = CalculatorEngine(backend)
+        
+        # Input characters the display shows, None if it shows other text
+        self.shown_input = None
         
         # Create UI
         self.create_widgets()
     
+    @property
+    def current_input(self):
+        return self.engine.current_input
+    
+    @current_input.setter
+    def current_input(self, value):
+        self.engine.current_input = value
+    
+    @property
+    def result(self):
+        return self.engine.result
+    
+    @result.setter
+    def result(self, value):
+        self.engine.result = value
+    
     def create_widgets(self):
         """Create calculator UI components."""
         # Display
@@ -53,79 +79,65 @@ class Calculator:
     
     def on_button_click(self, char):
         """Handle button click events."""
-        if char == '=':
-            self.calculate()
-        elif char == 'C':
-            self.clear()
-        elif char == 'CE':
-            self.clear_entry()
-        elif char == '←':
-            self.backspace()
-        elif char == '√':
-            self.square_root()
-        else:
-            self.append_char(char)
+        self.engine.press(char)
+        self.refresh_display()
+    
+    def press_keys(self, keys):
+        """Press many keys, updating the display once at the end."""
+        self.engine.press_keys(keys)
+        self.refresh_display()
     
     def append_char(self, char):
         """Add character to current input."""
-        if self.current_input == "0" or self.current_input == "Error":
-            self.current_input = ""
-        
-        self.current_input += char
-        self.update_display(self.current_input)
+        self.engine.append_char(char)
+        self.refresh_display()
     
     def calculate(self):
         """Evaluate the current expression."""
-        try:
-            # Evaluate the expression
-            result = eval(self.current_input)
-            self.result = result
-            self.update_display(str(result))
-            self.current_input = str(result)
-        except ZeroDivisionError:
-            self.update_display("Error: Division by zero")
-            self.current_input = "Error"
-        except Exception as e:
-            self.update_display("Error")
-            self.current_input = "Error"
+        self.engine.calculate()
+        self.refresh_display()
     
     def clear(self):
         """Clear all input."""
-        self.current_input = ""
-        self.result = 0
-        self.update_display("0")
+        self.engine.clear()
+        self.refresh_display()
     
     def clear_entry(self):
         """Clear current entry."""
-        self.current_input = ""
-        self.update_display("0")
+        self.engine.clear_entry()
+        self.refresh_display()
     
     def backspace(self):
         """Remove last character."""
-        if self.current_input:
-            self.current_input = self.current_input[:-1]
-            self.update_display(self.current_input if self.current_input else "0")
+        self.engine.backspace()
+        self.refresh_display()
     
     def square_root(self):
         """Calculate square root of current number."""
-        try:
-            value = float(self.current_input) if self.current_input else 0
-            if value < 0:
-                self.update_display("Error: Negative number")
-                self.current_input = "Error"
-            else:
-                result = value ** 0.5
-                self.result = result
-                self.update_display(str(result))
-                self.current_input = str(result)
-        except Exception:
-            self.update_display("Error")
-            self.current_input = "Error"
+        self.engine.square_root()
+        self.refresh_display()
+    
+    def refresh_display(self):
+        """Show the engine's display text, redrawing only what changed."""
+        engine = self.engine
+        start = engine.take_changes()
+        if not engine.showing_input:
+            self.update_display(engine.display_text)
+            return
+        
+        if self.shown_input is None:
+            self.update_display(engine.current_input)
+        else:
+            start = min(start, self.shown_input)
+            self.display.delete(start, tk.END)
+            self.display.insert(tk.END, engine.input_tail(start))
+        self.shown_input = engine.input_length
     
     def update_display(self, text):
         """Update the display with new text."""
         self.display.delete(0, tk.END)
         self.display.insert(0, text)
+        self.shown_input = None
     
     def get_display_text(self):
         """Get current display text."""
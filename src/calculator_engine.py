@@ -0,0 +1,177 @@
+from src.expression import evaluate
+from src.numeric import get_backend
+
+# Display texts of failed operations
+ERROR = "Error"
+DIVISION_BY_ZERO = "Error: Division by zero"
+NEGATIVE_NUMBER = "Error: Negative number"
+
+
+class CalculatorEngine:
+    """Calculator logic without a GUI.
+
+    Holds the input being typed, the last result and the text the display
+    shows. The Tk ``Calculator`` window is a view over an engine, so the
+    arithmetic can be used and tested without creating any widgets.
+
+    ``backend`` picks the numbers it computes with: "float" (the default),
+    "decimal", "fraction", or a backend from ``src.numeric``, such as a
+    ``DecimalBackend`` with its own context.
+
+    The input is kept as a list of characters, so typing and backspace
+    take constant time however long the input grows; the input text is
+    joined only when it is read. The engine also remembers the first
+    position where the input changed, so a view can redraw just the tail
+    (see ``take_changes``).
+    """
+    
+    def __init__(self, backend="float"):
+        self.backend = get_backend(backend)
+        
+        # Current calculation
+        self._buffer = []
+        self._text = ""
+        self.result = 0
+        
+        # Text shown on the display instead of the input (error messages)
+        self._message = None
+        
+        # First input position changed since the last take_changes()
+        self._changed_from = 0
+    
+    @property
+    def current_input(self):
+        """The input typed so far."""
+        if self._text is None:
+            self._text = "".join(self._buffer)
+        return self._text
+    
+    @current_input.setter
+    def current_input(self, value):
+        self._replace(value)
+    
+    @property
+    def display_text(self):
+        """The text the display shows."""
+        if self._message is not None:
+            return self._message
+        return self.current_input if self._buffer else "0"
+    
+    @display_text.setter
+    def display_text(self, value):
+        self._message = value
+    
+    @property
+    def showing_input(self):
+        """Whether the display shows the input itself."""
+        return self._message is None and bool(self._buffer)
+    
+    @property
+    def input_length(self):
+        return len(self._buffer)
+    
+    def input_tail(self, start):
+        """The input from position ``start`` on."""
+        return "".join(self._buffer[start:])
+    
+    def take_changes(self):
+        """Return the first input position changed since the last call.
+
+        Everything before it is as it was when this was last called.
+        """
+        changed_from = self._changed_from
+        self._changed_from = len(self._buffer)
+        return changed_from
+    
+    def press(self, char):
+        """Handle a button press."""
+        if char == '=':
+            self.calculate()
+        elif char == 'C':
+            self.clear()
+        elif char == 'CE':
+            self.clear_entry()
+        elif char == '←':
+            self.backspace()
+        elif char == '√':
+            self.square_root()
+        else:
+            self.append_char(char)
+    
+    def press_keys(self, keys):
+        """Press each key of a sequence in turn."""
+        for key in keys:
+            self.press(key)
+    
+    def append_char(self, char):
+        """Add character to current input."""
+        if self._input_is("0") or self._input_is(ERROR):
+            self._replace("")
+        
+        self._changed_from = min(self._changed_from, len(self._buffer))
+        self._buffer.extend(char)
+        self._text = None
+        self._message = None
+    
+    def calculate(self):
+        """Evaluate the current expression."""
+        try:
+            # Evaluate the expression
+            result = evaluate(self.current_input, self.backend)
+            self.result = result
+            self._replace(str(result))
+        except ZeroDivisionError:
+            self._fail(DIVISION_BY_ZERO)
+        except Exception:
+            self._fail(ERROR)
+    
+    def clear(self):
+        """Clear all input."""
+        self._replace("")
+        self.result = 0
+    
+    def clear_entry(self):
+        """Clear current entry."""
+        self._replace("")
+    
+    def backspace(self):
+        """Remove last character."""
+        if self._buffer:
+            self._buffer.pop()
+            self._changed_from = min(self._changed_from, len(self._buffer))
+            self._text = None
+            self._message = None
+    
+    def square_root(self):
+        """Calculate square root of current number."""
+        try:
+            backend = self.backend
+            value = (
+                backend.number(self.current_input)
+                if self._buffer
+                else backend.from_int(0)
+            )
+            if value < 0:
+                self._fail(NEGATIVE_NUMBER)
+            else:
+                result = backend.sqrt(value)
+                self.result = result
+                self._replace(str(result))
+        except Exception:
+            self._fail(ERROR)
+    
+    def _input_is(self, text):
+        # Compare lengths first, so the input is not joined on every key
+        return len(self._buffer) == len(text) and self.current_input == text
+    
+    def _replace(self, text):
+        """Replace the whole input, showing it on the display."""
+        self._buffer = list(text)
+        self._text = text
+        self._message = None
+        self._changed_from = 0
+    
+    def _fail(self, message):
+        """Show an error message, leaving "Error" as the input."""
+        self._replace(ERROR)
+        self._message = message
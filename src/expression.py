@@ -0,0 +1,258 @@
+"""Safe arithmetic expressions for the calculator.
+
+Expressions are tokenized, parsed with the precedence rules of Python
+arithmetic and compiled to a short postfix program run on a small stack
+machine, so no Python code is ever evaluated. Compiled programs are kept
+in an LRU cache, which makes evaluating the same expression again cheap.
+
+Supported: int, float and imaginary literals as Python writes them (so
+results such as "1e+20" can be typed on), unary + and -, the binary
+operators + - * / // % **, and parentheses. With the default float
+backend, results and the exceptions raised (ZeroDivisionError,
+OverflowError, ...) are the ones ``eval`` gives for the same text,
+except that powers too large to compute quickly raise OverflowError
+(see ``src.numeric.power``); anything else is an ``ExpressionError``.
+
+The decimal and fraction backends (see ``src.numeric``) compute with
+``Decimal`` or ``Fraction`` instead. Expressions of ints joined by
++ - * // % give exact results on Python ints already, so they are
+computed on ints and only the result is converted.
+"""
+
+import functools
+import re
+
+from src.numeric import FLOAT, get_backend
+
+# Compiled expressions kept for reuse
+CACHE_SIZE = 4096
+
+# Deepest nesting of parentheses and unary operators; each level takes a few
+# parser frames, so this stays well inside Python's recursion limit
+MAX_DEPTH = 100
+
+_DIGITS = r"[0-9](?:_?[0-9])*"
+_EXPONENT = rf"[eE][+-]?{_DIGITS}"
+_POINT_FLOAT = rf"(?:{_DIGITS})?\.{_DIGITS}|{_DIGITS}\."
+_FLOAT = rf"(?:{_POINT_FLOAT})(?:{_EXPONENT})?|{_DIGITS}{_EXPONENT}"
+
+TOKEN = re.compile(
+    rf"""
+    \s*(?:
+        (?P<imaginary>(?:{_FLOAT}|{_DIGITS})[jJ])
+      | (?P<float>{_FLOAT})
+      | (?P<int>[1-9](?:_?[0-9])*|0+(?:_?0)*)
+      | (?P<operator>\*\*|//|[-+*/%()])
+    )
+    """,
+    re.VERBOSE
+)
+
+# Program instructions
+PUSH = "push"
+UNARY = "unary"
+BINARY = "binary"
+
+BINARY_OPERATORS = FLOAT.binary
+
+# Operators whose results on ints are exact ints
+INT_OPERATORS = {"+", "-", "*", "//", "%"}
+
+ADDITIVE = ("+", "-")
+MULTIPLICATIVE = ("*", "/", "//", "%")
+
+
+class ExpressionError(ValueError):
+    """Text that is not a valid arithmetic expression."""
+
+
+def tokenize(text):
+    """Split an expression into (kind, text) tokens.
+
+    Kinds are "int", "float", "imaginary" and "operator".
+    """
+    tokens = []
+    position = 0
+    end = len(text.rstrip())
+    while position < end:
+        match = TOKEN.match(text, position)
+        if match is None:
+            raise ExpressionError(
+                f"Unexpected character at {position}: {text[position:]!r}"
+            )
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """Precedence parser emitting a postfix program.
+
+    Grammar, loosest binding first (as in Python):
+
+        expression := term (("+" | "-") term)*
+        term       := factor (("*" | "/" | "//" | "%") factor)*
+        factor     := ("+" | "-") factor | power
+        power      := atom ["**" factor]
+        atom       := number | "(" expression ")"
+    """
+    
+    def __init__(self, text, backend=FLOAT):
+        self.tokens = tokenize(text)
+        self.backend = backend
+        self.position = 0
+        self.depth = 0
+        self.code = []
+    
+    def parse(self):
+        if not self.tokens:
+            raise ExpressionError("Empty expression")
+        self.expression()
+        if self.position < len(self.tokens):
+            raise ExpressionError(f"Unexpected {self.tokens[self.position][1]!r}")
+        return tuple(self.code)
+    
+    def peek(self):
+        if self.position < len(self.tokens):
+            kind, text = self.tokens[self.position]
+            if kind == "operator":
+                return text
+        return None
+    
+    def expression(self):
+        self.term()
+        while self.peek() in ADDITIVE:
+            operator_ = self.advance()
+            self.term()
+            self.code.append((BINARY, operator_))
+    
+    def term(self):
+        self.factor()
+        while self.peek() in MULTIPLICATIVE:
+            operator_ = self.advance()
+            self.factor()
+            self.code.append((BINARY, operator_))
+    
+    def factor(self):
+        if self.peek() in ADDITIVE:
+            operator_ = self.advance()
+            self.nest()
+            self.factor()
+            self.depth -= 1
+            self.code.append((UNARY, operator_))
+        else:
+            self.power()
+    
+    def power(self):
+        self.atom()
+        if self.peek() == "**":
+            self.advance()
+            self.nest()
+            self.factor()
+            self.depth -= 1
+            self.code.append((BINARY, "**"))
+    
+    def atom(self):
+        if self.position >= len(self.tokens):
+            raise ExpressionError("Unexpected end of expression")
+        kind, text = self.tokens[self.position]
+        
+        if kind == "operator":
+            if text != "(":
+                raise ExpressionError(f"Unexpected {text!r}")
+            self.advance()
+            self.nest()
+            self.expression()
+            self.depth -= 1
+            if self.peek() != ")":
+                raise ExpressionError("Missing ')'")
+            self.advance()
+            return
+        
+        self.advance()
+        try:
+            value = self.backend.literal(kind, text)
+        except (ValueError, ArithmeticError) as e:
+            raise ExpressionError(f"Invalid number {text!r}: {e}") from None
+        self.code.append((PUSH, value))
+    
+    def advance(self):
+        text = self.tokens[self.position][1]
+        self.position += 1
+        return text
+    
+    def nest(self):
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise ExpressionError("Expression is nested too deeply")
+
+
+class CompiledExpression:
+    """An expression compiled to a postfix program for a numeric backend.
+
+    Operators in the program are resolved to the backend's functions, and
+    ``convert``, if given, is applied to the result.
+    """
+    
+    __slots__ = ("text", "code", "convert")
+    
+    def __init__(self, text, code, backend=FLOAT, convert=None):
+        self.text = text
+        self.code = tuple(
+            (kind, backend.binary[value] if kind is BINARY else
+             backend.unary[value] if kind is UNARY else value)
+            for kind, value in code
+        )
+        self.convert = convert
+    
+    def evaluate(self):
+        """Run the program and return its value."""
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        for kind, value in self.code:
+            if kind is PUSH:
+                push(value)
+            elif kind is BINARY:
+                right = pop()
+                stack[-1] = value(stack[-1], right)
+            else:
+                stack[-1] = value(stack[-1])
+        if self.convert is not None:
+            return self.convert(stack[0])
+        return stack[0]
+    
+    def __repr__(self):
+        return f"CompiledExpression({self.text!r})"
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(text, backend=FLOAT):
+    """Compile an expression, reusing the cached program for repeated text.
+
+    ``backend`` is a numeric backend or its name ("float", "decimal",
+    "fraction").
+    """
+    backend = get_backend(backend)
+    code = Parser(text).parse()
+    if backend is FLOAT:
+        return CompiledExpression(text, code)
+    if backend.exact and _int_only(code):
+        return CompiledExpression(text, code, FLOAT, backend.from_int)
+    return CompiledExpression(text, Parser(text, backend).parse(), backend)
+
+
+def evaluate(text, backend=FLOAT):
+    """Evaluate an arithmetic expression like ``eval`` would, but safely."""
+    return compile_expression(text, backend).evaluate()
+
+
+def _int_only(code):
+    """Whether a program computes with ints only, exactly."""
+    for kind, value in code:
+        if kind is PUSH and type(value) is not int:
+            return False
+        if kind is BINARY and value not in INT_OPERATORS:
+            return False
+    return True
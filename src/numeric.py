@@ -0,0 +1,212 @@
+"""Numeric backends for the calculator.
+
+A backend decides what numbers an expression computes with:
+
+- ``float``: Python's own arithmetic, ints exact and everything else
+  float. The default, and the fastest.
+- ``decimal``: ``decimal.Decimal`` in a configurable context (precision,
+  rounding), so decimal input such as 0.1 is exact up to the precision.
+- ``fraction``: ``fractions.Fraction``, exact rational arithmetic.
+
+Division, floor division and modulo follow Python's rules in every
+backend (the quotient is floored, division by zero is a
+ZeroDivisionError). Results that cannot be exact, such as non-integer
+powers and most square roots, are floats in the fraction backend. Exact
+powers too large to compute quickly (``9**9**9``) raise OverflowError, or
+``decimal.Overflow`` in the decimal backend.
+"""
+
+import decimal
+import math
+import operator
+from fractions import Fraction
+
+# Significant digits of the decimal backend's default context
+DECIMAL_PRECISION = 28
+
+# Largest exact power computed, in bits; ints and fractions grow without
+# bound, so 9**9**9 would take minutes and gigabytes
+MAX_POWER_BITS = 100_000
+
+
+def power(a, b):
+    """``a ** b``, raising OverflowError for exact results over the limit."""
+    if (
+        type(a) in (int, Fraction)
+        and type(b) in (int, Fraction)
+        and b.denominator == 1
+        # An int to a negative power is a float, computed quickly
+        and (b > 0 or type(a) is Fraction)
+    ):
+        size = max(a.numerator.bit_length(), a.denominator.bit_length())
+        # |a| ** |b| has at least this many bits (none for 0, 1 and -1)
+        if (size - 1) * abs(b.numerator) > MAX_POWER_BITS:
+            raise OverflowError("Result of ** is too large")
+    return a ** b
+
+
+class FloatBackend:
+    """Python arithmetic: ints stay exact, other numbers are floats."""
+    
+    name = "float"
+    exact = False
+    
+    def __init__(self):
+        self.binary = {
+            "+": operator.add,
+            "-": operator.sub,
+            "*": operator.mul,
+            "/": operator.truediv,
+            "//": operator.floordiv,
+            "%": operator.mod,
+            "**": power,
+        }
+        self.unary = {"-": operator.neg, "+": operator.pos}
+    
+    def literal(self, kind, text):
+        """The number a literal of the expression stands for."""
+        if kind == "int":
+            return int(text)
+        if kind == "float":
+            return float(text)
+        return complex(text)
+    
+    def from_int(self, value):
+        return value
+    
+    def number(self, text):
+        """Parse the calculator's input as a number."""
+        return float(text)
+    
+    def sqrt(self, value):
+        return math.sqrt(value)
+    
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class DecimalBackend(FloatBackend):
+    """``decimal.Decimal`` arithmetic in a given context."""
+    
+    name = "decimal"
+    exact = True
+    
+    def __init__(self, context=None):
+        if context is None:
+            context = decimal.Context(prec=DECIMAL_PRECISION)
+        self.context = context
+        self.binary = {
+            "+": context.add,
+            "-": context.subtract,
+            "*": context.multiply,
+            "/": self.divide,
+            "//": self.floor_divide,
+            "%": self.modulo,
+            "**": self.power,
+        }
+        self.unary = {"-": context.minus, "+": context.plus}
+    
+    def literal(self, kind, text):
+        if kind == "imaginary":
+            raise ValueError("Imaginary numbers need the float backend")
+        return self.context.plus(decimal.Decimal(text))
+    
+    def from_int(self, value):
+        return self.context.create_decimal(value)
+    
+    def number(self, text):
+        return self.context.plus(decimal.Decimal(text))
+    
+    def sqrt(self, value):
+        return self.context.sqrt(value)
+    
+    def divide(self, a, b):
+        if not b:
+            raise ZeroDivisionError("division by zero")
+        return self.context.divide(a, b)
+    
+    def floor_divide(self, a, b):
+        return self._divmod(a, b)[0]
+    
+    def modulo(self, a, b):
+        return self._divmod(a, b)[1]
+    
+    def power(self, a, b):
+        if not a and b < 0:
+            raise ZeroDivisionError("zero to a negative power")
+        return self.context.power(a, b)
+    
+    def _divmod(self, a, b):
+        """Floored quotient and remainder, as Python's divmod gives them.
+
+        Decimal truncates the quotient towards zero instead.
+        """
+        if not b:
+            raise ZeroDivisionError("division by zero")
+        context = self.context
+        quotient, remainder = context.divmod(a, b)
+        if remainder and (remainder < 0) != (b < 0):
+            quotient = context.subtract(quotient, 1)
+            remainder = context.add(remainder, b)
+        return quotient, remainder
+    
+    def __repr__(self):
+        context = self.context
+        return f"DecimalBackend(prec={context.prec}, rounding={context.rounding})"
+
+
+class FractionBackend(FloatBackend):
+    """Exact rational arithmetic with ``fractions.Fraction``."""
+    
+    name = "fraction"
+    exact = True
+    
+    def __init__(self):
+        super().__init__()
+        self.binary["//"] = lambda a, b: Fraction(a // b)
+    
+    def literal(self, kind, text):
+        if kind == "imaginary":
+            raise ValueError("Imaginary numbers need the float backend")
+        return Fraction(decimal.Decimal(text))
+    
+    def from_int(self, value):
+        return Fraction(value)
+    
+    def number(self, text):
+        # Fraction results show as "1/3", which reads back as a number
+        return Fraction(text)
+    
+    def sqrt(self, value):
+        """The exact root of a square, otherwise a float."""
+        value = Fraction(value)
+        numerator = math.isqrt(value.numerator)
+        denominator = math.isqrt(value.denominator)
+        if (
+            numerator * numerator == value.numerator
+            and denominator * denominator == value.denominator
+        ):
+            return Fraction(numerator, denominator)
+        return math.sqrt(value)
+
+
+BACKENDS = {
+    "float": FloatBackend(),
+    "decimal": DecimalBackend(),
+    "fraction": FractionBackend(),
+}
+
+FLOAT = BACKENDS["float"]
+
+
+def get_backend(backend):
+    """Resolve a backend name, passing backend objects through."""
+    if isinstance(backend, str):
+        try:
+            return BACKENDS[backend]
+        except KeyError:
+            choices = ", ".join(BACKENDS)
+            raise ValueError(
+                f"Unknown numeric backend: {backend!r} (choose from {choices})"
+            ) from None
+    return backend
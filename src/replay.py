@@ -0,0 +1,279 @@
+"""Replay keystroke scripts against the calculator.
+
+A script has one case per line: the keys to press, optionally followed by
+``=>`` and the text the display must show afterwards::
+
+    # comments and blank lines are skipped
+    12+34=          => 46
+    10/0=           => Error: Division by zero
+    [C]9[SQRT]      => 3.0
+    123<<           => 1
+
+Keys are the calculator's buttons: digits, ``. + - * / ( ) =``, ``C``,
+``CE``, ``←`` and ``√``. ``<`` is short for ``←``, and any button can be
+written by name in brackets: ``[C]``, ``[CE]``, ``[BS]``, ``[SQRT]``.
+
+Each case starts from a cleared calculator. Its keys are pressed in one
+batch with a single display update at the end, and the final display is
+checked. Cases without an expected display are still replayed, which with
+``fuzz`` makes random key sequences a smoke test: on the Tk window every
+case is also compared with a calculator engine fed the same keys.
+
+Run as ``python -m src.replay SCRIPT`` (``-`` reads standard input); see
+``--help``.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from src.calculator_engine import CalculatorEngine
+
+BUTTONS = [
+    "0", "1", "2", "3", "4", "5", "6", "7", "8", "9",
+    ".", "+", "-", "*", "/", "(", ")", "=", "C", "CE", "←", "√",
+]
+
+KEY_NAMES = {
+    "C": "C",
+    "CE": "CE",
+    "BS": "←",
+    "SQRT": "√",
+}
+
+EXPECT = "=>"
+
+# Failures kept in a result, with their keys and displays
+MAX_FAILURES = 20
+
+
+class ScriptError(ValueError):
+    """A keystroke script that cannot be parsed."""
+
+
+class ReplayCase:
+    """Keys to press and the display expected afterwards, if any."""
+    
+    def __init__(self, keys, expected=None, line=None):
+        self.keys = keys
+        self.expected = expected
+        self.line = line
+    
+    def __repr__(self):
+        return f"ReplayCase({''.join(self.keys)!r}, expected={self.expected!r})"
+
+
+def parse_keys(text):
+    """Split compact key text like "12+34=" into button presses."""
+    keys = []
+    position = 0
+    while position < len(text):
+        char = text[position]
+        if char.isspace():
+            position += 1
+        elif char == "[":
+            end = text.find("]", position)
+            name = text[position + 1:end] if end != -1 else ""
+            if name.upper() not in KEY_NAMES:
+                raise ScriptError(
+                    f"Unknown key name at {position}: {text[position:]!r}"
+                )
+            keys.append(KEY_NAMES[name.upper()])
+            position = end + 1
+        elif text.startswith("CE", position):
+            keys.append("CE")
+            position += 2
+        elif char == "<":
+            keys.append("←")
+            position += 1
+        elif char in BUTTONS:
+            keys.append(char)
+            position += 1
+        else:
+            raise ScriptError(f"Unknown key at {position}: {char!r}")
+    return keys
+
+
+def parse_script(text):
+    """Parse a script into cases, one per non-blank, non-comment line."""
+    cases = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        keys, separator, expected = line.partition(EXPECT)
+        try:
+            parsed = parse_keys(keys)
+        except ScriptError as e:
+            raise ScriptError(f"Line {number}: {e}") from None
+        cases.append(
+            ReplayCase(parsed, expected.strip() if separator else None, number)
+        )
+    return cases
+
+
+def generate_cases(count, max_keys=20, seed=None):
+    """Random key sequences, for fuzzing the calculator."""
+    rng = random.Random(seed)
+    # Mostly digits and operators, like real input
+    weights = [8 if key.isdigit() else 1 for key in BUTTONS]
+    return [
+        ReplayCase(rng.choices(BUTTONS, weights, k=rng.randint(1, max_keys)))
+        for _ in range(count)
+    ]
+
+
+class ReplayResult:
+    """Outcome and throughput of replaying cases."""
+    
+    def __init__(self):
+        self.cases = 0
+        self.keys = 0
+        self.checked = 0
+        self.failed = 0
+        self.failures = []
+        self.elapsed = 0.0
+    
+    @property
+    def passed(self):
+        return self.failed == 0
+    
+    def add_failure(self, case, actual, expected):
+        self.failed += 1
+        if len(self.failures) < MAX_FAILURES:
+            self.failures.append({
+                "line": case.line,
+                "keys": "".join(case.keys),
+                "expected": expected,
+                "actual": actual,
+            })
+    
+    def as_dict(self):
+        elapsed = self.elapsed or 1e-9
+        return {
+            "cases": self.cases,
+            "keys": self.keys,
+            "checked": self.checked,
+            "failed": self.failed,
+            "failures": self.failures,
+            "elapsed": round(self.elapsed, 6),
+            "cases_per_second": round(self.cases / elapsed, 1),
+            "keys_per_second": round(self.keys / elapsed, 1),
+        }
+
+
+def replay(cases, calculator=None, backend="float"):
+    """Replay cases on a calculator and check their final displays.
+
+    ``calculator`` is a Tk ``Calculator`` or a ``CalculatorEngine``; by
+    default a new engine with the given numeric backend. On a Tk window,
+    each case's display is also compared with a separate engine's.
+    """
+    if calculator is None:
+        calculator = CalculatorEngine(backend)
+    window = not isinstance(calculator, CalculatorEngine)
+    model = CalculatorEngine(calculator.engine.backend) if window else None
+    
+    result = ReplayResult()
+    start = time.perf_counter()
+    for case in cases:
+        result.cases += 1
+        result.keys += len(case.keys)
+        calculator.clear()
+        try:
+            calculator.press_keys(case.keys)
+            actual = (
+                calculator.get_display_text() if window else calculator.display_text
+            )
+        except Exception as e:
+            result.add_failure(
+                case, f"{type(e).__name__}: {e}", case.expected or "no exception"
+            )
+            continue
+        
+        expected = case.expected
+        if expected is None and window:
+            model.clear()
+            model.press_keys(case.keys)
+            expected = model.display_text
+        if expected is not None:
+            result.checked += 1
+            if actual != expected:
+                result.add_failure(case, actual, expected)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def format_result(result):
+    """A readable summary of a replay."""
+    summary = result.as_dict()
+    lines = [
+        f"{summary['cases']} cases, {summary['keys']} keys "
+        f"in {summary['elapsed']:.3f}s ({summary['cases_per_second']:.0f} cases/s, "
+        f"{summary['keys_per_second']:.0f} keys/s)",
+        f"{summary['checked']} checked, {summary['failed']} failed",
+    ]
+    for failure in result.failures:
+        where = f"line {failure['line']}: " if failure["line"] else ""
+        lines.append(
+            f"  {where}{failure['keys']!r} showed {failure['actual']!r}, "
+            f"expected {failure['expected']!r}"
+        )
+    if result.failed > len(result.failures):
+        lines.append(f"  ... {result.failed - len(result.failures)} more failures")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """Replay a script file from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Replay keystroke scripts against the calculator."
+    )
+    parser.add_argument("script", nargs="?", help="Script file, '-' for standard input")
+    parser.add_argument(
+        "--fuzz", type=int, default=0, help="Also replay this many random cases"
+    )
+    parser.add_argument("--seed", type=int, help="Random seed for --fuzz")
+    parser.add_argument("--backend", default="float", help="float, decimal or fraction")
+    parser.add_argument(
+        "--ui", action="store_true", help="Drive the Tk window (needs a display)"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args(argv)
+    
+    cases = []
+    try:
+        if args.script:
+            if args.script == "-":
+                text = sys.stdin.read()
+            else:
+                with open(args.script, encoding="utf-8") as f:
+                    text = f.read()
+            cases = parse_script(text)
+    except (OSError, ScriptError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if args.fuzz:
+        cases += generate_cases(args.fuzz, seed=args.seed)
+    
+    calculator = None
+    if args.ui:
+        import tkinter as tk
+        from src.calculator_app import Calculator
+        try:
+            root = tk.Tk()
+        except tk.TclError as e:
+            print(f"Error: cannot open the calculator window: {e}", file=sys.stderr)
+            return 2
+        root.withdraw()
+        calculator = Calculator(root, args.backend)
+    
+    result = replay(cases, calculator, args.backend)
+    print(json.dumps(result.as_dict()) if args.json else format_result(result))
+    return 0 if result.passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
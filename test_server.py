@@ -74,6 +74,101 @@ async def test_server():
                     print(f"❌ run_tests failed: {e}")
                 print()
                 
+                # Test: Background run
+                print("6. Testing 'start_test_run' and 'wait_for_run' tools...")
+                try:
+                    result = await session.call_tool(
+                        "start_test_run",
+                        {"test_path": "tests/test_calculator.py::TestBasicOperations"}
+                    )
+                    run_id = result.content[0].text.split("`")[1]
+                    result = await session.call_tool("wait_for_run", {"run_id": run_id})
+                    print(f"✅ background run {run_id} works!")
+                    print(f"   Response length: {len(str(result.content))} characters")
+                except Exception as e:
+                    print(f"❌ background run failed: {e}")
+                print()
+                
+                # Test: Run history
+                print("7. Testing 'list_runs' tool...")
+                try:
+                    result = await session.call_tool("list_runs", {"limit": 5})
+                    print("✅ list_runs works!")
+                    print(f"   Response length: {len(str(result.content))} characters")
+                except Exception as e:
+                    print(f"❌ list_runs failed: {e}")
+                print()
+                
+                # Test: Watch mode
+                print("8. Testing 'watch_tests' and 'stop_watch' tools...")
+                try:
+                    result = await session.call_tool(
+                        "watch_tests", {"paths": ["src", "tests"]}
+                    )
+                    watch_id = (
+                        result.content[0].text.split("as watch `")[1].split("`")[0]
+                    )
+                    result = await session.call_tool(
+                        "stop_watch", {"watch_id": watch_id}
+                    )
+                    print(f"✅ watch {watch_id} works!")
+                    print(f"   Response length: {len(str(result.content))} characters")
+                except Exception as e:
+                    print(f"❌ watch mode failed: {e}")
+                print()
+                
+                # Test replay_keystrokes
+                print("9. Testing 'replay_keystrokes' tool...")
+                try:
+                    result = await session.call_tool("replay_keystrokes", {
+                        "script": "12+34= => 46\n10/0= => Error: Division by zero\n",
+                        "fuzz": 1000
+                    })
+                    print("✅ replay_keystrokes works!")
+                    print(f"   {result.content[0].text.splitlines()[0]}")
+                except Exception as e:
+                    print(f"❌ replay_keystrokes failed: {e}")
+                print()
+                
+                # Test get_server_metrics
+                print("10. Testing 'get_server_metrics' tool...")
+                try:
+                    result = await session.call_tool(
+                        "get_server_metrics", {"format": "json"}
+                    )
+                    metrics = json.loads(result.content[0].text)
+                    print("✅ get_server_metrics works!")
+                    print(f"   Measured {len(metrics['tool_seconds'])} tools")
+                except Exception as e:
+                    print(f"❌ get_server_metrics failed: {e}")
+                print()
+                
+                # Test profile_tests
+                print("11. Testing 'profile_tests' tool...")
+                try:
+                    result = await session.call_tool("profile_tests", {
+                        "test_path": "tests/test_expression.py",
+                        "top": 5
+                    })
+                    print("✅ profile_tests works!")
+                    print(f"   {result.content[0].text.splitlines()[0]}")
+                except Exception as e:
+                    print(f"❌ profile_tests failed: {e}")
+                print()
+                
+                # Test run_benchmarks
+                print("12. Testing 'run_benchmarks' tool...")
+                try:
+                    result = await session.call_tool("run_benchmarks", {
+                        "benchmarks": ["calculator.*"],
+                        "samples": 3
+                    })
+                    print("✅ run_benchmarks works!")
+                    print(f"   {result.content[0].text.splitlines()[0]}")
+                except Exception as e:
+                    print(f"❌ run_benchmarks failed: {e}")
+                print()
+                
                 print("=" * 60)
                 print("✅ All tests passed! Server is working correctly.")
                 print("=" * 60)
@@ -0,0 +1,124 @@
+"""Fixtures shared by the calculator tests.
+
+Creating a ``tk.Tk()`` root and the calculator's widgets is most of the
+cost of a test, so both are created once per test session (once per
+process when tests run in parallel). The ``calculator`` fixture clears the
+shared calculator before each test instead.
+
+Tk needs an X display on Linux. When ``DISPLAY`` is not set, or
+``PYTEST_HEADLESS=1`` is, the session starts a virtual display with Xvfb
+(``apt install xvfb``) and stops it when the tests are done.
+
+The ``mcp_server`` fixture is for the tests of the MCP server itself.
+"""
+
+import os
+import select
+import shutil
+import subprocess
+import sys
+import tkinter as tk
+from pathlib import Path
+
+import pytest
+
+import server
+from src.calculator_app import Calculator
+
+# Seconds to wait for Xvfb to report the display it opened
+XVFB_TIMEOUT = 10
+
+
+def needs_x_display():
+    """Whether Tk draws through X11 here (macOS and Windows have their own)."""
+    return sys.platform not in ("win32", "darwin")
+
+
+def start_xvfb():
+    """Start Xvfb on a free display number.
+
+    Returns the process and the value to use for ``DISPLAY``.
+    """
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen(
+        [
+            "Xvfb", "-displayfd", str(write_fd),
+            "-screen", "0", "1024x768x24", "-nolisten", "tcp"
+        ],
+        pass_fds=(write_fd,),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    os.close(write_fd)
+
+    # Xvfb writes the display number once it accepts connections
+    with os.fdopen(read_fd) as pipe:
+        ready, _, _ = select.select([pipe], [], [], XVFB_TIMEOUT)
+        number = pipe.readline().strip() if ready else ""
+    if not number:
+        process.kill()
+        process.wait()
+        raise RuntimeError("Xvfb did not start")
+    return process, f":{number}"
+
+
+@pytest.fixture(scope="session")
+def display():
+    """The X display Tk draws on, started with Xvfb in headless mode."""
+    headless = os.environ.get("PYTEST_HEADLESS") == "1"
+    if not needs_x_display() or (os.environ.get("DISPLAY") and not headless):
+        yield os.environ.get("DISPLAY")
+        return
+
+    if shutil.which("Xvfb") is None:
+        pytest.fail(
+            "No X display for Tk: set DISPLAY, or install Xvfb to run headless",
+            pytrace=False
+        )
+
+    process, name = start_xvfb()
+    previous = os.environ.get("DISPLAY")
+    os.environ["DISPLAY"] = name
+    try:
+        yield name
+    finally:
+        if previous is None:
+            del os.environ["DISPLAY"]
+        else:
+            os.environ["DISPLAY"] = previous
+        process.terminate()
+        process.wait(timeout=XVFB_TIMEOUT)
+
+
+@pytest.fixture(scope="session")
+def tk_root(display):
+    """One Tk root for the whole session."""
+    root = tk.Tk()
+    yield root
+    root.destroy()
+
+
+@pytest.fixture(scope="session")
+def shared_calculator(tk_root):
+    """The calculator built once on the session's Tk root."""
+    return Calculator(tk_root)
+
+
+@pytest.fixture
+def calculator(shared_calculator):
+    """A calculator in its initial state."""
+    shared_calculator.clear()
+    return shared_calculator
+
+
+@pytest.fixture
+def mcp_server(tmp_path, monkeypatch):
+    """A server keeping its data under ``tmp_path`` and running from there."""
+    data_dir = server.DATA_DIR
+    for name, value in list(vars(server).items()):
+        if isinstance(value, Path) and value.is_relative_to(data_dir):
+            monkeypatch.setattr(
+                server, name, tmp_path / "data" / value.relative_to(data_dir)
+            )
+    monkeypatch.chdir(tmp_path)
+    return server.PytestMCPServer()
@@ -0,0 +1,148 @@
+import math
+import random
+
+import pytest
+from src import batch
+from src.batch import apply_operator, calculate_many, square_root_many
+from src.calculator_engine import (
+    DIVISION_BY_ZERO,
+    ERROR,
+    NEGATIVE_NUMBER,
+    CalculatorEngine,
+)
+
+
+def engine_result(keys):
+    """What the calculator shows as its result after typing ``keys``."""
+    engine = CalculatorEngine()
+    for key in keys:
+        engine.press(key)
+    return engine.result if engine.current_input != ERROR else engine.display_text
+
+
+def same(results, expected):
+    """Compare results exactly: types, signed zeros and NaNs included."""
+    assert len(results) == len(expected)
+    for result, value in zip(results, expected):
+        assert type(result) is type(value), (result, value)
+        if isinstance(value, float) and math.isnan(value):
+            assert math.isnan(result)
+        else:
+            assert result == value and str(result) == str(value)
+
+
+@pytest.fixture(params=["list", "array"])
+def column(request):
+    """Make operand columns as lists, or as arrays for the NumPy fast path."""
+    if request.param == "list":
+        return list
+    numpy = pytest.importorskip("numpy")
+    return numpy.array
+
+
+class TestCalculateMany:
+    """Test evaluating lists of expressions."""
+    
+    def test_matches_engine(self):
+        """Test each result is what the = key gives."""
+        expressions = ["5+3", "10/2", "2+3*4", "10/0", "5++", "", "7//2", "2**0.5"]
+        
+        assert calculate_many(expressions) == [
+            engine_result(e + "=") for e in expressions
+        ]
+    
+    @pytest.mark.error_handling
+    def test_errors_per_element(self):
+        """Test a failing element does not affect the others."""
+        results = calculate_many(["1/0", "1+1", "(", "3*3"])
+        
+        assert results == [DIVISION_BY_ZERO, 2, ERROR, 9]
+
+
+class TestApplyOperator:
+    """Test binary operations on operand columns."""
+    
+    @pytest.mark.parametrize("operator", ["+", "-", "*", "/", "//", "%", "**"])
+    def test_int_columns(self, column, operator):
+        """Test int columns give Python's int arithmetic."""
+        left = [7, -7, 0, 12, 2 ** 40, 5]
+        right = [2, 2, 3, -5, 3, 0]
+        expected = [
+            engine_result(f"({a}){operator}({b})=") for a, b in zip(left, right)
+        ]
+        
+        same(apply_operator(column(left), operator, column(right)), expected)
+    
+    @pytest.mark.parametrize("operator", ["+", "-", "*", "/", "//", "%"])
+    def test_float_columns(self, column, operator):
+        """Test float columns, special values included."""
+        values = [0.0, -0.0, 1.5, -2.5, 1e308, float("inf"), float("nan")]
+        left = [a for a in values for _ in values]
+        right = [b for _ in values for b in values]
+        expected = []
+        for a, b in zip(left, right):
+            try:
+                expected.append(batch.BINARY_OPERATORS[operator](a, b))
+            except ZeroDivisionError:
+                expected.append(DIVISION_BY_ZERO)
+        
+        same(apply_operator(column(left), operator, column(right)), expected)
+    
+    def test_scalar_operand(self, column):
+        """Test one side may be a single number."""
+        same(apply_operator(column([1, 2, 3]), "*", 10), [10, 20, 30])
+        same(apply_operator(1, "/", column([1, 0, 4])), [1.0, DIVISION_BY_ZERO, 0.25])
+    
+    def test_ints_stay_ints_beside_floats(self):
+        """Test a column mixing ints and floats keeps each element's type."""
+        same(apply_operator([2, 2.0], "+", 2), [4, 4.0])
+    
+    def test_large_ints_keep_precision(self, column):
+        """Test ints too large for int64 are computed exactly."""
+        assert apply_operator(column([2**40, 2**62]), "*", 3) == [3 * 2**40, 3 * 2**62]
+        assert apply_operator([2**62, 10**30], "*", 3) == [3 * 2**62, 3 * 10**30]
+    
+    def test_random_columns_match_python(self, column):
+        """Test random columns against element-by-element arithmetic."""
+        rng = random.Random(0)
+        left = [rng.randint(-10 ** 9, 10 ** 9) for _ in range(1000)]
+        right = [rng.randint(-3, 3) for _ in range(1000)]
+        for operator in ["+", "-", "*", "/", "//", "%"]:
+            expected = []
+            for a, b in zip(left, right):
+                try:
+                    expected.append(batch.BINARY_OPERATORS[operator](a, b))
+                except ZeroDivisionError:
+                    expected.append(DIVISION_BY_ZERO)
+            same(apply_operator(column(left), operator, column(right)), expected)
+    
+    @pytest.mark.error_handling
+    def test_unknown_operator(self):
+        """Test an operator the calculator lacks is rejected."""
+        with pytest.raises(ValueError):
+            apply_operator([1], "^", [2])
+    
+    @pytest.mark.error_handling
+    def test_columns_of_different_lengths(self, column):
+        """Test operand columns must line up."""
+        with pytest.raises(ValueError):
+            apply_operator(column([1, 2]), "+", column([1, 2, 3]))
+
+
+class TestSquareRootMany:
+    """Test square roots of many values."""
+    
+    @pytest.mark.parametrize("values", [
+        [16, 2, 0, 12345, -9],
+        [16.0, 2.0, 0.0, 1e-300, 12345.678, -9.0, -0.5],
+    ])
+    def test_matches_engine(self, column, values):
+        """Test each result is what the √ key gives."""
+        same(square_root_many(column(values)), [engine_result(f"{v}√") for v in values])
+    
+    @pytest.mark.error_handling
+    def test_text_input(self):
+        """Test input text, empty text and invalid text."""
+        results = square_root_many(["16", "", "-4", "x"])
+        
+        assert results == [4.0, 0.0, NEGATIVE_NUMBER, ERROR]
@@ -1,15 +1,4 @@
 import pytest
-import tkinter as tk
-from src.calculator_app import Calculator
-
-
-@pytest.fixture
-def calculator():
-    """Create a calculator instance for testing."""
-    root = tk.Tk()
-    calc = Calculator(root)
-    yield calc
-    root.destroy()
 
 
 class TestBasicOperations:
@@ -199,3 +188,23 @@ class TestEdgeCases:
         
         display_text = calculator.get_display_text()
         assert "Error" in display_text
+    
+    @pytest.mark.ui
+    def test_long_input_display(self, calculator):
+        """Test the display follows long typed input and backspace."""
+        for _ in range(500):
+            calculator.append_char('7')
+        calculator.backspace()
+        calculator.append_char('+')
+        calculator.append_char('1')
+        
+        assert calculator.get_display_text() == '7' * 499 + '+1'
+        assert calculator.current_input == '7' * 499 + '+1'
+    
+    @pytest.mark.ui
+    def test_press_keys(self, calculator):
+        """Test pressing many keys at once, as on the keypad."""
+        calculator.press_keys('12+3←4=')
+        
+        assert calculator.get_display_text() == '16'
+        assert calculator.result == 16
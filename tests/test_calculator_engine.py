@@ -0,0 +1,204 @@
+import pytest
+from src.calculator_engine import CalculatorEngine
+
+
+@pytest.fixture
+def engine():
+    """Create a calculator engine, no GUI needed."""
+    return CalculatorEngine()
+
+
+def type_keys(engine, keys):
+    """Press each key of a string in turn."""
+    for key in keys:
+        engine.press(key)
+
+
+class TestArithmetic:
+    """Test the engine's arithmetic."""
+    
+    @pytest.mark.parametrize("keys, display, result", [
+        ("5+3=", "8", 8),
+        ("10-4=", "6", 6),
+        ("6*7=", "42", 42),
+        ("10/2=", "5.0", 5.0),
+        ("2.5+1.5=", "4.0", 4.0),
+        ("0+0=", "0", 0),
+        ("2+3*4=", "14", 14),
+        ("5+3=*2=", "16", 16),
+    ])
+    def test_expressions(self, engine, keys, display, result):
+        """Test typed expressions evaluate like the calculator window."""
+        type_keys(engine, keys)
+        
+        assert engine.display_text == display
+        assert engine.result == result
+    
+    def test_square_root(self, engine):
+        """Test square root of the current number."""
+        type_keys(engine, "16√")
+        
+        assert engine.display_text == "4.0"
+        assert engine.result == 4.0
+    
+    def test_square_root_of_nothing(self, engine):
+        """Test square root with no input is the root of zero."""
+        engine.press("√")
+        
+        assert engine.display_text == "0.0"
+    
+    def test_very_large_numbers(self, engine):
+        """Test large numbers keep integer precision."""
+        engine.current_input = "999999999"
+        type_keys(engine, "+1=")
+        
+        assert engine.result == 1000000000
+
+
+class TestErrors:
+    """Test error handling."""
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize("keys, display", [
+        ("10/0=", "Error: Division by zero"),
+        ("5++=", "Error"),
+        ("5*=", "Error"),
+        ("(=", "Error"),
+        ("9**9**9=", "Error"),
+    ])
+    def test_invalid_input(self, engine, keys, display):
+        """Test bad expressions show an error instead of raising."""
+        type_keys(engine, keys)
+        
+        assert engine.display_text == display
+        assert engine.current_input == "Error"
+    
+    @pytest.mark.error_handling
+    def test_square_root_negative(self, engine):
+        """Test square root of a negative number."""
+        engine.current_input = "-9"
+        engine.press("√")
+        
+        assert engine.display_text == "Error: Negative number"
+    
+    @pytest.mark.error_handling
+    def test_typing_after_error_starts_over(self, engine):
+        """Test the next key after an error replaces the error."""
+        type_keys(engine, "1/0=7")
+        
+        assert engine.current_input == "7"
+        assert engine.display_text == "7"
+    
+    def test_failed_calculation_keeps_result(self, engine):
+        """Test an error does not change the last result."""
+        type_keys(engine, "2+2=+=")
+        
+        assert engine.result == 4
+
+
+class TestEditing:
+    """Test clearing and editing input."""
+    
+    def test_clear(self, engine):
+        """Test C clears input and result."""
+        type_keys(engine, "5+3=")
+        engine.press("C")
+        
+        assert engine.current_input == ""
+        assert engine.result == 0
+        assert engine.display_text == "0"
+    
+    def test_clear_entry_keeps_result(self, engine):
+        """Test CE clears input but not the last result."""
+        type_keys(engine, "5+3=")
+        engine.press("CE")
+        
+        assert engine.current_input == ""
+        assert engine.result == 8
+        assert engine.display_text == "0"
+    
+    def test_backspace(self, engine):
+        """Test backspace removes the last character."""
+        type_keys(engine, "123←")
+        
+        assert engine.current_input == "12"
+        assert engine.display_text == "12"
+    
+    def test_backspace_to_empty(self, engine):
+        """Test removing the last character shows zero."""
+        type_keys(engine, "1←")
+        
+        assert engine.current_input == ""
+        assert engine.display_text == "0"
+    
+    def test_backspace_on_empty_input(self, engine):
+        """Test backspace with no input changes nothing."""
+        engine.press("←")
+        
+        assert engine.current_input == ""
+        assert engine.display_text == "0"
+    
+    def test_leading_zero_is_replaced(self, engine):
+        """Test a lone zero is replaced by the next key."""
+        engine.current_input = "0"
+        engine.press("7")
+        
+        assert engine.current_input == "7"
+    
+    def test_press_keys(self, engine):
+        """Test pressing a sequence of keys in one call."""
+        engine.press_keys(["1", "2", "+", "3", "←", "4", "="])
+        
+        assert engine.display_text == "16"
+    
+    def test_long_input(self, engine):
+        """Test typing and deleting far more characters than usual."""
+        engine.press_keys("1" * 100000)
+        engine.press_keys("←" * 50000)
+        
+        assert engine.current_input == "1" * 50000
+
+
+class TestDisplayChanges:
+    """Test tracking of where the input changed, for redrawing the display."""
+    
+    def test_typing_changes_only_the_tail(self, engine):
+        """Test typed and deleted characters are reported from their position."""
+        type_keys(engine, "123")
+        engine.take_changes()
+        
+        type_keys(engine, "45")
+        assert engine.take_changes() == 3
+        
+        type_keys(engine, "←←←")
+        assert engine.take_changes() == 2
+        assert engine.input_tail(2) == ""
+    
+    def test_no_changes(self, engine):
+        """Test nothing is reported when the input did not change."""
+        type_keys(engine, "12")
+        engine.take_changes()
+        
+        assert engine.take_changes() == 2
+    
+    @pytest.mark.parametrize("keys", ["=", "C", "CE", "√"])
+    def test_replacing_input_changes_everything(self, engine, keys):
+        """Test results and clearing report a change from the start."""
+        type_keys(engine, "16")
+        engine.take_changes()
+        
+        type_keys(engine, keys)
+        
+        assert engine.take_changes() == 0
+    
+    def test_error_message_is_not_input(self, engine):
+        """Test the display does not show the input while showing an error."""
+        type_keys(engine, "1/0=")
+        
+        assert not engine.showing_input
+        assert engine.current_input == "Error"
+        
+        engine.press("←")
+        
+        assert engine.showing_input
+        assert engine.display_text == "Erro"
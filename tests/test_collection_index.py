@@ -0,0 +1,228 @@
+import asyncio
+import os
+
+import pytest
+from server import CollectionIndex, file_stamp, match_expression
+
+
+def item(nodeid, markers=(), keywords=()):
+    """A collected test as the plugin describes it, without its path."""
+    function = nodeid.rpartition("::")[2].partition("[")[0]
+    return {
+        "nodeid": nodeid,
+        "class": None,
+        "function": function,
+        "markers": list(markers),
+        "keywords": list(keywords) or [function],
+    }
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Two test files and a conftest.py, all last modified at time 100."""
+    paths = {}
+    for name in ("test_a.py", "test_b.py", "conftest.py"):
+        path = tmp_path / name
+        path.write_text("pass\n")
+        os.utime(path, (100, 100))
+        paths[name] = str(path)
+    return paths
+
+
+@pytest.fixture
+def index(tmp_path, project):
+    """An index holding both test files of the project."""
+    index = CollectionIndex(tmp_path / "index.json")
+    conftests = {project["conftest.py"]: file_stamp(project["conftest.py"])}
+    items = [
+        {**item("test_a.py::test_one", markers=["slow"]), "path": project["test_a.py"]},
+        {**item("test_a.py::test_two[1]"), "path": project["test_a.py"]},
+        {**item("test_b.py::TestB::test_three"), "path": project["test_b.py"]},
+    ]
+    index.update([project["test_a.py"], project["test_b.py"]], items, [], conftests)
+    return index, conftests
+
+
+class TestStaleFiles:
+    """Test which test files have to be collected again."""
+    
+    def test_unknown_file(self, tmp_path, project):
+        """Test a file that was never collected is stale."""
+        index = CollectionIndex(tmp_path / "index.json")
+        
+        assert index.stale_files([project["test_a.py"]], {}) == [project["test_a.py"]]
+    
+    def test_unchanged_files(self, project, index):
+        """Test collected files that did not change are not stale."""
+        index, conftests = index
+        
+        files = [project["test_a.py"], project["test_b.py"]]
+        assert index.stale_files(files, conftests) == []
+    
+    def test_modified_time(self, project, index):
+        """Test a file with a new modification time is stale."""
+        index, conftests = index
+        os.utime(project["test_a.py"], (200, 200))
+        
+        files = [project["test_a.py"], project["test_b.py"]]
+        assert index.stale_files(files, conftests) == [project["test_a.py"]]
+    
+    def test_size(self, project, index):
+        """Test a file whose size changed is stale, even with the same time."""
+        index, conftests = index
+        with open(project["test_b.py"], "a") as f:
+            f.write("pass\n")
+        os.utime(project["test_b.py"], (100, 100))
+        
+        files = [project["test_a.py"], project["test_b.py"]]
+        assert index.stale_files(files, conftests) == [project["test_b.py"]]
+    
+    def test_changed_conftest(self, project, index):
+        """Test a changed conftest.py makes every file stale."""
+        index, _ = index
+        os.utime(project["conftest.py"], (200, 200))
+        conftests = {project["conftest.py"]: file_stamp(project["conftest.py"])}
+        
+        files = [project["test_a.py"], project["test_b.py"]]
+        assert index.stale_files(files, conftests) == files
+    
+    def test_deleted_conftest(self, project, index):
+        """Test a conftest.py that is gone makes every file stale."""
+        index, _ = index
+        os.remove(project["conftest.py"])
+        
+        files = [project["test_a.py"], project["test_b.py"]]
+        assert index.stale_files(files, {}) == files
+    
+    def test_collection_errors_are_retried(self, project, index):
+        """Test a file that failed to collect stays stale."""
+        index, conftests = index
+        error = {"nodeid": "test_b.py", "path": project["test_b.py"], "longrepr": ""}
+        index.update([project["test_b.py"]], [], [error], conftests)
+        
+        files = [project["test_a.py"], project["test_b.py"]]
+        assert index.stale_files(files, conftests) == [project["test_b.py"]]
+        assert index.errors(files) == [error]
+
+
+class TestIndex:
+    """Test storing and selecting indexed tests."""
+    
+    def test_saved_index_is_loaded(self, tmp_path, project, index):
+        """Test a saved index is read back by a new server."""
+        index, conftests = index
+        index.save()
+        
+        loaded = CollectionIndex(tmp_path / "index.json")
+        
+        assert loaded.files == index.files
+        assert loaded.stale_files([project["test_a.py"]], conftests) == []
+    
+    @pytest.mark.parametrize("content", ["{not json", '{"version": 0, "files": {}}'])
+    def test_unreadable_index_starts_empty(self, tmp_path, content):
+        """Test a damaged or outdated index file is ignored."""
+        (tmp_path / "index.json").write_text(content)
+        
+        assert CollectionIndex(tmp_path / "index.json").files == {}
+    
+    def test_deleted_files_are_forgotten(self, project, index):
+        """Test updating the index drops files that no longer exist."""
+        index, conftests = index
+        os.remove(project["test_b.py"])
+        
+        index.update([project["test_a.py"]], [], [], conftests)
+        
+        assert list(index.files) == [project["test_a.py"]]
+    
+    @pytest.mark.parametrize("test_path, markers, keyword, expected", [
+        ("tests/", None, None, [
+            "test_a.py::test_one",
+            "test_a.py::test_two[1]",
+            "test_b.py::TestB::test_three",
+        ]),
+        ("tests/test_a.py::test_two", None, None, ["test_a.py::test_two[1]"]),
+        ("tests/test_b.py::TestB", None, None, ["test_b.py::TestB::test_three"]),
+        ("tests/", "slow", None, ["test_a.py::test_one"]),
+        ("tests/", "not slow", "TWO or three", [
+            "test_a.py::test_two[1]", "test_b.py::TestB::test_three"
+        ]),
+    ])
+    def test_select(self, project, index, test_path, markers, keyword, expected):
+        """Test selecting by node ID suffix, markers and keywords."""
+        index, _ = index
+        files = [project["test_a.py"], project["test_b.py"]]
+        
+        tests = index.select(test_path, files, markers=markers, keyword=keyword)
+        
+        assert [test["nodeid"] for test in tests] == expected
+
+
+class TestMatchExpression:
+    """Test evaluating -m and -k expressions."""
+    
+    @pytest.mark.parametrize("expression, expected", [
+        ("slow", True),
+        ("ui", False),
+        ("not ui", True),
+        ("slow and not ui", True),
+        ("ui or network", True),
+        ("(ui or slow) and not network", False),
+        ("ui or slow and network", True),
+        ("not not slow", True),
+        ("", True),
+    ])
+    def test_markers(self, expression, expected):
+        """Test exact names with pytest's operator precedence."""
+        assert match_expression(expression, ["slow", "network"]) is expected
+    
+    @pytest.mark.parametrize("expression, expected", [
+        ("add", True), ("ADDITION", True), ("test_add and not sub", True),
+        ("divide", False),
+    ])
+    def test_keywords(self, expression, expected):
+        """Test substring, case-insensitive matching of -k names."""
+        names = ["test_addition", "TestBasicOperations"]
+        
+        assert match_expression(expression, names, substring=True) is expected
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize(
+        "expression", ["slow and", "(slow", "slow)", "slow ui", "or"]
+    )
+    def test_malformed_expression(self, expression):
+        """Test a malformed expression is an error."""
+        with pytest.raises(ValueError, match="Invalid expression"):
+            match_expression(expression, ["slow"])
+
+
+class TestCollectionTimeout:
+    """Test collection stops at the time limit it is given."""
+    
+    @pytest.fixture
+    def hanging(self, tmp_path):
+        """A test directory whose conftest.py never finishes importing."""
+        (tmp_path / "tests").mkdir()
+        (tmp_path / "tests" / "conftest.py").write_text(
+            "import time\ntime.sleep(60)\n"
+        )
+        (tmp_path / "tests" / "test_x.py").write_text("def test_x():\n    pass\n")
+    
+    @pytest.mark.slow
+    @pytest.mark.error_handling
+    def test_collection_times_out(self, mcp_server, hanging):
+        """Test collecting a hanging test path raises a timeout."""
+        with pytest.raises(asyncio.TimeoutError, match="timed out after 1 seconds"):
+            asyncio.run(mcp_server._collect_tests({"test_path": "tests/"}, timeout=1))
+    
+    @pytest.mark.slow
+    @pytest.mark.error_handling
+    def test_run_times_out_while_collecting(self, mcp_server, hanging):
+        """Test a run whose collection hangs ends timed out."""
+        async def start_and_wait():
+            run = mcp_server._start_run(
+                {"test_path": "tests/", "order": "failed_first"}, timeout=2
+            )
+            await asyncio.wait_for(run.done.wait(), 30)
+            return run
+        
+        assert asyncio.run(start_and_wait()).status == "timed_out"
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+from src.expression import ExpressionError, compile_expression, evaluate, tokenize
+
+
+class TestEvaluate:
+    """Test expressions evaluate as Python arithmetic does."""
+    
+    @pytest.mark.parametrize("text", [
+        "5+3", "10-4", "6*7", "10/2", "7//2", "7%3", "2**10",
+        "2+3*4", "(2+3)*4", "-2**2", "2**-1", "2**3**2", "3*-2", "5++3",
+        "--5", " 5 + 3 ", "0.5", "05.5", "5.", ".5", "00", "1e5", "1.5e-3",
+        "1_000", "2j*2j", "999999999+1", "2**100", "10/3",
+    ])
+    def test_matches_eval(self, text):
+        """Test results equal eval's, type included."""
+        result = evaluate(text)
+        
+        assert result == eval(text)
+        assert type(result) is type(eval(text))
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize("text, error", [
+        ("1/0", ZeroDivisionError),
+        ("1//0", ZeroDivisionError),
+        ("1%0", ZeroDivisionError),
+        ("0**-1", ZeroDivisionError),
+        ("10.0**400", OverflowError),
+        ("9**9**9", OverflowError),
+    ])
+    def test_arithmetic_errors(self, text, error):
+        """Test runtime errors are the ones eval raises."""
+        with pytest.raises(error):
+            evaluate(text)
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize("text, backend", [
+        ("9**9**9", "float"),
+        ("9**9**9", "decimal"),
+        ("9**9**9", "fraction"),
+        ("(-10)**100000", "float"),
+        ("(1/3)**-200000", "fraction"),
+    ])
+    def test_huge_powers_are_refused(self, text, backend):
+        """Test exact powers too large to compute fail at once."""
+        with pytest.raises(ArithmeticError):
+            evaluate(text, backend)
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize("text", [
+        "", "   ", "5++", "5*", "(", "(5", "5)", "()", "05", "007", ".",
+        "1.2.3", "5 5", "Error", "__import__('os')", "2*x", "1e",
+    ])
+    def test_invalid_expressions(self, text):
+        """Test text that is not arithmetic is rejected, never run."""
+        with pytest.raises(ExpressionError):
+            evaluate(text)
+    
+    def test_deep_nesting_is_rejected(self):
+        """Test absurdly nested input fails cleanly."""
+        with pytest.raises(ExpressionError):
+            evaluate("(" * 1000 + "1" + ")" * 1000)
+    
+    def test_long_chains_do_not_recurse(self):
+        """Test long operator chains evaluate without recursion limits."""
+        assert evaluate("+".join(["1"] * 10000)) == 10000
+    
+    def test_random_expressions_match_eval(self):
+        """Test generated expressions against eval."""
+        rng = random.Random(0)
+        for _ in range(500):
+            parts = [str(rng.randint(0, 99))]
+            for _ in range(rng.randint(0, 6)):
+                parts.append(rng.choice(["+", "-", "*", "/"]))
+                parts.append(str(rng.randint(1, 99)))
+            text = "".join(parts)
+            assert evaluate(text) == eval(text)
+
+
+class TestCompile:
+    """Test tokenizing and compiled programs."""
+    
+    def test_tokenize(self):
+        """Test tokens of a mixed expression."""
+        assert tokenize("12+3.5*(2**-1)") == [
+            ("int", "12"), ("operator", "+"), ("float", "3.5"), ("operator", "*"),
+            ("operator", "("), ("int", "2"), ("operator", "**"), ("operator", "-"),
+            ("int", "1"), ("operator", ")"),
+        ]
+    
+    def test_compiled_expressions_are_cached(self):
+        """Test the same text reuses its compiled program."""
+        assert compile_expression("6*7") is compile_expression("6*7")
+    
+    def test_compiled_expression_evaluates_repeatedly(self):
+        """Test a compiled program can be run many times."""
+        program = compile_expression("2+3*4")
+        
+        assert [program.evaluate() for _ in range(3)] == [14, 14, 14]
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+
+import pytest
+import server
+from server import location_of, order_tests
+
+FLAKY_TESTS = '''
+from pathlib import Path
+
+
+def test_flaky():
+    marker = Path(__file__).with_name("failed_once")
+    if not marker.exists():
+        marker.touch()
+        assert False
+
+
+def test_after():
+    pass
+
+
+def test_last():
+    pass
+'''
+
+
+def run_tests(mcp_server, args):
+    """Start a run and wait for it to finish."""
+    async def start_and_wait():
+        run = mcp_server._start_run({"verbose": False, **args}, timeout=120)
+        await run.done.wait()
+        return run
+    
+    return asyncio.run(start_and_wait())
+
+
+class TestRetryFailures:
+    """Test failed tests are retried alone and reported as flaky."""
+    
+    @pytest.mark.slow
+    def test_flaky_failure_passes_the_run(self, mcp_server, tmp_path):
+        """Test a run whose only failure passes on a retry passes."""
+        (tmp_path / "test_flaky.py").write_text(FLAKY_TESTS)
+        
+        run = run_tests(mcp_server, {"test_path": "test_flaky.py", "retries": 1})
+        
+        assert run.status == "passed"
+        assert run.flaky == ["test_flaky.py::test_flaky"]
+        assert run.counts == {"passed": 2, "flaky": 1}
+    
+    @pytest.mark.slow
+    def test_fail_fast_run_is_not_retried(self, mcp_server, tmp_path):
+        """Test a run stopped at its first failure keeps that failure."""
+        (tmp_path / "test_flaky.py").write_text(FLAKY_TESTS)
+        
+        run = run_tests(
+            mcp_server, {"test_path": "test_flaky.py", "retries": 1, "fail_fast": True}
+        )
+        
+        assert run.status == "failed"
+        assert run.returncode == 1
+        assert run.flaky == []
+        assert run.counts == {"failed": 1}
+        assert [f["nodeid"] for f in run.failures] == ["test_flaky.py::test_flaky"]
+        assert mcp_server.store.get_run(run.run_id)["exitcode"] == 1
+    
+    @pytest.mark.slow
+    def test_known_flaky_test_is_retried_once(self, mcp_server, tmp_path):
+        """Test a test flaky before is retried even without ``retries``."""
+        (tmp_path / "test_flaky.py").write_text(FLAKY_TESTS)
+        run_tests(mcp_server, {"test_path": "test_flaky.py", "retries": 1})
+        (tmp_path / "failed_once").unlink()
+        
+        run = run_tests(mcp_server, {"test_path": "test_flaky.py"})
+        
+        assert run.status == "passed"
+        assert run.flaky == ["test_flaky.py::test_flaky"]
+    
+    @pytest.mark.slow
+    @pytest.mark.parametrize("retries", [1, 2])
+    def test_lasting_failure_is_not_flaky(self, mcp_server, tmp_path, retries):
+        """Test a test failing on every attempt fails the run."""
+        test_file = tmp_path / "test_broken.py"
+        test_file.write_text("def test_broken():\n    assert False\n")
+        
+        run = run_tests(mcp_server, {"test_path": "test_broken.py", "retries": retries})
+        
+        assert run.status == "failed"
+        assert run.flaky == []
+        assert mcp_server.store.flaky_tests() == set()
+    
+    @pytest.mark.slow
+    def test_no_retries(self, mcp_server, tmp_path):
+        """Test a failure is not retried when ``retries`` is 0."""
+        (tmp_path / "test_flaky.py").write_text(FLAKY_TESTS)
+        
+        run = run_tests(mcp_server, {"test_path": "test_flaky.py", "retries": 0})
+        
+        assert run.status == "failed"
+        assert run.flaky == []
+    
+    @pytest.mark.slow
+    def test_no_retries_for_known_flaky_test(self, mcp_server, tmp_path):
+        """Test ``retries`` of 0 also turns off retrying known flaky tests."""
+        (tmp_path / "test_flaky.py").write_text(FLAKY_TESTS)
+        run_tests(mcp_server, {"test_path": "test_flaky.py", "retries": 1})
+        (tmp_path / "failed_once").unlink()
+        
+        run = run_tests(mcp_server, {"test_path": "test_flaky.py", "retries": 0})
+        
+        assert run.status == "failed"
+        assert run.flaky == []
+    
+    @pytest.mark.slow
+    def test_retries_count_towards_the_timeout(self, mcp_server, tmp_path):
+        """Test retrying stops when the run's time limit is reached."""
+        (tmp_path / "test_slow.py").write_text(
+            "import time\n\n\ndef test_slow():\n    time.sleep(1.5)\n    assert False\n"
+        )
+        
+        async def start_and_wait():
+            run = mcp_server._start_run(
+                {"test_path": "test_slow.py", "verbose": False, "retries": 5}, timeout=4
+            )
+            await run.done.wait()
+            return run
+        
+        run = asyncio.run(start_and_wait())
+        
+        assert run.status == "timed_out"
+
+
+class TestOrderTests:
+    """Test ordering failed, then changed, then other tests, fastest first."""
+    
+    @pytest.fixture
+    def files(self, tmp_path):
+        """Test and source files last modified at time 100."""
+        paths = {}
+        for name in ("test_a.py", "test_b.py", "test_c.py", "source.py"):
+            path = tmp_path / name
+            path.write_text("")
+            os.utime(path, (100, 100))
+            paths[name] = str(path)
+        return paths
+    
+    @staticmethod
+    def indexed(files, name, function="test"):
+        return {"nodeid": f"{name}::{function}", "path": files[name]}
+    
+    @staticmethod
+    def nodeids(tests):
+        return [test["nodeid"] for test in tests]
+    
+    def test_groups(self, files):
+        """Test failures and errors come first, then unrun tests, then the rest."""
+        tests = [
+            self.indexed(files, "test_a.py", "passed"),
+            self.indexed(files, "test_a.py", "new"),
+            self.indexed(files, "test_b.py", "error"),
+            self.indexed(files, "test_c.py", "failed"),
+        ]
+        last_results = {
+            "test_a.py::passed": {"outcome": "passed", "started_at": 200},
+            "test_b.py::error": {"outcome": "error", "started_at": 200},
+            "test_c.py::failed": {"outcome": "failed", "started_at": 200},
+        }
+        durations = {"test_b.py::error": 2.0, "test_c.py::failed": 1.0}
+        
+        assert self.nodeids(order_tests(tests, last_results, durations)) == [
+            "test_c.py::failed", "test_b.py::error", "test_a.py::new",
+            "test_a.py::passed",
+        ]
+    
+    def test_fastest_first_within_a_group(self, files):
+        """Test tests of a group run by duration; unknown ones as the mean."""
+        tests = [
+            self.indexed(files, "test_a.py", name) for name in ("x", "y", "z")
+        ]
+        durations = {"test_a.py::x": 3.0, "test_a.py::z": 1.0}
+        
+        assert self.nodeids(order_tests(tests, {}, durations)) == [
+            "test_a.py::z", "test_a.py::y", "test_a.py::x"
+        ]
+    
+    @pytest.mark.parametrize("started_at, changed", [(50, True), (200, False)])
+    def test_changed_test_file(self, files, started_at, changed):
+        """Test a test whose file changed after its last run counts as unrun."""
+        tests = [
+            self.indexed(files, "test_a.py", "other"),
+            self.indexed(files, "test_b.py", "edited"),
+        ]
+        last_results = {
+            "test_a.py::other": {"outcome": "passed", "started_at": 200},
+            "test_b.py::edited": {"outcome": "passed", "started_at": started_at},
+        }
+        durations = {"test_a.py::other": 1.0, "test_b.py::edited": 2.0}
+        
+        ordered = self.nodeids(order_tests(tests, last_results, durations))
+        
+        assert (ordered[0] == "test_b.py::edited") is changed
+    
+    def test_changed_source_file(self, files):
+        """Test a test whose source files changed after its last run counts as unrun."""
+        tests = [
+            self.indexed(files, "test_a.py", "other"),
+            self.indexed(files, "test_b.py", "uses_source"),
+        ]
+        last_results = {
+            nodeid: {"outcome": "passed", "started_at": 150}
+            for nodeid in ("test_a.py::other", "test_b.py::uses_source")
+        }
+        durations = {"test_a.py::other": 1.0, "test_b.py::uses_source": 2.0}
+        test_files = {location_of(tests[1]): [files["source.py"]]}
+        os.utime(files["source.py"], (300, 300))
+        
+        ordered = order_tests(tests, last_results, durations, test_files)
+        
+        assert self.nodeids(ordered) == ["test_b.py::uses_source", "test_a.py::other"]
+    
+    def test_missing_file_counts_as_changed(self, files, tmp_path):
+        """Test a test whose file is gone counts as changed."""
+        tests = [
+            self.indexed(files, "test_a.py", "other"),
+            {"nodeid": "gone.py::test", "path": str(tmp_path / "gone.py")},
+        ]
+        last_results = {
+            nodeid: {"outcome": "passed", "started_at": 200}
+            for nodeid in ("test_a.py::other", "gone.py::test")
+        }
+        durations = {"test_a.py::other": 1.0, "gone.py::test": 2.0}
+        
+        assert self.nodeids(order_tests(tests, last_results, durations)) == [
+            "gone.py::test", "test_a.py::other"
+        ]
+
+
+class TestMarkFlaky:
+    """Test recording the flaky tests of a stored run."""
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        """A store holding one run with two failures and one pass."""
+        store = server.ResultStore(tmp_path / "results.db", 10, 86400)
+        run = server.TestRun({"test_path": "tests/"}, timeout=None)
+        run.report_file = str(tmp_path / "report.json")
+        report = {
+            "exitcode": 1,
+            "summary": {"passed": 1, "failed": 2, "total": 3},
+            "tests": [
+                {"nodeid": "test_a", "outcome": "failed"},
+                {"nodeid": "test_b", "outcome": "failed"},
+                {"nodeid": "test_c", "outcome": "passed"},
+            ],
+        }
+        Path(run.report_file).write_text(json.dumps(report))
+        store.start_run(run)
+        store.record_results(run.run_id, run.report_file)
+        return store, run.run_id
+    
+    @staticmethod
+    def outcomes(store, run_id):
+        return {
+            result["nodeid"]: result["outcome"]
+            for result in store.iter_results(run_id)
+        }
+    
+    def test_marks_results_and_summary(self, store):
+        """Test marked failures become flaky in results, summary and history."""
+        store, run_id = store
+        
+        store.mark_flaky(run_id, ["test_a"])
+        
+        assert self.outcomes(store, run_id) == {
+            "test_a": "flaky", "test_b": "failed", "test_c": "passed"
+        }
+        run = store.get_run(run_id)
+        assert run["summary"] == {"passed": 1, "failed": 1, "flaky": 1, "total": 3}
+        assert run["exitcode"] == 1
+        assert store.last_results()["test_a"]["outcome"] == "flaky"
+        assert store.flaky_tests() == {"test_a"}
+    
+    @pytest.mark.parametrize("passed, exitcode", [(True, 0), (False, 1)])
+    def test_exit_code_cleared_only_for_a_passed_run(self, store, passed, exitcode):
+        """Test a run without failures left passes only if its retries say so."""
+        store, run_id = store
+        
+        store.mark_flaky(run_id, ["test_a", "test_b"], passed=passed)
+        
+        run = store.get_run(run_id)
+        assert run["summary"] == {"passed": 1, "flaky": 2, "total": 3}
+        assert run["exitcode"] == exitcode
+    
+    def test_marking_again_changes_nothing(self, store):
+        """Test a test already marked flaky is not counted twice."""
+        store, run_id = store
+        store.mark_flaky(run_id, ["test_a"])
+        
+        store.mark_flaky(run_id, ["test_a", "unknown"])
+        
+        assert store.get_run(run_id)["summary"]["flaky"] == 1
+        assert store.flaky_tests() == {"test_a"}
+    
+    def test_unknown_run(self, store):
+        """Test marking tests of a run that is not stored does nothing."""
+        store, _ = store
+        
+        store.mark_flaky("missing", ["test_a"])
+        
+        assert store.flaky_tests() == set()
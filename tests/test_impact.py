@@ -0,0 +1,164 @@
+import pytest
+from server import ImpactMap, parse_diff
+
+GIT_DIFF = """\
+diff --git a/added.py b/added.py
+new file mode 100644
+index 0000000..3e75765
+--- /dev/null
++++ b/added.py
+@@ -0,0 +1 @@
++new
+diff --git a/src/f.py b/src/f.py
+index 9405325..ac9fd5c 100644
+--- a/src/f.py
++++ b/src/f.py
+@@ -2 +2 @@ a
+-b
++B
+@@ -4,0 +5 @@ d
++X
+@@ -10,3 +11,2 @@ def g():
+-1
+-2
+-3
++4
++5
+diff --git a/gone.py b/gone.py
+deleted file mode 100644
+index 587be6b..0000000
+--- a/gone.py
++++ /dev/null
+@@ -1 +0,0 @@
+-x
+diff --git a/run.sh b/run.sh
+old mode 100644
+new mode 100755
+"""
+
+MODULE = """\
+import os
+
+
+def add(a, b):
+    return a + b
+
+
+def sub(a, b):
+    return a - b
+
+
+CONSTANT = 1
+"""
+
+# Lines each test ran. pytest imports the module while collecting, outside
+# any test, so each test only covers the function it calls
+COVERED = {
+    "tests/test_module.py::test_add": [5],
+    "tests/test_module.py::test_sub": [9],
+}
+
+
+class TestParseDiff:
+    """Test reading changed files and line ranges from unified diffs."""
+    
+    def test_git_diff(self):
+        """Test hunks, insertions, added, deleted and mode-only changes."""
+        assert parse_diff(GIT_DIFF) == {
+            "added.py": None,
+            "src/f.py": [(2, 2), (4, 5), (10, 12)],
+            "gone.py": None,
+            "run.sh": None,
+        }
+    
+    def test_plain_unified_diff(self):
+        """Test a diff without git headers, as ``diff -u`` writes it."""
+        diff = (
+            "--- f.py\t2024-05-01 12:00:00\n"
+            "+++ f.py\t2024-05-01 12:01:00\n"
+            "@@ -3,2 +3,2 @@\n"
+            "-a\n-b\n+c\n+d\n"
+        )
+        
+        assert parse_diff(diff) == {"f.py": [(3, 4)]}
+    
+    def test_renamed_file_uses_the_old_path(self):
+        """Test ranges are keyed by the path of the old version."""
+        diff = (
+            "diff --git a/old.py b/new.py\n"
+            "--- a/old.py\n"
+            "+++ b/new.py\n"
+            "@@ -7 +7 @@\n"
+            "-x\n+y\n"
+        )
+        
+        assert parse_diff(diff) == {"old.py": [(7, 7)]}
+    
+    def test_empty_diff(self):
+        """Test no changes give no files."""
+        assert parse_diff("") == {}
+
+
+class TestAffectedTests:
+    """Test choosing the tests that run changed code from recorded coverage."""
+    
+    @pytest.fixture
+    def recorded(self, tmp_path):
+        """An impact map recorded for two tests of one module."""
+        coverage = pytest.importorskip("coverage")
+        module = tmp_path / "module.py"
+        module.write_text(MODULE)
+        
+        data = coverage.CoverageData(basename=str(tmp_path / ".coverage"))
+        for context, lines in COVERED.items():
+            data.set_context(context)
+            data.add_lines({str(module): lines})
+        data.write()
+        
+        impact = ImpactMap(tmp_path / "impact.db")
+        impact.record([str(tmp_path / ".coverage")])
+        return impact, str(module)
+    
+    def test_mapped_tests(self, recorded):
+        """Test every recorded test is mapped."""
+        impact, _ = recorded
+        
+        assert impact.mapped_tests() == set(COVERED)
+    
+    @pytest.mark.parametrize("ranges, expected", [
+        ([(5, 5)], {"tests/test_module.py::test_add"}),
+        ([(9, 9)], {"tests/test_module.py::test_sub"}),
+        ([(5, 5), (9, 9)], set(COVERED)),
+        ([(12, 12)], set(COVERED)),
+        ([(5, 9)], set(COVERED)),
+        (None, set(COVERED)),
+    ])
+    def test_changes_in_a_module(self, recorded, ranges, expected):
+        """Test changes inside a function select only the tests running it.
+
+        Changes to module-level code, or spanning functions, select every
+        test that ran the file.
+        """
+        impact, module = recorded
+        
+        assert impact.affected_tests({module: ranges}) == expected
+    
+    def test_unmeasured_file(self, recorded, tmp_path):
+        """Test a file no test ran affects no test."""
+        impact, _ = recorded
+        
+        assert impact.affected_tests({str(tmp_path / "other.py"): None}) == set()
+    
+    def test_recording_again_replaces_a_test(self, recorded, tmp_path):
+        """Test a test recorded again keeps only its new lines."""
+        coverage = pytest.importorskip("coverage")
+        impact, module = recorded
+        data = coverage.CoverageData(basename=str(tmp_path / ".coverage-2"))
+        data.set_context("tests/test_module.py::test_add")
+        data.add_lines({module: [9]})
+        data.write()
+        
+        impact.record([str(tmp_path / ".coverage-2")])
+        
+        assert impact.affected_tests({module: [(5, 5)]}) == set()
+        assert impact.affected_tests({module: [(9, 9)]}) == set(COVERED)
@@ -0,0 +1,139 @@
+import re
+
+import pytest
+from mcp.types import TextContent
+from server import ServerMetrics, Summary, prometheus_label
+
+# A line of the Prometheus text format: comment, or sample with optional labels
+PROMETHEUS_LINE = re.compile(
+    r'# (HELP|TYPE) \w+ .+'
+    r'|\w+(\{\w+="(?:[^"\\]|\\.)*"(,\w+="(?:[^"\\]|\\.)*")*\})? -?[0-9.e+-]+'
+)
+
+
+class TestSummary:
+    """Test counts, totals and percentiles of one measurement."""
+    
+    def test_empty(self):
+        """Test a summary without values reports zeros."""
+        assert Summary().as_dict() == {
+            "count": 0, "total": 0.0, "mean": 0.0, "max": 0.0,
+            "p50": 0.0, "p95": 0.0, "p99": 0.0,
+        }
+    
+    def test_nearest_rank_quantiles(self):
+        """Test percentiles are values observed, by nearest rank."""
+        summary = Summary()
+        for value in range(100, 0, -1):
+            summary.observe(value)
+        
+        assert summary.quantiles() == {0.5: 50, 0.95: 95, 0.99: 99}
+    
+    def test_single_value(self):
+        """Test every percentile of one value is that value."""
+        summary = Summary()
+        summary.observe(0.25)
+        
+        assert summary.quantiles() == {0.5: 0.25, 0.95: 0.25, 0.99: 0.25}
+    
+    def test_quantiles_cover_the_window_only(self):
+        """Test percentiles forget old values; counts and totals do not."""
+        summary = Summary(window=10)
+        for _ in range(10):
+            summary.observe(100.0)
+        for _ in range(10):
+            summary.observe(1.0)
+        
+        result = summary.as_dict()
+        
+        assert (result["p50"], result["p99"]) == (1.0, 1.0)
+        assert (result["count"], result["total"], result["max"]) == (20, 1010.0, 100.0)
+        assert result["mean"] == 50.5
+
+
+class TestServerMetrics:
+    """Test the server's measurements and their Prometheus text."""
+    
+    @pytest.fixture
+    def metrics(self):
+        """Metrics with a call of each outcome recorded."""
+        metrics = ServerMetrics()
+        metrics.record_call(
+            "run_tests", 0.5, {"test_path": "tests/"},
+            [TextContent(type="text", text="✅ passed")]
+        )
+        metrics.record_call(
+            "run_tests", 1.5, {}, [TextContent(type="text", text="❌ failed")]
+        )
+        metrics.record_call("list_tests", 0.1, None, None)
+        return metrics
+    
+    def test_record_call(self, metrics):
+        """Test latencies, sizes and errors are recorded per tool."""
+        snapshot = metrics.snapshot({"runs": 0})
+        
+        assert snapshot["tool_seconds"]["run_tests"]["count"] == 2
+        assert snapshot["tool_seconds"]["run_tests"]["total"] == 2.0
+        assert snapshot["request_bytes"]["run_tests"]["max"] == len(
+            '{"test_path": "tests/"}'
+        )
+        assert snapshot["response_bytes"]["run_tests"]["count"] == 2
+        assert "list_tests" not in snapshot["response_bytes"]
+        assert snapshot["tool_errors"] == {"run_tests": 1, "list_tests": 1}
+        assert snapshot["queues"] == {"runs": 0}
+    
+    def test_timed_block_that_raises(self):
+        """Test a block is timed even when it raises."""
+        metrics = ServerMetrics()
+        
+        with pytest.raises(RuntimeError), metrics.timed("phase_seconds", "collection"):
+            raise RuntimeError
+        
+        assert metrics.snapshot({})["phase_seconds"]["collection"]["count"] == 1
+    
+    def test_prometheus_format(self, metrics):
+        """Test every line is a comment or a sample, each metric typed once."""
+        text = metrics.prometheus({"runs": 2})
+        lines = text.splitlines()
+        
+        assert text.endswith("\n")
+        assert [line for line in lines if not PROMETHEUS_LINE.fullmatch(line)] == []
+        types = [line.split()[2] for line in lines if line.startswith("# TYPE")]
+        assert len(types) == len(set(types))
+    
+    def test_prometheus_summary(self, metrics):
+        """Test a summary is exposed as quantiles, a sum and a count."""
+        lines = metrics.prometheus({}).splitlines()
+        
+        assert "# TYPE pytest_mcp_tool_seconds summary" in lines
+        assert 'pytest_mcp_tool_seconds{tool="run_tests",quantile="0.5"} 0.5' in lines
+        assert 'pytest_mcp_tool_seconds{tool="run_tests",quantile="0.99"} 1.5' in lines
+        assert 'pytest_mcp_tool_seconds_sum{tool="run_tests"} 2.0' in lines
+        assert 'pytest_mcp_tool_seconds_count{tool="run_tests"} 2' in lines
+        assert 'pytest_mcp_tool_errors_total{tool="run_tests"} 1' in lines
+    
+    def test_queue_depths(self, metrics):
+        """Test the given queue depths are exposed as gauges."""
+        lines = metrics.prometheus({"runs": 2, "workers": 1}).splitlines()
+        
+        assert 'pytest_mcp_queue_depth{queue="runs"} 2' in lines
+        assert 'pytest_mcp_queue_depth{queue="workers"} 1' in lines
+    
+    def test_write_prometheus(self, metrics, tmp_path):
+        """Test the metrics file is written, its directory created if needed."""
+        path = tmp_path / "metrics" / "server.prom"
+        
+        metrics.write_prometheus(str(path), {})
+        
+        assert path.read_text() == metrics.prometheus({})
+        assert list(path.parent.iterdir()) == [path]
+    
+    @pytest.mark.parametrize("value, label", [
+        ("plain", "plain"),
+        ('say "hi"', 'say \\"hi\\"'),
+        ("back\\slash", "back\\\\slash"),
+        ("two\nlines", "two\\nlines"),
+    ])
+    def test_label_escaping(self, value, label):
+        """Test label values are escaped as the text format requires."""
+        assert prometheus_label(value) == label
@@ -0,0 +1,176 @@
+import decimal
+import random
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+from src.batch import calculate_many
+from src.calculator_engine import (
+    DIVISION_BY_ZERO,
+    ERROR,
+    NEGATIVE_NUMBER,
+    CalculatorEngine,
+)
+from src.expression import ExpressionError, compile_expression, evaluate
+from src.numeric import DecimalBackend, get_backend
+
+
+class TestDecimal:
+    """Test the decimal backend."""
+    
+    @pytest.mark.parametrize("text, expected", [
+        ("0.1+0.2", "0.3"),
+        ("10/2", "5"),
+        ("2.5+1.5", "4.0"),
+        ("1/3", "0.3333333333333333333333333333"),
+        ("99999999999999999.5+1", "100000000000000000.5"),
+        ("-7//2", "-4"),
+        ("-7%2", "1"),
+        ("7.5%-2", "-0.5"),
+        ("2**-1", "0.5"),
+        ("-2**2", "-4"),
+    ])
+    def test_results(self, text, expected):
+        """Test decimal input is exact and Python's operator rules hold."""
+        result = evaluate(text, "decimal")
+        
+        assert isinstance(result, Decimal)
+        assert str(result) == expected
+    
+    def test_context_precision(self):
+        """Test results are rounded to the backend's context."""
+        backend = DecimalBackend(decimal.Context(prec=5, rounding=decimal.ROUND_DOWN))
+        
+        assert str(evaluate("2/3", backend)) == "0.66666"
+        assert str(evaluate("123456789*1", backend)) == "1.2345E+8"
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize("text", ["1/0", "0/0", "1//0", "1%0", "0**-1"])
+    def test_division_by_zero(self, text):
+        """Test division by zero raises ZeroDivisionError, as with floats."""
+        with pytest.raises(ZeroDivisionError):
+            evaluate(text, "decimal")
+    
+    def test_floor_division_matches_python(self):
+        """Test floored division and modulo on random ints against Python."""
+        rng = random.Random(0)
+        for _ in range(500):
+            a = rng.randint(-1000, 1000)
+            b = rng.choice([-1, 1]) * rng.randint(1, 50)
+            assert evaluate(f"{a}.0//({b}.0)", "decimal") == a // b
+            assert evaluate(f"{a}.0%({b}.0)", "decimal") == a % b
+
+
+class TestFraction:
+    """Test the fraction backend."""
+    
+    @pytest.mark.parametrize("text, expected", [
+        ("0.1+0.2", Fraction(3, 10)),
+        ("1/3*3", Fraction(1)),
+        ("1/3+1/6", Fraction(1, 2)),
+        ("2**-2", Fraction(1, 4)),
+        ("7.5//2", Fraction(3)),
+        ("1e-3", Fraction(1, 1000)),
+    ])
+    def test_results_are_exact(self, text, expected):
+        """Test rational arithmetic has no rounding."""
+        result = evaluate(text, "fraction")
+        
+        assert result == expected
+        assert isinstance(result, Fraction)
+    
+    def test_inexact_powers_are_floats(self):
+        """Test irrational results fall back to float."""
+        assert isinstance(evaluate("2**0.5", "fraction"), float)
+
+
+class TestBackends:
+    """Test choosing backends and the exact int fast path."""
+    
+    @pytest.mark.parametrize(
+        "backend, kind", [("decimal", Decimal), ("fraction", Fraction)]
+    )
+    def test_int_expressions(self, backend, kind):
+        """Test int-only expressions are computed on ints, then converted."""
+        result = evaluate("12*34+5-6//4%3", backend)
+        
+        assert result == 12 * 34 + 5 - 6 // 4 % 3
+        assert isinstance(result, kind)
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize("backend", ["decimal", "fraction"])
+    def test_imaginary_numbers(self, backend):
+        """Test complex literals need the float backend."""
+        with pytest.raises(ExpressionError):
+            evaluate("2j", backend)
+    
+    def test_programs_are_cached_per_backend(self):
+        """Test the same text compiles separately for each backend."""
+        program = compile_expression("1/4", "decimal")
+        
+        assert compile_expression("1/4", "decimal") is program
+        assert evaluate("1/4", "fraction") == Fraction(1, 4)
+        assert evaluate("1/4") == 0.25
+    
+    @pytest.mark.error_handling
+    def test_unknown_backend(self):
+        """Test an unknown backend name is rejected."""
+        with pytest.raises(ValueError):
+            get_backend("binary")
+
+
+class TestEngineBackends:
+    """Test the calculator engine with each backend."""
+    
+    @pytest.mark.parametrize("backend, display", [
+        ("float", "0.30000000000000004"),
+        ("decimal", "0.3"),
+        ("fraction", "3/10"),
+    ])
+    def test_decimal_input(self, backend, display):
+        """Test adding decimals in each backend."""
+        engine = CalculatorEngine(backend)
+        engine.press_keys("0.1+0.2=")
+        
+        assert engine.display_text == display
+    
+    @pytest.mark.parametrize("backend, keys, display", [
+        ("decimal", "2√", "1.414213562373095048801688724"),
+        ("fraction", "0.25√", "1/2"),
+        ("fraction", "2√", "1.4142135623730951"),
+        ("fraction", "1/9=√", "1/3"),
+        ("decimal", "√", "0"),
+    ])
+    def test_square_root(self, backend, keys, display):
+        """Test square roots in the decimal and fraction backends."""
+        engine = CalculatorEngine(backend)
+        engine.press_keys(keys)
+        
+        assert engine.display_text == display
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize("backend", ["decimal", "fraction"])
+    @pytest.mark.parametrize("keys, display", [
+        ("1/0=", DIVISION_BY_ZERO),
+        ("5++=", ERROR),
+        ("-9√", NEGATIVE_NUMBER),
+    ])
+    def test_errors(self, backend, keys, display):
+        """Test errors show as they do with floats."""
+        engine = CalculatorEngine(backend)
+        engine.press_keys(keys)
+        
+        assert engine.display_text == display
+    
+    def test_continue_from_fraction_result(self):
+        """Test a fraction result can be typed on."""
+        engine = CalculatorEngine("fraction")
+        engine.press_keys("1/3=+1/6=")
+        
+        assert engine.display_text == "1/2"
+    
+    def test_batch_backend(self):
+        """Test batch evaluation takes a backend too."""
+        results = calculate_many(["0.1+0.2", "1/0"], "decimal")
+        
+        assert results == [Decimal("0.3"), DIVISION_BY_ZERO]
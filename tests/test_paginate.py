@@ -0,0 +1,68 @@
+import json
+
+import pytest
+from server import paginate
+
+RECORDS = [{"nodeid": f"test_{index}", "longrepr": "x" * index} for index in range(10)]
+
+
+def pages(records, limit, max_bytes):
+    """Follow the next-page cursors from the start; the pages in order."""
+    result = []
+    offset = 0
+    while offset is not None:
+        page, _, offset = paginate(iter(records), offset, limit, max_bytes)
+        result.append(page)
+    return result
+
+
+class TestPaginate:
+    """Test taking pages of records within a count and a byte budget."""
+    
+    def test_first_page(self):
+        """Test a page stops at the limit and points at the next record."""
+        page, total, next_offset = paginate(iter(RECORDS), 0, 3, 100000)
+        
+        assert page == RECORDS[:3]
+        assert total == 10
+        assert next_offset == 3
+    
+    def test_last_page(self):
+        """Test the last page has no next offset."""
+        page, total, next_offset = paginate(iter(RECORDS), 8, 3, 100000)
+        
+        assert page == RECORDS[8:]
+        assert total == 10
+        assert next_offset is None
+    
+    @pytest.mark.parametrize("limit, max_bytes", [(1, 100000), (3, 100000), (20, 150)])
+    def test_cursors_visit_every_record_once(self, limit, max_bytes):
+        """Test following the cursors yields each record once, in order."""
+        result = pages(RECORDS, limit, max_bytes)
+        
+        assert [record for page in result for record in page] == RECORDS
+        assert all(len(page) <= limit for page in result)
+    
+    def test_byte_budget(self):
+        """Test a page ends before the record that would exceed the budget."""
+        max_bytes = sum(len(json.dumps(record)) for record in RECORDS[:4])
+        
+        page, _, next_offset = paginate(iter(RECORDS), 0, 20, max_bytes)
+        
+        assert page == RECORDS[:4]
+        assert next_offset == 4
+    
+    def test_oversized_record_still_makes_a_page(self):
+        """Test a record larger than the budget is returned on its own."""
+        page, _, next_offset = paginate(iter(RECORDS), 9, 20, 1)
+        
+        assert page == [RECORDS[9]]
+        assert next_offset is None
+    
+    def test_offset_past_the_end(self):
+        """Test an offset past the last record gives an empty last page."""
+        assert paginate(iter(RECORDS), 50, 5, 100000) == ([], 10, None)
+    
+    def test_empty(self):
+        """Test no records give one empty page."""
+        assert paginate(iter([]), 0, 5, 100000) == ([], 0, None)
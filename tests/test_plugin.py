@@ -0,0 +1,288 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from server import summarize_profile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TESTS = '''
+import pytest
+
+
+@pytest.fixture
+def broken():
+    raise RuntimeError("fixture failed")
+
+
+@pytest.mark.slow
+def test_pass():
+    pass
+
+
+def test_fail():
+    assert 1 == 2
+
+
+def test_skip():
+    pytest.skip("not today")
+
+
+def test_setup_error(broken):
+    pass
+'''
+
+
+def run_pytest(tmp_path, *args, **env):
+    """Run pytest with the plugin in ``tmp_path``; the events it wrote."""
+    events_path = tmp_path / "events.jsonl"
+    events_path.unlink(missing_ok=True)
+    subprocess.run(
+        [sys.executable, "-m", "pytest", "-p", "pytest_mcp_plugin", "-q", *args],
+        cwd=tmp_path,
+        env={
+            **os.environ,
+            "PYTHONPATH": str(ROOT),
+            "PYTEST_MCP_EVENTS": str(events_path),
+            **env,
+        },
+        capture_output=True,
+        timeout=120,
+    )
+    with open(events_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def of_kind(events, kind):
+    return [event for event in events if event["event"] == kind]
+
+
+@pytest.mark.slow
+class TestEventStream:
+    """Test the events the plugin writes while pytest runs."""
+    
+    @pytest.fixture
+    def test_file(self, tmp_path):
+        (tmp_path / "test_sample.py").write_text(TESTS)
+        return tmp_path / "test_sample.py"
+    
+    def test_one_event_per_test(self, tmp_path, test_file):
+        """Test each test is reported once, with the phase that decided it."""
+        events = run_pytest(tmp_path, test_file.name)
+        
+        tests = {
+            event["nodeid"].partition("::")[2]: (event["outcome"], event["when"])
+            for event in of_kind(events, "test")
+        }
+        assert len(of_kind(events, "test")) == 4
+        assert tests == {
+            "test_pass": ("passed", "call"),
+            "test_fail": ("failed", "call"),
+            "test_skip": ("skipped", "call"),
+            "test_setup_error": ("error", "setup"),
+        }
+    
+    def test_run_events(self, tmp_path, test_file):
+        """Test the run starts with the collected count and ends with its status."""
+        events = run_pytest(tmp_path, test_file.name)
+        
+        assert events[0] == {"event": "collected", "count": 4}
+        assert events[-1] == {"event": "finished", "exitstatus": 1}
+    
+    def test_failures_carry_their_report(self, tmp_path, test_file):
+        """Test failed and errored tests include their failure text."""
+        events = run_pytest(tmp_path, test_file.name)
+        
+        reports = {
+            event["nodeid"].partition("::")[2]: event.get("longrepr")
+            for event in of_kind(events, "test")
+        }
+        assert "assert 1 == 2" in reports["test_fail"]
+        assert "fixture failed" in reports["test_setup_error"]
+        assert reports["test_pass"] is None
+    
+    def test_collect_only_describes_items(self, tmp_path, test_file):
+        """Test collecting only lists each item with its markers."""
+        events = run_pytest(tmp_path, "--collect-only", test_file.name)
+        
+        (collected,) = of_kind(events, "collected")
+        items = {item["function"]: item for item in collected["items"]}
+        assert collected["count"] == 4
+        assert collected["errors"] == []
+        assert items["test_pass"]["markers"] == ["slow"]
+        assert items["test_fail"]["path"] == str(test_file)
+        assert of_kind(events, "test") == []
+    
+    def test_collection_errors(self, tmp_path, test_file):
+        """Test a file that fails to import is reported with its error."""
+        (tmp_path / "test_broken.py").write_text("import missing_module\n")
+        
+        events = run_pytest(tmp_path, "--collect-only", ".")
+        
+        (collected,) = of_kind(events, "collected")
+        (error,) = collected["errors"]
+        assert error["nodeid"] == "test_broken.py"
+        assert error["path"] == str(tmp_path.resolve() / "test_broken.py")
+        assert "missing_module" in error["longrepr"]
+
+
+@pytest.mark.slow
+class TestSelection:
+    """Test restricting a run to a list of test locations."""
+    
+    @pytest.fixture
+    def test_file(self, tmp_path):
+        (tmp_path / "test_sample.py").write_text(
+            "def test_a():\n    pass\n\n\n"
+            "def test_b():\n    pass\n\n\n"
+            "class TestC:\n    def test_c(self):\n        pass\n"
+        )
+        return tmp_path / "test_sample.py"
+    
+    def run_selected(self, tmp_path, locations, *args):
+        select_path = tmp_path / "select.txt"
+        select_path.write_text("".join(f"{location}\n" for location in locations))
+        events = run_pytest(tmp_path, *args, PYTEST_MCP_SELECT=str(select_path))
+        return [event["nodeid"] for event in of_kind(events, "test")]
+    
+    def test_runs_listed_tests_in_list_order(self, tmp_path, test_file):
+        """Test only listed tests run, in the order of the list."""
+        locations = [
+            f"{test_file.resolve()}::{name}" for name in ("TestC::test_c", "test_a")
+        ]
+        
+        assert self.run_selected(tmp_path, locations, test_file.name) == [
+            "test_sample.py::TestC::test_c", "test_sample.py::test_a"
+        ]
+    
+    def test_unknown_locations_are_ignored(self, tmp_path, test_file):
+        """Test locations that match no collected test select nothing."""
+        locations = [
+            f"{test_file.resolve()}::test_b",
+            f"{test_file.resolve()}::test_missing",
+            f"{tmp_path.resolve() / 'test_other.py'}::test_a",
+        ]
+        
+        assert self.run_selected(tmp_path, locations, test_file.name) == [
+            "test_sample.py::test_b"
+        ]
+    
+    def test_locations_do_not_depend_on_arguments(self, tmp_path, test_file):
+        """Test a location matches however pytest was pointed at the file."""
+        locations = [f"{test_file.resolve()}::test_b"]
+        
+        for args in ([str(test_file)], ["."], []):
+            assert self.run_selected(tmp_path, locations, *args) == [
+                "test_sample.py::test_b"
+            ]
+
+
+WORK = '''
+def square(i):
+    return i * i
+
+
+def busy(n):
+    total = 0
+    for i in range(n):
+        total += square(i)
+    return total
+
+
+def allocate():
+    return [bytes(1000) for _ in range(1000)]
+'''
+
+PROFILED_TESTS = '''
+import work
+
+HELD = []
+
+
+def test_busy():
+    assert work.busy(200000)
+
+
+def test_allocate():
+    HELD.append(work.allocate())
+'''
+
+
+@pytest.mark.slow
+class TestProfiler:
+    """Test the profiles the plugin writes and how the server sums them up."""
+    
+    @pytest.fixture
+    def profile(self, tmp_path):
+        """Profile the sample tests with the given modes; the profile directory."""
+        (tmp_path / "work.py").write_text(WORK)
+        (tmp_path / "test_work.py").write_text(PROFILED_TESTS)
+        directory = tmp_path / "profile"
+        
+        def run(modes):
+            run_pytest(
+                tmp_path, "test_work.py",
+                PYTEST_MCP_PROFILE=str(directory),
+                PYTEST_MCP_PROFILE_MODES=modes,
+            )
+            return directory
+        
+        return run
+    
+    def test_cpu(self, profile):
+        """Test project functions are ranked by time, with their tests."""
+        summary = summarize_profile(str(profile("cpu")), top=3)
+        
+        assert summary["tests"] == 2
+        assert summary["profiled_seconds"] > 0
+        assert summary["functions"][0]["file"] in ("work.py", "test_work.py")
+        assert "busy" in [function["function"] for function in summary["functions"]]
+        assert all(
+            not function["file"].startswith("/") for function in summary["functions"]
+        )
+        assert summary["allocations"] == []
+        assert summary["slowest_tests"][0]["nodeid"] == "test_work.py::test_busy"
+    
+    def test_sort_by_calls(self, profile):
+        """Test functions can be ranked by their number of calls."""
+        summary = summarize_profile(str(profile("cpu")), top=10, sort="calls")
+        
+        calls = [function["calls"] for function in summary["functions"]]
+        assert calls == sorted(calls, reverse=True)
+        assert summary["functions"][0]["function"] == "square"
+    
+    def test_library_code(self, profile):
+        """Test library functions are left out unless asked for."""
+        directory = str(profile("cpu"))
+        
+        project = summarize_profile(directory, top=1000)
+        everything = summarize_profile(directory, top=1000, project_only=False)
+        
+        assert len(everything["functions"]) > len(project["functions"])
+        assert any(
+            function["file"].startswith("/") for function in everything["functions"]
+        )
+    
+    def test_memory(self, profile):
+        """Test memory held after a test is charged to the project line behind it."""
+        summary = summarize_profile(str(profile("memory")), top=3)
+        
+        [largest, *_] = summary["allocations"]
+        assert largest["site"] == "work.py:14"
+        assert largest["function"] == "allocate"
+        assert largest["size"] >= 1000 * 1000
+        assert summary["functions"] == []
+        assert summary["profiled_seconds"] is None
+        assert summary["slowest_tests"][0]["peak"] > 0
+    
+    def test_save_merged_profile(self, profile, tmp_path):
+        """Test the merged CPU profile is saved where asked."""
+        save_to = tmp_path / "saved" / "merged.pstats"
+        
+        summary = summarize_profile(str(profile("cpu")), top=3, save_to=save_to)
+        
+        assert summary["pstats"] == str(save_to.resolve())
+        assert save_to.stat().st_size > 0
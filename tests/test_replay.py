@@ -0,0 +1,180 @@
+import asyncio
+import json
+
+import pytest
+from src.calculator_engine import CalculatorEngine
+from src.replay import (
+    ReplayCase, ScriptError, generate_cases, main, parse_keys, parse_script, replay
+)
+
+SCRIPT = """
+# Arithmetic
+12+34=          => 46
+10/0=           => Error: Division by zero
+[C]9[SQRT]      => 3.0
+123<<           => 1
+5*(2+3)=
+"""
+
+
+class TestParsing:
+    """Test reading keystroke scripts."""
+    
+    @pytest.mark.parametrize("text, keys", [
+        ("12+34=", ["1", "2", "+", "3", "4", "="]),
+        ("5CE7", ["5", "CE", "7"]),
+        ("5C7", ["5", "C", "7"]),
+        ("12<←", ["1", "2", "←", "←"]),
+        ("[sqrt]9[BS][ce]", ["√", "9", "←", "CE"]),
+        ("1 + 2", ["1", "+", "2"]),
+    ])
+    def test_parse_keys(self, text, keys):
+        """Test compact key text becomes button presses."""
+        assert parse_keys(text) == keys
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize("text", ["1x2", "[ROOT]", "[BS"])
+    def test_unknown_keys(self, text):
+        """Test keys the calculator lacks are rejected."""
+        with pytest.raises(ScriptError):
+            parse_keys(text)
+    
+    def test_parse_script(self):
+        """Test each line is a case, with its expected display if given."""
+        cases = parse_script(SCRIPT)
+        
+        assert [case.expected for case in cases] == [
+            "46", "Error: Division by zero", "3.0", "1", None
+        ]
+        assert [case.line for case in cases] == [3, 4, 5, 6, 7]
+    
+    @pytest.mark.error_handling
+    def test_script_error_names_the_line(self):
+        """Test a bad line is reported with its number."""
+        with pytest.raises(ScriptError, match="Line 2"):
+            parse_script("1+1= => 2\n1?1=\n")
+
+
+class TestReplay:
+    """Test replaying cases on the calculator engine."""
+    
+    def test_script_passes(self):
+        """Test a correct script replays without failures."""
+        result = replay(parse_script(SCRIPT))
+        
+        assert result.passed
+        assert result.cases == 5
+        assert result.checked == 4
+        assert result.keys == sum(len(case.keys) for case in parse_script(SCRIPT))
+    
+    def test_failures_are_reported(self):
+        """Test a wrong expectation is a failure with both displays."""
+        result = replay(parse_script("2+2= => 4\n2+2= => 5\n"))
+        
+        assert result.failed == 1
+        assert result.failures == [
+            {"line": 2, "keys": "2+2=", "expected": "5", "actual": "4"}
+        ]
+    
+    def test_cases_start_from_a_cleared_calculator(self):
+        """Test one case's input does not leak into the next."""
+        engine = CalculatorEngine()
+        result = replay([ReplayCase(list("12")), ReplayCase(list("3="), "3")], engine)
+        
+        assert result.passed
+    
+    def test_backend(self):
+        """Test replaying with another numeric backend."""
+        assert replay(parse_script("0.1+0.2= => 0.3"), backend="decimal").passed
+    
+    def test_throughput(self):
+        """Test the result reports elapsed time and rates."""
+        summary = replay(generate_cases(200, seed=1)).as_dict()
+        
+        assert summary["cases"] == 200
+        assert summary["elapsed"] > 0
+        assert summary["keys_per_second"] > 0
+    
+    def test_fuzz_cases_are_reproducible(self):
+        """Test the same seed generates the same cases."""
+        first = [case.keys for case in generate_cases(50, seed=7)]
+        
+        assert first == [case.keys for case in generate_cases(50, seed=7)]
+
+
+class TestCommandLine:
+    """Test the python -m src.replay entry point."""
+    
+    def test_exit_status(self, tmp_path, capsys):
+        """Test the exit status is 0 when all cases pass, 1 otherwise."""
+        script = tmp_path / "script.txt"
+        script.write_text("2+2= => 4\n")
+        assert main([str(script)]) == 0
+        
+        script.write_text("2+2= => 5\n")
+        assert main([str(script), "--json"]) == 1
+        assert '"failed": 1' in capsys.readouterr().out
+    
+    @pytest.mark.error_handling
+    def test_bad_script(self, tmp_path, capsys):
+        """Test an unparsable script exits with status 2."""
+        script = tmp_path / "script.txt"
+        script.write_text("2?2=\n")
+        
+        assert main([str(script)]) == 2
+        assert "Line 1" in capsys.readouterr().err
+
+
+class TestReplayTool:
+    """Test the server's replay_keystrokes tool."""
+    
+    def replay(self, mcp_server, monkeypatch, returncode, stdout, stderr=""):
+        """Call the tool with the replay process ending as given."""
+        async def run_command(cmd, timeout, env):
+            return returncode, stdout, stderr
+        
+        monkeypatch.setattr(mcp_server, "_run_command", run_command)
+        [content] = asyncio.run(
+            mcp_server.replay_keystrokes({"script": "2+2= => 4\n"})
+        )
+        return content.text
+    
+    @pytest.mark.parametrize("script, returncode, status", [
+        ("2+2= => 4\n", 0, "✅"),
+        ("2+2= => 5\n", 1, "❌"),
+    ])
+    def test_result(self, mcp_server, monkeypatch, script, returncode, status):
+        """Test the result is reported whether or not cases failed."""
+        result = replay(parse_script(script)).as_dict()
+        
+        text = self.replay(mcp_server, monkeypatch, returncode, json.dumps(result))
+        
+        assert text.startswith(f"{status} **Replayed 1 cases**")
+    
+    @pytest.mark.error_handling
+    def test_crashed_replay(self, mcp_server, monkeypatch):
+        """Test a replay process that crashed is reported as failed."""
+        result = replay(parse_script("2+2= => 4\n")).as_dict()
+        
+        text = self.replay(
+            mcp_server, monkeypatch, -11, json.dumps(result), "Segmentation fault"
+        )
+        
+        assert text == "❌ Replay failed (exit code -11): Segmentation fault"
+
+
+class TestWindowReplay:
+    """Test replaying on the Tk calculator window."""
+    
+    @pytest.mark.ui
+    def test_script_on_window(self, calculator):
+        """Test a script replays on the window with one redraw per case."""
+        assert replay(parse_script(SCRIPT), calculator).passed
+    
+    @pytest.mark.ui
+    def test_fuzz_window_matches_engine(self, calculator):
+        """Test random key sequences show what the engine shows."""
+        result = replay(generate_cases(500, seed=3), calculator)
+        
+        assert result.passed
+        assert result.checked == 500
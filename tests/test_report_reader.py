@@ -0,0 +1,148 @@
+import io
+import json
+
+import pytest
+from server import JsonStream, iter_report_tests
+
+# Sizes small enough to cut every token and string at some chunk boundary
+CHUNK_SIZES = [1, 2, 3, 5, 8, 1 << 16]
+
+VALUES = [
+    12.5, -3, 1e10, 0, 2.5e-3, True, False, None, "", "plain",
+    'quote " and backslash \\ and brackets ]}[{', "unicode ✅ é",
+    [], {}, [1, [2, [3]]], {"a": {"b": ["]", "}"]}, "c": [{"d": None}]},
+]
+
+
+def stream(text, chunk_size):
+    return JsonStream(io.StringIO(text), chunk_size=chunk_size)
+
+
+def write_report(path, tests, **fields):
+    """Write a pytest-json-report file with fields in the plugin's order."""
+    report = {
+        "created": 1.0,
+        "duration": 2.5,
+        "exitcode": 1,
+        "root": "/project",
+        "environment": {"Python": "3.11"},
+        "summary": {"passed": len(tests), "total": len(tests)},
+        "collectors": [{"nodeid": "", "result": [{"nodeid": "]}\"["}]}],
+        "tests": tests,
+        "warnings": [{"message": "[{"}],
+        **fields,
+    }
+    path.write_text(json.dumps(report), encoding="utf-8")
+
+
+class TestJsonStream:
+    """Test scanning JSON one value at a time across chunk boundaries."""
+    
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_items_match_json_loads(self, chunk_size):
+        """Test array elements decode as json.loads decodes them."""
+        text = json.dumps(VALUES)
+        
+        assert list(stream(text, chunk_size).items()) == json.loads(text)
+    
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_whitespace_between_items(self, chunk_size):
+        """Test whitespace anywhere between tokens is skipped."""
+        text = ' \n[ 1 ,\t"a" ,\r\n [ 2 ] , { "b" : 3 } ] '
+        
+        assert list(stream(text, chunk_size).items()) == [1, "a", [2], {"b": 3}]
+    
+    @pytest.mark.parametrize("text", ["12", "12.5", "-0.5e-3"])
+    def test_number_at_end_of_file(self, text):
+        """Test a number the file ends with is read whole."""
+        assert stream(text, 1).value() == json.loads(text)
+    
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_skip(self, chunk_size):
+        """Test skipping a value leaves the stream at the value after it."""
+        for skipped in VALUES:
+            json_stream = stream(json.dumps([skipped, "next"]), chunk_size)
+            json_stream.expect("[")
+            json_stream.skip()
+            json_stream.expect(",")
+            
+            assert json_stream.value() == "next"
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize("text", ["[1, 2", '["abc', "[[1, 2]", '[{"a": 1}'])
+    def test_truncated_array(self, text):
+        """Test an array cut off by the end of the file is an error."""
+        with pytest.raises(ValueError):
+            list(stream(text, 2).items())
+    
+    @pytest.mark.error_handling
+    @pytest.mark.parametrize("text", ['[[1, "]"', '{"a": "}'])
+    def test_truncated_skip(self, text):
+        """Test skipping a value cut off by the end of the file is an error."""
+        with pytest.raises(ValueError):
+            stream(text, 2).skip()
+    
+    @pytest.mark.error_handling
+    def test_expect(self):
+        """Test an unexpected character is an error."""
+        with pytest.raises(ValueError, match="Expected '\\['"):
+            stream("  {}", 1).expect("[")
+
+
+class TestIterReportTests:
+    """Test reading the test records of a JSON report incrementally."""
+    
+    def test_tests_and_header(self, tmp_path):
+        """Test records come in report order and other fields fill the header."""
+        tests = [{"nodeid": f"test_{index}", "outcome": "passed"} for index in range(3)]
+        write_report(tmp_path / "report.json", tests)
+        header = {}
+        
+        assert list(iter_report_tests(tmp_path / "report.json", header)) == tests
+        assert header == {
+            "created": 1.0,
+            "duration": 2.5,
+            "exitcode": 1,
+            "root": "/project",
+            "environment": {"Python": "3.11"},
+            "summary": {"passed": 3, "total": 3},
+        }
+    
+    def test_summary_is_read_before_the_first_test(self, tmp_path):
+        """Test the header holds the summary once the first test is yielded."""
+        write_report(tmp_path / "report.json", [{"nodeid": "test_a"}])
+        header = {}
+        
+        next(iter_report_tests(tmp_path / "report.json", header))
+        
+        assert header["summary"] == {"passed": 1, "total": 1}
+    
+    def test_report_larger_than_a_chunk(self, tmp_path):
+        """Test a report of many chunks reads like json.load."""
+        tests = [
+            {
+                "nodeid": f"tests/test_{index}.py::test[{index}]",
+                "outcome": "failed" if index % 7 == 0 else "passed",
+                "call": {"duration": index / 1000, "longrepr": "E   [x] \"y\"\n" * 30},
+            }
+            for index in range(2000)
+        ]
+        write_report(tmp_path / "report.json", tests)
+        
+        assert list(iter_report_tests(tmp_path / "report.json")) == tests
+    
+    def test_empty_tests(self, tmp_path):
+        """Test a report without tests yields nothing."""
+        write_report(tmp_path / "report.json", [])
+        
+        assert list(iter_report_tests(tmp_path / "report.json")) == []
+    
+    @pytest.mark.error_handling
+    def test_truncated_report(self, tmp_path):
+        """Test a report cut off part way is an error, not a short result."""
+        write_report(tmp_path / "report.json", [{"nodeid": "test_a"}] * 100)
+        text = (tmp_path / "report.json").read_text(encoding="utf-8")
+        (tmp_path / "report.json").write_text(text[:len(text) // 2], encoding="utf-8")
+        
+        with pytest.raises(ValueError):
+            list(iter_report_tests(tmp_path / "report.json"))
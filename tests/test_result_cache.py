@@ -0,0 +1,218 @@
+import asyncio
+import itertools
+
+import pytest
+from server import ResultCache, TestInputs
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A project of two test files sharing a conftest.py and a helper module."""
+    root = tmp_path.resolve()
+    (root / "tests").mkdir()
+    (root / "tests" / "conftest.py").write_text("")
+    (root / "helper.py").write_text("VALUE = 1\n")
+    (root / "tests" / "test_a.py").write_text("import helper\n")
+    (root / "tests" / "test_b.py").write_text("")
+    (root / "unrelated.py").write_text("")
+    monkeypatch.chdir(root)
+    return root
+
+
+def indexed_tests(project):
+    """The project's tests as the collection index lists them."""
+    nodeids = [
+        "tests/test_a.py::test_one",
+        "tests/test_a.py::test_two",
+        "tests/test_b.py::test_one",
+    ]
+    return [
+        {"nodeid": nodeid, "path": str(project / nodeid.partition("::")[0])}
+        for nodeid in nodeids
+    ]
+
+
+def changed_keys(project, edit, args=None, test_files=None):
+    """Node IDs whose cache key differs after ``edit(project)``."""
+    tests = indexed_tests(project)
+    inputs = TestInputs()
+    before = inputs.keys(tests, {}, test_files)
+    edit(project)
+    after = inputs.keys(tests, args or {}, test_files)
+    return {nodeid for nodeid in before if before[nodeid] != after[nodeid]}
+
+
+class TestInputKeys:
+    """Test cache keys change exactly when a test's inputs change."""
+    
+    def test_keys_are_stable(self, project):
+        """Test unchanged inputs give the same keys, in a new process too."""
+        tests = indexed_tests(project)
+        keys = TestInputs().keys(tests, {})
+        
+        assert TestInputs().keys(tests, {}) == keys
+        assert len(set(keys.values())) == len(tests)
+    
+    @pytest.mark.parametrize("path, changed", [
+        ("tests/test_a.py", {"tests/test_a.py::test_one", "tests/test_a.py::test_two"}),
+        ("tests/test_b.py", {"tests/test_b.py::test_one"}),
+        ("helper.py", {"tests/test_a.py::test_one", "tests/test_a.py::test_two"}),
+        ("tests/conftest.py", {
+            "tests/test_a.py::test_one",
+            "tests/test_a.py::test_two",
+            "tests/test_b.py::test_one",
+        }),
+        ("unrelated.py", set()),
+    ])
+    def test_edited_file(self, project, path, changed):
+        """Test editing a file changes the keys of the tests depending on it."""
+        def edit(project):
+            with open(project / path, "a") as f:
+                f.write("# edited\n")
+        
+        assert changed_keys(project, edit) == changed
+    
+    def test_pytest_configuration(self, project):
+        """Test adding pytest configuration changes every key."""
+        def edit(project):
+            (project / "pytest.ini").write_text("[pytest]\n")
+        
+        assert changed_keys(project, edit) == {
+            test["nodeid"] for test in indexed_tests(project)
+        }
+    
+    def test_executed_file(self, project):
+        """Test editing a file a test was seen executing changes its key only."""
+        test_files = {
+            f"{project / 'tests/test_b.py'}::test_one": [str(project / "unrelated.py")]
+        }
+        
+        def edit(project):
+            (project / "unrelated.py").write_text("VALUE = 2\n")
+        
+        assert changed_keys(project, edit, test_files=test_files) == {
+            "tests/test_b.py::test_one"
+        }
+    
+    def test_declared_input(self, project):
+        """Test editing a file matching ``cache_inputs`` changes every key."""
+        (project / "tests" / "data.json").write_text("[1]")
+        args = {"cache_inputs": ["tests/*.json"]}
+        tests = indexed_tests(project)
+        inputs = TestInputs()
+        before, undeclared = inputs.keys(tests, args), inputs.keys(tests, {})
+        
+        (project / "tests" / "data.json").write_text("[2]")
+        
+        assert inputs.keys(tests, {}) == undeclared
+        after = inputs.keys(tests, args)
+        assert all(after[nodeid] != before[nodeid] for nodeid in before)
+    
+    def test_settings(self, project):
+        """Test settings that affect outcomes are part of every key."""
+        assert changed_keys(project, lambda project: None, {"capture": "fd"}) == {
+            test["nodeid"] for test in indexed_tests(project)
+        }
+
+
+class TestResultCache:
+    """Test storing, finding and evicting cached results."""
+    
+    @pytest.fixture
+    def cache(self, tmp_path, monkeypatch):
+        """A cache of two entries on a clock that ticks once per call."""
+        clock = itertools.count(1000)
+        monkeypatch.setattr("server.time.time", lambda: next(clock))
+        return ResultCache(tmp_path / "cache.db", 2)
+    
+    def test_lookup(self, cache):
+        """Test stored keys are found and others are not."""
+        cache.store([("key-a", "test_a", "passed", 0.5)])
+        
+        assert cache.lookup(["key-a", "key-b"]) == {
+            "key-a": {
+                "key": "key-a", "nodeid": "test_a", "outcome": "passed",
+                "duration": 0.5,
+            }
+        }
+    
+    def test_store_replaces_a_key(self, cache):
+        """Test storing a key again keeps only the newest result."""
+        cache.store([("key-a", "test_a", "passed", 0.5)])
+        cache.store([("key-a", "test_a", "skipped", 0.1)])
+        
+        assert cache.lookup(["key-a"])["key-a"]["outcome"] == "skipped"
+    
+    def test_least_recently_used_is_evicted(self, cache):
+        """Test a result looked up recently outlives one stored after it."""
+        cache.store([("key-a", "test_a", "passed", 0.5)])
+        cache.store([("key-b", "test_b", "passed", 0.5)])
+        cache.lookup(["key-a"])
+        
+        cache.store([("key-c", "test_c", "passed", 0.5)])
+        
+        assert set(cache.lookup(["key-a", "key-b", "key-c"])) == {"key-a", "key-c"}
+    
+    def test_many_keys(self, cache):
+        """Test lookups of more keys than one statement takes."""
+        cache.max_entries = 1200
+        cache.store([(f"key-{i}", f"test_{i}", "passed", 0.0) for i in range(1200)])
+        
+        found = cache.lookup([f"key-{i}" for i in range(0, 2400, 2)])
+        
+        assert set(found) == {f"key-{i}" for i in range(0, 1200, 2)}
+
+
+DATA_TEST = """
+import json
+from pathlib import Path
+
+
+def test_data():
+    assert json.loads(Path(__file__).with_name("data.json").read_text())
+"""
+
+
+class TestCachedRuns:
+    """Test runs reuse cached results only when asked to."""
+    
+    def run_tests(self, mcp_server, **args):
+        """Run ``test_data.py`` and wait for it to finish."""
+        async def start_and_wait():
+            run = mcp_server._start_run(
+                {"test_path": "test_data.py", "verbose": False, **args}, timeout=120
+            )
+            await run.done.wait()
+            return run
+        
+        return asyncio.run(start_and_wait())
+    
+    @pytest.fixture
+    def project(self, tmp_path):
+        """A test reading a data file next to it."""
+        (tmp_path / "test_data.py").write_text(DATA_TEST)
+        (tmp_path / "data.json").write_text("[1]")
+        return tmp_path
+    
+    @pytest.mark.slow
+    def test_off_by_default(self, mcp_server, project):
+        """Test runs without ``use_cache`` neither fill nor read the cache."""
+        self.run_tests(mcp_server)
+        
+        run = self.run_tests(mcp_server, use_cache=True)
+        
+        assert run.cached == []
+        assert run.status == "passed"
+    
+    @pytest.mark.slow
+    def test_changed_data_file(self, mcp_server, project):
+        """Test a change to a declared data file runs the test again."""
+        args = {"use_cache": True, "cache_inputs": ["*.json"]}
+        self.run_tests(mcp_server, **args)
+        assert len(self.run_tests(mcp_server, **args).cached) == 1
+        
+        (project / "data.json").write_text("[]")
+        run = self.run_tests(mcp_server, **args)
+        
+        assert run.cached == []
+        assert run.status == "failed"
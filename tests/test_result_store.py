@@ -0,0 +1,103 @@
+import json
+import os
+import time
+
+import pytest
+from server import ResultStore, TestRun
+
+DAY = 86400
+
+
+@pytest.fixture
+def store(tmp_path):
+    """A store keeping at most three runs for a day."""
+    return ResultStore(tmp_path / "results.db", 3, DAY)
+
+
+def add_run(store, tmp_path, age=0.0, status="passed", outcomes=None):
+    """Store a finished run started ``age`` seconds ago, with its report."""
+    run = TestRun({"test_path": "tests/"}, timeout=None)
+    run.started_at = time.time() - age
+    run.report_file = str(tmp_path / f"{run.run_id}.json")
+    tests = [
+        {"nodeid": nodeid, "outcome": outcome}
+        for nodeid, outcome in (outcomes or {"test_a": "passed"}).items()
+    ]
+    with open(run.report_file, "w") as f:
+        json.dump({"exitcode": 0, "summary": {"total": len(tests)}, "tests": tests}, f)
+    store.start_run(run)
+    store.record_results(run.run_id, run.report_file)
+    run.status = status
+    run.finished_at = run.started_at + 1
+    store.finish_run(run)
+    return run
+
+
+class TestEvict:
+    """Test dropping runs beyond the retention limits."""
+    
+    def test_keeps_the_newest_runs(self, store, tmp_path):
+        """Test only the newest ``max_runs`` runs are kept, with their files."""
+        runs = [add_run(store, tmp_path, age=age) for age in (50, 40, 30, 20, 10)]
+        
+        store.evict()
+        
+        kept = [run["run_id"] for run in store.list_runs()]
+        assert kept == [run.run_id for run in reversed(runs[2:])]
+        assert [os.path.exists(run.report_file) for run in runs] == [
+            False, False, True, True, True
+        ]
+        assert list(store.iter_results(runs[0].run_id)) == []
+    
+    def test_drops_old_runs(self, store, tmp_path):
+        """Test runs older than ``max_age`` are dropped however few there are."""
+        old = add_run(store, tmp_path, age=2 * DAY)
+        new = add_run(store, tmp_path)
+        
+        store.evict()
+        
+        assert store.get_run(old.run_id) is None
+        assert store.get_run(new.run_id) is not None
+    
+    def test_running_runs_are_kept(self, store, tmp_path):
+        """Test a run still going is never dropped."""
+        running = add_run(store, tmp_path, age=2 * DAY, status="running")
+        
+        store.evict()
+        
+        assert store.get_run(running.run_id)["status"] == "running"
+    
+    def test_drops_old_test_history(self, store, tmp_path):
+        """Test last results expire with their runs, flaky records once unseen."""
+        old = add_run(store, tmp_path, age=2 * DAY, outcomes={"test_old": "failed"})
+        store.mark_flaky(old.run_id, ["test_old"])
+        add_run(store, tmp_path, outcomes={"test_new": "passed"})
+        
+        store.evict()
+        
+        assert set(store.last_results()) == {"test_new"}
+        assert store.flaky_tests() == {"test_old"}
+    
+    def test_keeps_the_newest_result_of_each_test(self, store, tmp_path):
+        """Test the last result of a test comes from its newest run."""
+        add_run(store, tmp_path, age=10, outcomes={"test_a": "failed"})
+        add_run(store, tmp_path, age=20, outcomes={"test_a": "passed"})
+        
+        assert store.last_results()["test_a"]["outcome"] == "failed"
+
+
+class TestInterruptedRuns:
+    """Test runs left unfinished by a server that is gone."""
+    
+    @pytest.mark.parametrize("pid, status", [
+        (os.getpid(), "running"), (2 ** 22 + 1, "interrupted"), (None, "interrupted"),
+    ])
+    def test_unfinished_runs(self, tmp_path, store, pid, status):
+        """Test a running run is interrupted when its server process is gone."""
+        run = add_run(store, tmp_path, status="running")
+        with store._connect() as db:
+            db.execute("UPDATE runs SET pid = ? WHERE run_id = ?", (pid, run.run_id))
+        
+        reopened = ResultStore(tmp_path / "results.db", 3, DAY)
+        
+        assert reopened.get_run(run.run_id)["status"] == status
@@ -0,0 +1,265 @@
+import asyncio
+import gc
+
+import pytest
+from server import RunScheduler, ServerMetrics, TestRun, session_id
+
+
+def make_run(priority="batch", client="a", slots=1):
+    """A run as ``_start_run`` hands it to the scheduler."""
+    run = TestRun({"test_path": "tests/"}, timeout=None)
+    run.priority = priority
+    run.client = client
+    run.slots = slots
+    return run
+
+
+def in_loop(function):
+    """Call ``function`` on a running event loop; the scheduler needs one."""
+    async def call():
+        return function()
+    
+    return asyncio.run(call())
+
+
+def admitted(scheduler, runs):
+    """Submit runs in order; the ones admitted at once."""
+    return [run for run in runs if scheduler.submit(run).done()]
+
+
+class TestAdmission:
+    """Test runs take slots up to the limit and give them back."""
+    
+    def test_admits_up_to_the_limit(self):
+        """Test runs are admitted while slots are free, then wait."""
+        def scenario():
+            scheduler = RunScheduler(3, 0, 60, ServerMetrics())
+            runs = [make_run(client=client) for client in "abcd"]
+            
+            assert admitted(scheduler, runs) == runs[:3]
+            assert runs[3].status == "queued"
+            assert scheduler.used == 3
+            assert scheduler.position(runs[3]) == 1
+        
+        in_loop(scenario)
+    
+    @pytest.mark.parametrize("priority, slots", [("interactive", 3), ("batch", 2)])
+    def test_slots_are_capped(self, priority, slots):
+        """Test a run never asks for more slots than its priority may fill."""
+        def scenario():
+            scheduler = RunScheduler(3, 1, 60, ServerMetrics())
+            run = make_run(priority, slots=8)
+            scheduler.submit(run)
+            return run
+        
+        assert in_loop(scenario).slots == slots
+    
+    def test_release_admits_the_next_run(self):
+        """Test slots given back go to the first waiting run."""
+        def scenario():
+            scheduler = RunScheduler(2, 0, 60, ServerMetrics())
+            first, second = make_run(client="a", slots=2), make_run(client="b")
+            admitted(scheduler, [first, second])
+            
+            scheduler.release(first)
+            
+            assert second.status == "running"
+            assert scheduler.used == 1
+            assert scheduler.by_client == {"b": 1}
+        
+        in_loop(scenario)
+    
+    def test_release_a_queued_run(self):
+        """Test a run released while queued leaves the queue and no slots."""
+        def scenario():
+            scheduler = RunScheduler(1, 0, 60, ServerMetrics())
+            running, queued = make_run(client="a"), make_run(client="b")
+            admitted(scheduler, [running, queued])
+            
+            scheduler.release(queued)
+            
+            assert scheduler.queue() == []
+            assert scheduler.used == 1
+            assert "b" not in scheduler.last_turn
+            scheduler.release(running)
+            assert queued.status == "queued"
+            assert scheduler.used == 0
+            assert scheduler.by_client == {}
+        
+        in_loop(scenario)
+    
+    def test_smaller_run_is_backfilled(self):
+        """Test a run that fits goes ahead of a first one that does not."""
+        def scenario():
+            scheduler = RunScheduler(2, 0, 60, ServerMetrics())
+            runs = [make_run(client="a"), make_run(client="b", slots=2), make_run()]
+            
+            assert admitted(scheduler, runs) == [runs[0], runs[2]]
+            assert scheduler.queue() == runs[1:2]
+        
+        in_loop(scenario)
+    
+    def test_first_run_holds_the_queue_once_it_waited(self):
+        """Test nothing is backfilled once the first run waited ``aging``."""
+        def scenario():
+            scheduler = RunScheduler(2, 0, 60, ServerMetrics())
+            runs = [make_run(client="a"), make_run(client="b", slots=2), make_run()]
+            runs[1].started_at -= 100
+            
+            assert admitted(scheduler, runs) == runs[:1]
+            assert scheduler.queue() == runs[1:]
+            scheduler.release(runs[0])
+            assert runs[1].status == "running"
+            assert runs[2].status == "queued"
+        
+        in_loop(scenario)
+
+
+class TestReservedSlots:
+    """Test the reserved slots are kept for interactive runs."""
+    
+    def test_batch_runs_leave_reserved_slots_free(self):
+        """Test batch runs wait while only reserved slots are free."""
+        def scenario():
+            scheduler = RunScheduler(3, 1, 60, ServerMetrics())
+            batch = [make_run(client=client) for client in "abc"]
+            interactive = make_run("interactive", client="d")
+            
+            assert admitted(scheduler, batch) == batch[:2]
+            assert admitted(scheduler, [interactive]) == [interactive]
+            assert batch[2].status == "queued"
+        
+        in_loop(scenario)
+    
+    @pytest.mark.parametrize("limit, reserved, expected", [
+        (4, 1, 1), (4, -1, 0), (2, 5, 1), (1, 1, 0),
+    ])
+    def test_some_slot_is_left_for_batch_runs(self, limit, reserved, expected):
+        """Test reserving every slot still leaves one for batch runs."""
+        scheduler = RunScheduler(limit, reserved, 60, ServerMetrics())
+        
+        assert scheduler.reserved == expected
+
+
+class TestPriority:
+    """Test interactive runs are admitted before batch runs."""
+    
+    def test_interactive_run_goes_first(self):
+        """Test an interactive run overtakes batch runs that came earlier."""
+        def scenario():
+            scheduler = RunScheduler(1, 0, 60, ServerMetrics())
+            running = make_run(client="a")
+            batch = make_run(client="b")
+            interactive = make_run("interactive", client="c")
+            admitted(scheduler, [running, batch, interactive])
+            
+            assert scheduler.queue() == [interactive, batch]
+            scheduler.release(running)
+            assert interactive.status == "running"
+            assert batch.status == "queued"
+        
+        in_loop(scenario)
+
+
+class TestFairness:
+    """Test clients take turns instead of the busiest one filling the slots."""
+    
+    def test_client_with_fewest_slots_first(self):
+        """Test a client without running runs goes before one with some."""
+        def scenario():
+            scheduler = RunScheduler(1, 0, 60, ServerMetrics())
+            running, second = make_run(client="a"), make_run(client="a")
+            other = make_run(client="b")
+            admitted(scheduler, [running, second, other])
+            
+            assert scheduler.queue() == [other, second]
+        
+        in_loop(scenario)
+    
+    def test_clients_take_turns(self):
+        """Test each client's runs go in arrival order, alternating clients."""
+        def scenario():
+            scheduler = RunScheduler(1, 0, 60, ServerMetrics())
+            a1, a2, a3 = (make_run(client="a") for _ in range(3))
+            b1, b2 = (make_run(client="b") for _ in range(2))
+            admitted(scheduler, [a1, a2, a3, b1, b2])
+            
+            order = [a1]
+            for _ in range(4):
+                scheduler.release(order[-1])
+                order.extend(
+                    run for run in (a2, a3, b1, b2)
+                    if run.status == "running" and run not in order
+                )
+            
+            assert order == [a1, b1, a2, b2, a3]
+        
+        in_loop(scenario)
+
+
+class TestAging:
+    """Test batch runs that waited long enough are treated as interactive."""
+    
+    def test_aged_run_is_admitted_without_other_events(self):
+        """Test a waiting batch run takes a reserved slot once it ages."""
+        async def wait_for_aging():
+            scheduler = RunScheduler(2, 1, 0.2, ServerMetrics())
+            scheduler.submit(make_run(client="a"))
+            waiting = make_run(client="b")
+            admitted = scheduler.submit(waiting)
+            assert not admitted.done()
+            
+            await asyncio.wait_for(admitted, 2)
+            assert waiting.status == "running"
+            assert scheduler.used == 2
+        
+        asyncio.run(wait_for_aging())
+    
+    def test_aged_run_ranks_as_interactive(self):
+        """Test an aged batch run keeps its place ahead of later interactive runs."""
+        def scenario():
+            scheduler = RunScheduler(1, 0, 10, ServerMetrics())
+            running = make_run(client="a")
+            aged = make_run(client="b")
+            aged.started_at -= 100
+            interactive = make_run("interactive", client="c")
+            admitted(scheduler, [running, aged, interactive])
+            
+            assert scheduler.queue() == [aged, interactive]
+        
+        in_loop(scenario)
+    
+    def test_no_timer_while_all_slots_are_used(self):
+        """Test nothing waits for aging when no slot could be taken anyway."""
+        def fill():
+            scheduler = RunScheduler(2, 1, 0.2, ServerMetrics())
+            scheduler.submit(make_run("interactive", client="a", slots=2))
+            scheduler.submit(make_run(client="b"))
+            return scheduler
+        
+        assert in_loop(fill).timer is None
+
+
+class TestSessionId:
+    """Test client sessions get keys of their own."""
+    
+    class Session:
+        """Stands in for an MCP client session."""
+    
+    def test_one_key_per_session(self):
+        """Test a session keeps its key and other sessions get others."""
+        first, second = self.Session(), self.Session()
+        
+        assert session_id(first) == session_id(first)
+        assert session_id(first) != session_id(second)
+        assert session_id(None) == ""
+    
+    def test_keys_are_not_reused(self):
+        """Test a new session never gets the key of one that is gone."""
+        keys = set()
+        for _ in range(100):
+            # A new session often takes the memory, and id(), of the last
+            keys.add(session_id(self.Session()))
+            gc.collect()
+        
+        assert len(keys) == 100
@@ -0,0 +1,119 @@
+import pytest
+from server import merge_json_reports, plan_shards
+
+
+def report(exitcode=0, summary=None, tests=(), **fields):
+    """A minimal pytest-json-report report of one shard."""
+    return {
+        "created": 100.0,
+        "duration": 1.0,
+        "exitcode": exitcode,
+        "summary": summary or {},
+        "collectors": [],
+        "tests": [{"nodeid": nodeid} for nodeid in tests],
+        "warnings": [],
+        **fields,
+    }
+
+
+class TestPlanShards:
+    """Test splitting a run's tests into shards of similar duration."""
+    
+    def test_no_tests(self):
+        """Test an empty selection gives no shards."""
+        assert plan_shards([], 4, {}) == []
+    
+    def test_no_more_shards_than_tests(self):
+        """Test workers beyond the number of tests are not used."""
+        assert plan_shards(["a", "b"], 8, {}) == [["a"], ["b"]]
+    
+    @pytest.mark.parametrize("workers", [1, 2, 3, 7])
+    def test_every_test_runs_once(self, workers):
+        """Test the shards together hold each test exactly once."""
+        node_ids = [f"test_{index}" for index in range(20)]
+        durations = {node_id: index % 5 for index, node_id in enumerate(node_ids)}
+        
+        shards = plan_shards(node_ids, workers, durations)
+        
+        assert len(shards) == workers
+        assert sorted(n for shard in shards for n in shard) == sorted(node_ids)
+    
+    def test_shards_keep_collection_order(self):
+        """Test each shard lists its tests in collection order."""
+        node_ids = ["e", "d", "c", "b", "a"]
+        durations = {"e": 1, "d": 2, "c": 3, "b": 4, "a": 5}
+        
+        for shard in plan_shards(node_ids, 2, durations):
+            assert shard == sorted(shard, key=node_ids.index)
+    
+    def test_balances_recorded_durations(self):
+        """Test the longest tests go first to the least loaded shard."""
+        durations = {"a": 4.0, "b": 3.0, "c": 2.0, "d": 1.0}
+        
+        assert plan_shards(["a", "b", "c", "d"], 2, durations) == [
+            ["a", "d"], ["b", "c"]
+        ]
+    
+    def test_unknown_durations_count_as_the_average(self):
+        """Test tests without a recorded duration weigh the mean duration."""
+        durations = {"a": 3.0, "b": 1.0}
+        
+        assert plan_shards(["a", "b", "c", "d"], 2, durations) == [
+            ["a", "b"], ["c", "d"]
+        ]
+
+
+class TestMergeJsonReports:
+    """Test merging the JSON reports of a run's shards."""
+    
+    @pytest.mark.parametrize("exitcodes, expected", [
+        ([0, 0], 0),
+        ([0, 1], 1),
+        ([0, 5], 0),
+        ([5, 5], 5),
+        ([0, 2], 2),
+        ([2, 3, 1], 1),
+        ([5, 4], 4),
+    ])
+    def test_exit_code(self, exitcodes, expected):
+        """Test a failure wins, then the worst error; 5 only if no shard ran tests."""
+        merged = merge_json_reports([report(exitcode) for exitcode in exitcodes])
+        
+        assert merged["exitcode"] == expected
+    
+    def test_summary(self):
+        """Test outcome counts add up; every shard collects the whole selection."""
+        merged = merge_json_reports([
+            report(summary={"passed": 2, "failed": 1, "collected": 6, "deselected": 3}),
+            report(summary={"passed": 3, "collected": 6, "deselected": 3}),
+        ])
+        
+        assert merged["summary"] == {"passed": 5, "failed": 1, "collected": 6}
+    
+    def test_tests_in_shard_order(self):
+        """Test the merged report lists each shard's tests in turn."""
+        merged = merge_json_reports([report(tests=["a", "c"]), report(tests=["b"])])
+        
+        assert [test["nodeid"] for test in merged["tests"]] == ["a", "c", "b"]
+    
+    def test_collectors_are_deduplicated(self):
+        """Test a collector reported by several shards is kept once."""
+        collector = {"nodeid": "tests/test_x.py", "outcome": "passed"}
+        merged = merge_json_reports([
+            report(collectors=[collector]),
+            report(collectors=[dict(collector), {"nodeid": "tests/test_y.py"}]),
+        ])
+        
+        assert [c["nodeid"] for c in merged["collectors"]] == [
+            "tests/test_x.py", "tests/test_y.py"
+        ]
+    
+    def test_timing(self):
+        """Test a run starts with its earliest shard and lasts as its longest."""
+        merged = merge_json_reports([
+            report(created=10.0, duration=4.0),
+            report(created=9.5, duration=6.0),
+        ])
+        
+        assert merged["created"] == 9.5
+        assert merged["duration"] == 6.0
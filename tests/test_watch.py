@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import pytest
+import server
+from server import PollingWatcher, TestWatch
+
+
+def next_batch(watcher, debounce, edits=()):
+    """The next batch of changes, with ``edits`` made while waiting.
+
+    Each edit is a ``(delay, function)`` pair, run ``delay`` seconds after
+    the previous one.
+    """
+    async def edit_and_wait():
+        async def make_edits():
+            for delay, edit in edits:
+                await asyncio.sleep(delay)
+                edit()
+        
+        watcher.start()
+        try:
+            editing = asyncio.create_task(make_edits())
+            start = time.monotonic()
+            batch = await watcher.changes(debounce)
+            elapsed = time.monotonic() - start
+            editing.cancel()
+            return batch, elapsed
+        finally:
+            watcher.close()
+    
+    return asyncio.run(edit_and_wait())
+
+
+class TestPollingWatcher:
+    """Test file changes are found by polling and batched."""
+    
+    @pytest.fixture
+    def root(self, tmp_path):
+        """A watched directory with one module in it."""
+        (tmp_path / "module.py").write_text("VALUE = 1\n")
+        return tmp_path
+    
+    def test_burst_is_one_batch(self, root):
+        """Test files changed close together come in one batch."""
+        watcher = PollingWatcher([str(root)], interval=0.05)
+        
+        batch, _ = next_batch(watcher, 0.3, [
+            (0.1, lambda: (root / "module.py").write_text("VALUE = 22\n")),
+            (0.1, lambda: (root / "test_new.py").write_text("")),
+            (0.1, lambda: (root / "conftest.py").write_text("")),
+        ])
+        
+        assert batch == {
+            str(root / name) for name in ("module.py", "test_new.py", "conftest.py")
+        }
+    
+    def test_deleted_file(self, root):
+        """Test a deleted file counts as changed."""
+        watcher = PollingWatcher([str(root)], interval=0.05)
+        
+        batch, _ = next_batch(watcher, 0.1, [
+            (0.1, lambda: (root / "module.py").unlink()),
+        ])
+        
+        assert batch == {str(root / "module.py")}
+    
+    def test_unwatched_files(self, root):
+        """Test changes to files that cannot affect tests are left out."""
+        watcher = PollingWatcher([str(root)], interval=0.05)
+        
+        batch, _ = next_batch(watcher, 0.1, [
+            (0.1, lambda: (root / "notes.txt").write_text("")),
+            (0.1, lambda: (root / "__pycache__").mkdir()),
+            (0, lambda: (root / "__pycache__" / "cached.py").write_text("")),
+            (0.1, lambda: (root / "module.py").write_text("VALUE = 22\n")),
+        ])
+        
+        assert batch == {str(root / "module.py")}
+    
+    def test_steady_changes_are_cut_into_batches(self, root):
+        """Test a batch ends after ten times ``debounce`` of constant changes."""
+        watcher = PollingWatcher([str(root)], interval=60)
+        path = str(root / "module.py")
+        
+        batch, elapsed = next_batch(
+            watcher, 0.05, [(0.01, lambda: watcher._changed(path))] * 200
+        )
+        
+        assert batch == {path}
+        assert 0.5 <= elapsed < 1.5
+
+
+class FakeWatcher:
+    """A watcher reporting one batch of changes, then none."""
+    
+    kind = "fake"
+    
+    def __init__(self, batch):
+        self.batches = [batch]
+        self.closed = False
+    
+    async def changes(self, debounce):
+        if self.batches:
+            return self.batches.pop()
+        await asyncio.Event().wait()
+    
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """A client session recording the log messages sent to it."""
+    
+    def __init__(self):
+        self.messages = []
+    
+    async def send_log_message(self, level, data, logger=None):
+        self.messages.append((level, data))
+
+
+class TestWatchLoop:
+    """Test the loop running the tests a watch's changes affect."""
+    
+    def test_run_that_cannot_start_ends_the_watch(self, mcp_server, monkeypatch):
+        """Test an error starting a run is reported and stops the watch."""
+        async def collect_tests(args, timeout=None):
+            return [{"nodeid": "test_a.py::test_a", "path": "test_a.py"}]
+        
+        monkeypatch.setattr(mcp_server, "_collect_tests", collect_tests)
+        monkeypatch.setattr(
+            mcp_server, "_watch_selection", lambda tests, changed: ["test_a.py"]
+        )
+        monkeypatch.setattr(server, "coverage", None)
+        watcher = FakeWatcher({"test_a.py"})
+        session = FakeSession()
+        watch = TestWatch({"record_impact": True}, watcher, session)
+        mcp_server.watches[watch.watch_id] = watch
+        
+        asyncio.run(asyncio.wait_for(mcp_server._watch_loop(watch, 0.1), 10))
+        
+        [(level, data)] = session.messages
+        assert level == "error"
+        assert data["stopped"] is True
+        assert "coverage" in data["error"]
+        assert watcher.closed
+        assert mcp_server.watches == {}
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import server
+
+WORKER = Path(__file__).resolve().parent.parent / "pytest_worker.py"
+
+
+class TestWorker:
+    """Test the warm pytest worker process."""
+    
+    @pytest.mark.slow
+    def test_exits_quietly_when_the_server_is_gone(self, tmp_path):
+        """Test a worker whose responses can't be read exits without a traceback."""
+        read_fd, write_fd = os.pipe()
+        os.close(read_fd)
+        try:
+            process = subprocess.run(
+                [sys.executable, str(WORKER)],
+                stdin=subprocess.DEVNULL,
+                stdout=write_fd,
+                stderr=subprocess.PIPE,
+                cwd=tmp_path,
+                timeout=120,
+            )
+        finally:
+            os.close(write_fd)
+        
+        assert process.returncode == 0
+        assert process.stderr == b""
+
+
+class TestShutdown:
+    """Test the server stops its background work before returning."""
+    
+    def test_tasks_end_before_the_pool_closes(self, mcp_server, monkeypatch):
+        """Test the prewarm and watches are done when the workers are closed."""
+        events = []
+        
+        async def background(name):
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await asyncio.sleep(0.05)
+                events.append(f"{name} stopped")
+        
+        async def close():
+            events.append("pool closed")
+        
+        async def serve(host, port):
+            watch = server.TestWatch({}, None, None)
+            watch.task = asyncio.create_task(background("watch"))
+            mcp_server.watches[watch.watch_id] = watch
+            await asyncio.sleep(0.05)
+        
+        monkeypatch.setattr(mcp_server.pool, "prewarm", lambda: background("prewarm"))
+        monkeypatch.setattr(mcp_server.pool, "close", close)
+        monkeypatch.setattr(mcp_server, "run_http", serve)
+        
+        asyncio.run(mcp_server.run("http"))
+        
+        assert sorted(events[:2]) == ["prewarm stopped", "watch stopped"]
+        assert events[2:] == ["pool closed"]